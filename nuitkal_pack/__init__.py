@@ -1,2 +1,5 @@
 from .client import UpdateManager, UploadManager
+from .matrix import BuildMatrix
 from .packager import PythonPackager
+
+__all__ = ["BuildMatrix", "PythonPackager", "UpdateManager", "UploadManager"]
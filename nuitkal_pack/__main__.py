@@ -0,0 +1,320 @@
+r"""命令行入口
+
+用法:
+    python -m nuitkal_pack cache <缓存目录> stats
+    python -m nuitkal_pack cache <缓存目录> prune --max-bytes 10G
+    python -m nuitkal_pack bench --py-files 500 --output bench.json \
+        --baseline baseline.json
+    python -m nuitkal_pack watch <源码目录> --output dist --static-files /static
+    python -m nuitkal_pack import-bench dist/a.zip --source-dir <源码目录> \
+        --output import-bench.json
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+from .artifact_cache import ArtifactCache
+
+
+def _run_cache(args: argparse.Namespace) -> None:
+    """编译产物缓存管理"""
+    artifact_cache = ArtifactCache(args.root)
+
+    match args.cache_command:
+        case "stats":
+            stats = artifact_cache.stats()
+            excluded = ("hits", "misses", "max_bytes")
+            stats = {key: value for key, value in stats.items() if key not in excluded}
+            print(json.dumps(stats, indent=2))  # noqa: T201
+        case "prune":
+            freed = artifact_cache.prune(args.max_bytes)
+            print(f"已释放 {freed} 字节")  # noqa: T201
+
+
+def _run_bench(args: argparse.Namespace) -> None:
+    """打包流程基准测试"""
+    from .benchmark import TreeSpec, compare_results, run_benchmark, write_results
+
+    spec = TreeSpec(
+        py_files=args.py_files,
+        static_files=args.static_files,
+        py_size=args.py_size,
+        static_size=args.static_size,
+        users=tuple(args.users.split(",")),
+        packages=args.packages,
+        seed=args.seed,
+    )
+    results = run_benchmark(
+        spec, workers=args.workers, compile_delay=args.compile_delay, repeat=args.repeat
+    )
+    for stage in results["stages"]:
+        line = (
+            f"{stage['stage']:<14} {stage['seconds']:>9.3f}s  "
+            f"峰值内存 {stage['peak_bytes'] / 1024 / 1024:>8.2f}MB  "
+            f"{stage['files_per_second']:>9.1f} 文件/s  "
+            f"{stage['mb_per_second']:>8.2f}MB/s"
+        )
+        print(line)  # noqa: T201
+
+    if args.output:
+        write_results(results, args.output)
+        print(f"结果已写入: {args.output}")  # noqa: T201
+
+    if args.baseline:
+        regressions = compare_results(
+            results,
+            json.loads(args.baseline.read_text(encoding="utf-8")),
+            tolerance=args.tolerance,
+        )
+        for regression in regressions:
+            print(f"性能退化: {regression}")  # noqa: T201
+        if regressions:
+            sys.exit(1)
+
+
+def _run_watch(args: argparse.Namespace) -> None:
+    """监视源码目录并持续增量打包"""
+    import logging
+
+    from .packager import PythonPackager
+    from .watcher import PackageWatcher
+
+    packager = PythonPackager(
+        args.source_dir,
+        log_level=logging.INFO,
+        cache_dir=args.cache_dir,
+        compile_server=args.compile_server,
+        remote_cache_url=args.remote_cache,
+        remote_cache_token=args.remote_cache_token,
+        trace=args.trace is not None,
+        git_scan=args.git_scan,
+        strip_binaries=args.strip_binaries,
+        hash_algorithm=args.hash_algorithm,
+    )
+    compile_options = {
+        "static_files": args.static_files,
+        "exclude_files": args.exclude_files,
+        "workers": args.workers,
+        "batch_packages": args.batch_packages,
+    }
+    watcher = PackageWatcher(
+        packager,
+        args.output,
+        compile_options=compile_options,
+        poll_interval=args.poll_interval,
+        force_polling=args.poll,
+        trace_output=args.trace,
+    )
+    watcher.run()
+
+
+def _run_import_bench(args: argparse.Namespace) -> None:
+    """扩展模块与源码的导入耗时对比"""
+    from .import_benchmark import format_results, run_import_benchmark, write_results
+
+    results = run_import_benchmark(
+        args.bundle,
+        args.source_dir,
+        python=args.python,
+        modules=args.modules,
+        repeat=args.repeat,
+        tolerance=args.tolerance,
+        timeout=args.timeout,
+    )
+    print(format_results(results))  # noqa: T201
+
+    if args.output:
+        write_results(results, args.output)
+        print(f"结果已写入: {args.output}")  # noqa: T201
+
+    if args.fail_on_regression and results["regressions"]:
+        sys.exit(1)
+
+
+def _add_cache_parser(subparsers: "argparse._SubParsersAction") -> None:
+    """添加编译产物缓存管理子命令"""
+    cache_parser = subparsers.add_parser("cache", help="Nuitka 编译产物缓存管理")
+    cache_parser.add_argument("root", type=Path, help="缓存根目录")
+    cache_subparsers = cache_parser.add_subparsers(dest="cache_command", required=True)
+    cache_subparsers.add_parser("stats", help="显示缓存统计信息")
+    prune_parser = cache_subparsers.add_parser("prune", help="按 LRU 淘汰缓存")
+    prune_parser.add_argument(
+        "--max-bytes",
+        default=None,
+        help="容量上限, 支持 K/M/G/T 后缀; 不指定时只清理孤立文件",
+    )
+    cache_parser.set_defaults(handler=_run_cache)
+
+
+def _add_bench_parser(subparsers: "argparse._SubParsersAction") -> None:
+    """添加打包流程基准测试子命令"""
+    bench_parser = subparsers.add_parser("bench", help="使用合成源码树测试打包流程性能")
+    bench_parser.add_argument(
+        "--py-files", type=int, default=200, help="Python 文件数量"
+    )
+    bench_parser.add_argument(
+        "--static-files", type=int, default=50, help="静态资源文件数量"
+    )
+    bench_parser.add_argument(
+        "--py-size", type=int, default=4 * 1024, help="Python 文件平均大小(字节)"
+    )
+    bench_parser.add_argument(
+        "--static-size", type=int, default=64 * 1024, help="静态资源文件平均大小(字节)"
+    )
+    bench_parser.add_argument("--users", default="a,b,c", help="用户名称, 逗号分隔")
+    bench_parser.add_argument(
+        "--packages", type=int, default=10, help="Python 文件分布的包数量"
+    )
+    bench_parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    bench_parser.add_argument("--workers", type=int, default=1, help="编译工作线程数")
+    bench_parser.add_argument(
+        "--compile-delay", type=float, default=0.0, help="模拟编译器每个模块的耗时(秒)"
+    )
+    bench_parser.add_argument(
+        "--repeat", type=int, default=3, help="重复次数, 每个阶段取耗时最短的一次"
+    )
+    bench_parser.add_argument(
+        "--output", type=Path, default=None, help="结果 JSON 文件路径"
+    )
+    bench_parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=None,
+        help="基线结果文件, 出现性能退化时以非零状态退出",
+    )
+    bench_parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="允许的退化比例"
+    )
+    bench_parser.set_defaults(handler=_run_bench)
+
+
+def _add_import_bench_parser(subparsers: "argparse._SubParsersAction") -> None:
+    """添加导入耗时基准测试子命令"""
+    import_bench_parser = subparsers.add_parser(
+        "import-bench", help="对比打包结果中扩展模块与源码的导入耗时"
+    )
+    import_bench_parser.add_argument("bundle", type=Path, help="to_zip 生成的 ZIP 包")
+    import_bench_parser.add_argument(
+        "--source-dir", type=Path, required=True, help="源码目录"
+    )
+    import_bench_parser.add_argument(
+        "--python",
+        default=sys.executable,
+        help="运行测量的解释器, 应与编译使用的解释器一致",
+    )
+    import_bench_parser.add_argument(
+        "--modules", nargs="*", default=[], help="只测量指定的模块"
+    )
+    import_bench_parser.add_argument(
+        "--repeat", type=int, default=5, help="每种情况的测量次数, 取中位数"
+    )
+    import_bench_parser.add_argument(
+        "--tolerance", type=float, default=0.1, help="允许编译后导入耗时超出源码的比例"
+    )
+    import_bench_parser.add_argument(
+        "--timeout", type=float, default=60.0, help="单次导入的超时时间(秒)"
+    )
+    import_bench_parser.add_argument(
+        "--output", type=Path, default=None, help="结果 JSON 文件路径"
+    )
+    import_bench_parser.add_argument(
+        "--fail-on-regression",
+        action="store_true",
+        help="存在编译后更慢的模块时以非零状态退出",
+    )
+    import_bench_parser.set_defaults(handler=_run_import_bench)
+
+
+def _add_watch_parser(subparsers: "argparse._SubParsersAction") -> None:
+    """添加监视模式子命令"""
+    watch_parser = subparsers.add_parser(
+        "watch", help="监视源码目录, 文件保存后增量编译并更新用户 ZIP 包"
+    )
+    watch_parser.add_argument("source_dir", type=Path, help="源码目录")
+    watch_parser.add_argument(
+        "--output", type=Path, required=True, help="ZIP 包输出目录"
+    )
+    watch_parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=None,
+        help="缓存目录, 默认为源码目录下的 .packager_cache",
+    )
+    watch_parser.add_argument(
+        "--static-files", nargs="*", default=[], help="静态文件匹配模式"
+    )
+    watch_parser.add_argument(
+        "--exclude-files", nargs="*", default=[], help="排除文件匹配模式"
+    )
+    watch_parser.add_argument(
+        "--workers", type=int, default=None, help="编译工作线程数, 默认为CPU核心数"
+    )
+    watch_parser.add_argument(
+        "--batch-packages", action="store_true", help="合并编译全部为pyd模式的包"
+    )
+    watch_parser.add_argument(
+        "--compile-server",
+        action="store_true",
+        help="使用常驻编译服务, 省去每次启动Nuitka的开销(不支持Windows)",
+    )
+    watch_parser.add_argument(
+        "--remote-cache", default=None, help="服务器基础URL, 使用服务器上共享的编译缓存"
+    )
+    watch_parser.add_argument(
+        "--remote-cache-token",
+        default=os.environ.get("NUITKAL_PACK_BUILD_TOKEN"),
+        help="访问共享编译缓存的构建机令牌, 默认读取环境变量 NUITKAL_PACK_BUILD_TOKEN",
+    )
+    watch_parser.add_argument(
+        "--git-scan",
+        action="store_true",
+        help="从 git 索引枚举文件, 以 blob ID 判断文件是否变化",
+    )
+    watch_parser.add_argument(
+        "--strip-binaries",
+        action="store_true",
+        help="编译后去除扩展模块的符号表与调试段",
+    )
+    watch_parser.add_argument(
+        "--hash-algorithm",
+        default="sha256",
+        help=(
+            "文件哈希算法(sha256、blake2b, 安装 blake3 包后可用 blake3), "
+            "需要与上传的服务器支持的算法一致"
+        ),
+    )
+    watch_parser.add_argument(
+        "--trace",
+        type=Path,
+        default=None,
+        help="每次构建后将追踪记录导出为 Chrome trace JSON 文件, 并输出耗时汇总",
+    )
+    watch_parser.add_argument(
+        "--poll", action="store_true", help="强制使用轮询代替 inotify"
+    )
+    watch_parser.add_argument(
+        "--poll-interval", type=float, default=1.0, help="轮询间隔(秒)"
+    )
+    watch_parser.set_defaults(handler=_run_watch)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(
+        prog="python -m nuitkal_pack", description="nuitkal-pack 打包工具"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    _add_cache_parser(subparsers)
+    _add_bench_parser(subparsers)
+    _add_import_bench_parser(subparsers)
+    _add_watch_parser(subparsers)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
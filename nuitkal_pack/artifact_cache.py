@@ -0,0 +1,452 @@
+"""编译产物缓存
+
+以内容寻址的方式在目录中保存 Nuitka 编译产物, 多台构建机可以通过共享目录复用同一份缓存:
+
+    <root>/objects/ab/<sha256>      产物文件, 以文件内容的 SHA256 命名
+    <root>/entries/ab/<key>.json    缓存条目, 记录编译键对应的产物文件列表
+    <root>/leases/<id>.json         构建租约, 记录正在进行的构建开始使用缓存的时间
+
+缓存键只由源文件哈希、模块相对路径、工具链标签与编译参数计算得到, 与检出目录无关。
+条目文件的修改时间作为最近使用时间, 超出容量上限时按 LRU 淘汰。
+打包器直接引用缓存中的产物文件并在写入 ZIP 包时才读取,
+因此每次构建在缓存目录中写入租约(见 pin_since), 任何构建机(包括 cache prune
+命令)淘汰时都跳过租约开始之后使用过的条目; 异常退出的构建机遗留的租约在
+LEASE_TTL_SECONDS 内未更新即失效。产物文件先于条目写入,
+刚写入的产物文件在宽限期内即使还没有条目引用也不会被当作孤立文件删除。
+
+命令行用法:
+    python -m nuitkal_pack cache <缓存目录> stats
+    python -m nuitkal_pack cache <缓存目录> prune --max-bytes 10G
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, TypedDict
+
+from nuitkal_pack_server.tools.hash_utils import hash_file
+
+from .toolchain import Toolchain
+
+logger = logging.getLogger(__name__)
+
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+# 未被条目引用的产物文件在最后修改后的该时间内不清理(其他线程或构建机可能已写入产物、
+# 尚未写入条目)
+ORPHAN_GRACE_SECONDS = 3600
+
+# 构建租约在最后更新后的该时间内有效, 超时视为构建机已异常退出
+LEASE_TTL_SECONDS = 24 * 3600
+
+
+class CacheStats(TypedDict):
+    """缓存统计信息"""
+
+    entries: int  # 缓存条目数量
+    objects: int  # 产物文件数量
+    total_bytes: int  # 产物文件总大小
+    max_bytes: int | None  # 容量上限
+    hits: int  # 本次运行命中次数
+    misses: int  # 本次运行未命中次数
+
+
+@dataclass(frozen=True)
+class CachedArtifact:
+    """缓存中的单个产物文件
+
+    Attributes:
+        name: 产物文件名
+        path: 产物文件在缓存中的路径
+        hash: 产物文件内容的 SHA256
+        size: 产物文件大小
+
+    """
+
+    name: str
+    path: Path
+    hash: str
+    size: int
+
+
+def parse_size(value: str | int) -> int:
+    """解析容量字符串, 支持 K/M/G/T 后缀(如 512M、10G)"""
+    if isinstance(value, int):
+        return value
+
+    text = value.strip().upper().removesuffix("B")
+    unit = text[-1] if text and text[-1] in _SIZE_UNITS else ""
+    return int(float(text.removesuffix(unit)) * _SIZE_UNITS[unit])
+
+
+class ArtifactCache:
+    """内容寻址的编译产物缓存"""
+
+    def __init__(self, root: Path | str, *, max_bytes: int | str | None = None):
+        """初始化编译产物缓存
+
+        Args:
+            root: 缓存根目录, 可以是多台构建机共享的目录
+            max_bytes: 容量上限(字节或带单位的字符串), 为None时不限制
+
+        """
+        self.root = Path(root).absolute()
+        self.objects_dir = self.root / "objects"
+        self.entries_dir = self.root / "entries"
+        self.leases_dir = self.root / "leases"
+        self.max_bytes = parse_size(max_bytes) if max_bytes is not None else None
+
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.entries_dir.mkdir(parents=True, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size_estimate: int | None = None
+        self.pinned_since: float | None = None
+        self._lease_path: Path | None = None
+
+    def pin_since(self, timestamp: float | None = None) -> None:
+        """保护该时间之后使用过(读取或写入)的条目及其产物文件, 淘汰时跳过
+
+        打包器在每次构建开始时调用, 本次构建引用的产物在打包完成前不会被删除。
+        保护以租约文件的形式写入缓存目录,
+        共享缓存的其他构建机淘汰时同样跳过; 每次读写缓存时更新租约, 调用 release
+        或进程退出时删除。
+
+        Args:
+            timestamp: 起始时间, 默认为当前时间
+
+        """
+        self.pinned_since = time.time() if timestamp is None else timestamp
+        if self._lease_path is None:
+            self._lease_path = self.leases_dir / f"{uuid.uuid4().hex}.json"
+            atexit.register(self.release)
+        self._write_lease()
+
+    def release(self) -> None:
+        """删除本实例的构建租约, 之后淘汰时不再保护本次构建使用过的条目"""
+        self.pinned_since = None
+        if self._lease_path is not None:
+            self._lease_path.unlink(missing_ok=True)
+
+    def _write_lease(self) -> None:
+        if self._lease_path is None or self.pinned_since is None:
+            return
+        lease = {
+            "since": self.pinned_since,
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+        }
+        try:
+            self._atomic_write(self._lease_path, json.dumps(lease).encode("utf-8"))
+        except OSError as e:
+            logger.warning(f"写入编译缓存租约失败: {e}")
+
+    def _renew_lease(self) -> None:
+        """更新租约的修改时间, 租约已被其他构建机当作过期删除时重新写入"""
+        if self._lease_path is None or self.pinned_since is None:
+            return
+        try:
+            now = time.time()
+            os.utime(self._lease_path, (now, now))
+        except FileNotFoundError:
+            self._write_lease()
+        except OSError:
+            pass
+
+    def _lease_times(self) -> list[float]:
+        """所有有效租约的开始时间, 同时删除过期的租约"""
+        now = time.time()
+        times = []
+        for lease_path in self.leases_dir.glob("*.json"):
+            try:
+                if now - lease_path.stat().st_mtime > LEASE_TTL_SECONDS:
+                    lease_path.unlink(missing_ok=True)
+                    continue
+                with lease_path.open("r", encoding="utf-8") as f:
+                    times.append(float(json.load(f)["since"]))
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+        return times
+
+    @staticmethod
+    def make_key(
+        source_hash: str,
+        rel_path: Path,
+        *,
+        toolchain: Toolchain | None = None,
+        options: list[str] | tuple[str, ...] = (),
+    ) -> str:
+        """计算编译缓存键
+
+        模块相对路径决定了编译后的模块名, 因此与源文件哈希一起参与计算;
+        源文件所在的绝对路径不参与计算, 不同检出目录、不同构建机可以共享缓存。
+        """
+        toolchain = toolchain or Toolchain.current()
+        payload = json.dumps(
+            {
+                "source": source_hash,
+                "module": rel_path.as_posix(),
+                "toolchain": toolchain.tag,
+                "options": list(options),
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.entries_dir / key[:2] / f"{key}.json"
+
+    def _object_path(self, file_hash: str) -> Path:
+        return self.objects_dir / file_hash[:2] / file_hash
+
+    def __contains__(self, key: str) -> bool:
+        return self._entry_path(key).exists()
+
+    def get(self, key: str) -> list[CachedArtifact] | None:
+        """读取缓存条目, 未命中或产物文件缺失时返回None"""
+        entry_path = self._entry_path(key)
+        try:
+            with entry_path.open("r", encoding="utf-8") as f:
+                entry = json.load(f)
+
+            artifacts = [
+                CachedArtifact(
+                    name=item["name"],
+                    path=self._object_path(item["hash"]),
+                    hash=item["hash"],
+                    size=item["size"],
+                )
+                for item in entry["files"]
+            ]
+
+            # 产物文件可能已被其他构建机淘汰
+            if not all(artifact.path.exists() for artifact in artifacts):
+                raise FileNotFoundError(key)
+
+            # 更新最近使用时间
+            now = time.time()
+            for path in (entry_path, *(artifact.path for artifact in artifacts)):
+                os.utime(path, (now, now))
+
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        self._renew_lease()
+
+        with self._lock:
+            self.hits += 1
+        return artifacts
+
+    def put(
+        self, key: str, files: list[Path], *, metadata: dict | None = None
+    ) -> list[CachedArtifact]:
+        """保存编译产物
+
+        Args:
+            key: 缓存键
+            files: 产物文件列表
+            metadata: 附加信息, 写入缓存条目
+
+        Returns:
+            保存后的缓存产物列表
+
+        """
+        self._renew_lease()
+        artifacts = [self._store_object(path) for path in files]
+
+        entry = {
+            "files": [
+                {"name": artifact.name, "hash": artifact.hash, "size": artifact.size}
+                for artifact in artifacts
+            ],
+            "created_at": time.time(),
+            **(metadata or {}),
+        }
+        self._atomic_write(
+            self._entry_path(key),
+            json.dumps(entry, ensure_ascii=False, indent=2).encode("utf-8"),
+        )
+
+        if self.max_bytes is not None:
+            with self._lock:
+                if self._size_estimate is None:
+                    self._size_estimate = self._scan_size()
+                self._size_estimate += sum(artifact.size for artifact in artifacts)
+                need_prune = self._size_estimate > self.max_bytes
+
+            if need_prune:
+                self.prune()
+
+        return artifacts
+
+    def _store_object(self, path: Path) -> CachedArtifact:
+        """将文件按内容哈希存入对象目录"""
+        file_hash = hash_file(path).hash
+        object_path = self._object_path(file_hash)
+
+        if object_path.exists():
+            now = time.time()
+            os.utime(object_path, (now, now))
+        else:
+            object_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_name = tempfile.mkstemp(dir=object_path.parent, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as dst, path.open("rb") as src:
+                    shutil.copyfileobj(src, dst)
+                Path(temp_name).replace(object_path)
+            except BaseException:
+                Path(temp_name).unlink(missing_ok=True)
+                raise
+
+        return CachedArtifact(
+            name=path.name,
+            path=object_path,
+            hash=file_hash,
+            size=object_path.stat().st_size,
+        )
+
+    @staticmethod
+    def _atomic_write(path: Path, data: bytes) -> None:
+        """原子写入文件, 避免共享目录中的其他构建机读到半写入的内容"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            Path(temp_name).replace(path)
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+
+    def _iter_entries(self) -> Iterator[Path]:
+        yield from self.entries_dir.glob("*/*.json")
+
+    def _iter_objects(self) -> Iterator[Path]:
+        for path in self.objects_dir.glob("*/*"):
+            if not path.name.startswith(".tmp-"):
+                yield path
+
+    def _scan_size(self) -> int:
+        total = 0
+        for path in self._iter_objects():
+            try:
+                total += path.stat().st_size
+            except OSError:
+                continue
+        return total
+
+    def stats(self) -> CacheStats:
+        """获取缓存统计信息"""
+        objects = list(self._iter_objects())
+        return {
+            "entries": sum(1 for _ in self._iter_entries()),
+            "objects": len(objects),
+            "total_bytes": self._scan_size(),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _read_entries(self) -> list[tuple[float, Path, set[str]]]:
+        """读取所有条目的 (使用时间, 条目路径, 引用的产物哈希), 删除损坏的条目"""
+        entries: list[tuple[float, Path, set[str]]] = []
+        for entry_path in self._iter_entries():
+            try:
+                mtime = entry_path.stat().st_mtime
+                with entry_path.open("r", encoding="utf-8") as f:
+                    hashes = {item["hash"] for item in json.load(f)["files"]}
+            except (OSError, ValueError, KeyError):
+                entry_path.unlink(missing_ok=True)
+                continue
+            entries.append((mtime, entry_path, hashes))
+        return entries
+
+    def _object_stats(self) -> tuple[dict[str, int], dict[str, float]]:
+        """所有产物文件的大小与修改时间"""
+        sizes: dict[str, int] = {}
+        mtimes: dict[str, float] = {}
+        for object_path in self._iter_objects():
+            try:
+                stat = object_path.stat()
+            except OSError:
+                continue
+            sizes[object_path.name] = stat.st_size
+            mtimes[object_path.name] = stat.st_mtime
+        return sizes, mtimes
+
+    def prune(self, max_bytes: int | str | None = None) -> int:
+        """按最近使用时间淘汰缓存, 直到总大小不超过容量上限
+
+        同时清理未被任何条目引用的产物文件。缓存目录中任一有效租约(见 pin_since)
+        开始之后使用过的条目不淘汰, 因此仍可能超出上限;
+        孤立的产物文件在宽限期(ORPHAN_GRACE_SECONDS)内不清理。
+
+        Args:
+            max_bytes: 容量上限, 为None时使用初始化时的上限;
+                两者都为None时只清理孤立文件
+
+        Returns:
+            释放的字节数
+
+        """
+        limit = parse_size(max_bytes) if max_bytes is not None else self.max_bytes
+        entries = self._read_entries()
+        sizes, mtimes = self._object_stats()
+
+        refcount: dict[str, int] = {}
+        for _, _, hashes in entries:
+            for file_hash in hashes:
+                refcount[file_hash] = refcount.get(file_hash, 0) + 1
+
+        # 先删除孤立产物(跳过宽限期内与受保护的产物), 再从最久未使用的条目开始淘汰
+        leases = self._lease_times()
+        if self.pinned_since is not None:
+            leases.append(self.pinned_since)
+        pinned_since = min(leases, default=float("inf"))
+        orphan_before = min(time.time() - ORPHAN_GRACE_SECONDS, pinned_since)
+        doomed = {
+            file_hash
+            for file_hash in sizes
+            if file_hash not in refcount and mtimes[file_hash] < orphan_before
+        }
+        total = sum(
+            size for file_hash, size in sizes.items() if file_hash not in doomed
+        )
+
+        for mtime, entry_path, hashes in sorted(entries, key=lambda item: item[0]):
+            # 条目按使用时间排序, 之后的条目都在本次构建中使用过
+            if limit is None or total <= limit or mtime >= pinned_since:
+                break
+
+            entry_path.unlink(missing_ok=True)
+            for file_hash in hashes:
+                refcount[file_hash] -= 1
+                if refcount[file_hash] == 0 and file_hash in sizes:
+                    doomed.add(file_hash)
+                    total -= sizes[file_hash]
+
+        freed = 0
+        for file_hash in doomed:
+            self._object_path(file_hash).unlink(missing_ok=True)
+            freed += sizes[file_hash]
+
+        with self._lock:
+            self._size_estimate = total
+
+        if freed:
+            logger.info(f"编译缓存已清理 {freed} 字节, 当前大小 {total} 字节")
+        return freed
@@ -0,0 +1,362 @@
+"""打包流程基准测试
+
+生成可配置的合成源码树(文件数量、大小、[core]/[core-pyd]/[user-x] 标签比例、静态资源),
+分别测量 rglob_exclude、compile、to_zip 各阶段的耗时、峰值内存与吞吐量, 结果写入 JSON
+文件。
+
+编译阶段使用模拟编译器代替 Nuitka(仍以子进程方式调用), 不依赖 C 编译器,
+任何机器上都可以运行; 传入基线结果文件时, 与基线对比并报告性能退化的阶段。
+"""
+
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, TypedDict, TypeVar
+
+from .packager import PythonPackager
+from .toolchain import Toolchain
+
+T = TypeVar("T")
+
+# 结果文件格式版本
+RESULTS_VERSION = 1
+
+# 模拟编译器: 按 Nuitka 的输出格式生成扩展模块与 .pyi 文件
+FAKE_NUITKA_SOURCE = """\
+import sys
+import time
+from pathlib import Path
+
+args = sys.argv[1:]
+source = Path(next(arg for arg in args if not arg.startswith("--")))
+output_arg = next(arg for arg in args if arg.startswith("--output-dir="))
+output_dir = Path(output_arg.split("=", 1)[1])
+ext_suffix, delay = __EXT_SUFFIX__, __DELAY__
+
+files = sorted(source.rglob("*.py")) if source.is_dir() else [source]
+data = b"".join(path.read_bytes() for path in files)
+time.sleep(delay * len(files))
+
+output_dir.mkdir(parents=True, exist_ok=True)
+module_path = output_dir / (source.stem + ext_suffix)
+module_path.write_bytes(b"\\x7fELF-fake-module\\0" + data * 4)
+(output_dir / (source.stem + ".pyi")).write_text("# stub\\n", encoding="utf-8")
+print(f"Nuitka: Successfully created '{module_path}'.")
+"""
+
+
+@dataclass
+class TreeSpec:
+    """合成源码树配置
+
+    Attributes:
+        py_files: Python 文件数量
+        static_files: 静态资源文件数量
+        py_size: Python 文件平均大小(字节)
+        static_size: 静态资源文件平均大小(字节)
+        users: 用户名称列表
+        tag_weights: 各标签的权重, 标签中的 {user} 会被替换为随机用户
+        packages: Python 文件分布的包数量
+        seed: 随机种子, 相同配置生成相同的源码树
+
+    """
+
+    py_files: int = 200
+    static_files: int = 50
+    py_size: int = 4 * 1024
+    static_size: int = 64 * 1024
+    users: tuple[str, ...] = ("a", "b", "c")
+    tag_weights: dict[str, float] = field(
+        default_factory=lambda: {
+            "[core]": 0.4,
+            "[core-pyd]": 0.2,
+            "[user-{user}]": 0.15,
+            "[user-{user}-pyd]": 0.1,
+            "[core][user-{user}-pyd]": 0.05,
+            "": 0.1,  # 没有标签的文件不会被打包
+        }
+    )
+    packages: int = 10
+    seed: int = 0
+
+
+class StageResult(TypedDict):
+    """单个阶段的测量结果"""
+
+    stage: str  # 阶段名称
+    seconds: float  # 耗时(秒)
+    peak_bytes: int  # Python 内存分配峰值(字节)
+    files: int  # 处理的文件数
+    bytes: int  # 处理的字节数
+    files_per_second: float  # 文件吞吐量
+    mb_per_second: float  # 数据吞吐量(MB/s)
+
+
+def generate_tree(root: Path, spec: TreeSpec) -> dict[str, int]:
+    """生成合成源码树
+
+    Returns:
+        {"py_files", "static_files", "bytes"} 统计信息
+
+    """
+    rng = random.Random(spec.seed)  # noqa: S311
+    root.mkdir(parents=True, exist_ok=True)
+    tags, weights = list(spec.tag_weights), list(spec.tag_weights.values())
+
+    total_bytes = 0
+    for index in range(spec.py_files):
+        package_dir = root / f"pkg{index % max(spec.packages, 1)}"
+        package_dir.mkdir(exist_ok=True)
+
+        tag = rng.choices(tags, weights)[0].format(user=rng.choice(spec.users))
+        lines = [f"# {tag}" if tag else "# -*- coding: utf-8 -*-", f"VALUE = {index}"]
+        size = max(64, int(rng.gauss(spec.py_size, spec.py_size / 4)))
+        function_index = 0
+        while sum(len(line) + 1 for line in lines) < size:
+            factor = rng.randint(1, 1000)
+            lines.append(
+                f"def func_{function_index}(x):\n    return x * {factor} + VALUE\n"
+            )
+            function_index += 1
+
+        content = "\n".join(lines).encode("utf-8")
+        (package_dir / f"module_{index}.py").write_bytes(content)
+        total_bytes += len(content)
+
+    static_dir = root / "static"
+    static_dir.mkdir(exist_ok=True)
+    for index in range(spec.static_files):
+        size = max(1, int(rng.gauss(spec.static_size, spec.static_size / 4)))
+        # 一半为可压缩的文本, 一半为不可压缩的二进制数据
+        if index % 2:
+            content = rng.randbytes(size)
+            name = f"asset_{index}.bin"
+        else:
+            content = (f"line {index} " * (size // 8 + 1)).encode("utf-8")[:size]
+            name = f"asset_{index}.txt"
+        (static_dir / name).write_bytes(content)
+        total_bytes += size
+
+    (root / "main.py").write_text("# [core]\nprint('hello')\n", encoding="utf-8")
+
+    # 将修改时间设为过去, 避免刚写入的文件被扫描器视为可能仍在变化而不缓存其哈希
+    mtime = time.time() - 3600
+    for path in root.rglob("*"):
+        os.utime(path, (mtime, mtime))
+
+    return {
+        "py_files": spec.py_files + 1,
+        "static_files": spec.static_files,
+        "bytes": total_bytes,
+    }
+
+
+def fake_toolchain(work_dir: Path, *, delay: float = 0.0) -> Toolchain:
+    """创建使用模拟编译器的工具链
+
+    Args:
+        work_dir: 存放模拟编译器脚本的目录
+        delay: 每个模块模拟的编译耗时(秒)
+
+    """
+    current = Toolchain.current()
+    script = work_dir / "fake_nuitka.py"
+    script.write_text(
+        FAKE_NUITKA_SOURCE.replace("__EXT_SUFFIX__", repr(current.ext_suffix)).replace(
+            "__DELAY__", repr(delay)
+        ),
+        encoding="utf-8",
+    )
+    return Toolchain(
+        python=current.python,
+        nuitka_version="fake",
+        cache_tag=current.cache_tag,
+        ext_suffix=current.ext_suffix,
+        platform=current.platform,
+        command=(sys.executable, str(script)),
+    )
+
+
+def measure(  # noqa: UP047
+    stage: str, func: Callable[[], T], *, files: int = 0, size: int = 0
+) -> tuple[StageResult, T]:
+    """测量函数的耗时与 Python 内存分配峰值"""
+    tracemalloc.start()
+    try:
+        start_time = time.perf_counter()
+        value = func()
+        seconds = time.perf_counter() - start_time
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result: StageResult = {
+        "stage": stage,
+        "seconds": seconds,
+        "peak_bytes": peak_bytes,
+        "files": files,
+        "bytes": size,
+        "files_per_second": files / seconds if seconds else 0.0,
+        "mb_per_second": size / seconds / 1024 / 1024 if seconds else 0.0,
+    }
+    return result, value
+
+
+def run_benchmark(
+    spec: TreeSpec, *, workers: int = 1, compile_delay: float = 0.0, repeat: int = 1
+) -> dict:
+    """运行基准测试
+
+    依次测量: 扫描(rglob_exclude)、冷缓存编译、热缓存编译、打包(to_zip)。
+    重复多次时每个阶段取耗时最短的一次, 减少机器负载波动的影响。
+
+    Args:
+        spec: 合成源码树配置
+        workers: 编译工作线程数
+        compile_delay: 模拟编译器每个模块的耗时(秒)
+        repeat: 重复次数
+
+    Returns:
+        可直接写入 JSON 的结果字典
+
+    """
+    best: dict[str, StageResult] = {}
+    tree: dict[str, int] = {}
+    for _ in range(max(repeat, 1)):
+        tree, stages = _run_once(spec, workers=workers, compile_delay=compile_delay)
+        for stage in stages:
+            if (
+                stage["stage"] not in best
+                or stage["seconds"] < best[stage["stage"]]["seconds"]
+            ):
+                best[stage["stage"]] = stage
+
+    return {
+        "version": RESULTS_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "spec": asdict(spec),
+        "workers": workers,
+        "compile_delay": compile_delay,
+        "repeat": repeat,
+        "tree": tree,
+        "stages": list(best.values()),
+    }
+
+
+def _run_once(
+    spec: TreeSpec, *, workers: int, compile_delay: float
+) -> tuple[dict[str, int], list[StageResult]]:
+    """在临时目录中生成源码树并测量一次各阶段"""
+    with tempfile.TemporaryDirectory(prefix="nuitkal-bench-") as temp_dir:
+        root = Path(temp_dir)
+        source_dir = root / "src"
+        cache_dir = root / "cache"
+        tree = generate_tree(source_dir, spec)
+        toolchain = fake_toolchain(root, delay=compile_delay)
+
+        def _packager() -> PythonPackager:
+            return PythonPackager(
+                source_dir,
+                log_level=logging.WARNING,
+                cache_dir=cache_dir,
+                toolchain=toolchain,
+            )
+
+        stages: list[StageResult] = []
+        packager = _packager()
+        tree_files = tree["py_files"] + tree["static_files"]
+
+        result, _ = measure(
+            "rglob_exclude",
+            lambda: list(packager.rglob_exclude(source_dir)),
+            files=tree_files,
+            size=tree["bytes"],
+        )
+        stages.append(result)
+
+        options = {"static_files": ["/static"], "workers": workers}
+        result, _ = measure(
+            "compile:cold",
+            lambda: packager.compile(**options),
+            files=tree_files,
+            size=tree["bytes"],
+        )
+        stages.append(result)
+
+        # 新的打包器实例: 扫描索引与编译产物均来自上一次运行的磁盘缓存
+        warm_packager = _packager()
+        result, _ = measure(
+            "compile:warm",
+            lambda: warm_packager.compile(**options),
+            files=tree_files,
+            size=tree["bytes"],
+        )
+        stages.append(result)
+
+        result, bundles = measure(
+            "to_zip",
+            warm_packager.to_zip,
+            files=sum(len(files) for files in warm_packager.core_map.values()),
+            size=tree["bytes"],
+        )
+        result["bytes"] = sum(len(bundle.getbuffer()) for bundle in bundles.values())
+        result["mb_per_second"] = (
+            result["bytes"] / result["seconds"] / 1024 / 1024
+            if result["seconds"]
+            else 0.0
+        )
+        stages.append(result)
+
+    return tree, stages
+
+
+def compare_results(
+    current: dict, baseline: dict, *, tolerance: float = 0.2
+) -> list[str]:
+    """与基线结果对比, 返回性能退化的说明
+
+    Args:
+        current: 本次结果
+        baseline: 基线结果
+        tolerance: 允许的退化比例, 耗时或内存峰值超过基线的 (1 + tolerance) 倍时视为退化
+
+    """
+    # 经过 JSON 往返后再比较, 元组与列表视为相同
+    regressions = [
+        f"基线的测试配置不同({key}), 结果不可比较"
+        for key in ("spec", "workers", "compile_delay")
+        if json.loads(json.dumps(current.get(key))) != baseline.get(key)
+    ]
+    if regressions:
+        return regressions
+
+    baseline_stages = {stage["stage"]: stage for stage in baseline.get("stages", [])}
+    for stage in current["stages"]:
+        base = baseline_stages.get(stage["stage"])
+        if base is None:
+            continue
+
+        regressions.extend(
+            f"{stage['stage']}.{metric}: {base[metric]:.6g} -> {stage[metric]:.6g} "
+            f"(+{stage[metric] / base[metric] - 1:.0%})"
+            for metric in ("seconds", "peak_bytes")
+            if base[metric] and stage[metric] > base[metric] * (1 + tolerance)
+        )
+    return regressions
+
+
+def write_results(results: dict, path: Path) -> None:
+    """写入结果文件"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
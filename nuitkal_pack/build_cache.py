@@ -0,0 +1,220 @@
+"""C 编译中间文件缓存
+
+Nuitka 默认在临时目录中编译并通过 --remove-output 删除中间文件,
+每次缓存未命中都要从头编译全部 C 代码。构建缓存为每个模块保留独立的持久化构建目录(<模
+块>.build), 修改后再次编译时 Scons 只重新编译变化的 C 文件; 同时为 ccache
+指定独立的缓存目录与容量上限, 不同模块、不同构建目录之间也能复用目标文件:
+
+    <root>/modules/ab/<key>/    模块的持久化构建目录, 目录的修改时间作为最近使用时间
+    <root>/ccache/              ccache 缓存目录(需要安装 ccache)
+
+构建目录总大小超出上限时按 LRU 淘汰, ccache 的容量由 ccache 自身按 CCACHE_MAXSIZE 管理。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+
+from .artifact_cache import parse_size
+from .toolchain import Toolchain
+
+logger = logging.getLogger(__name__)
+
+# ccache --print-stats 输出中的命中与未命中统计项
+_CCACHE_HIT_KEYS = ("direct_cache_hit", "preprocessed_cache_hit")
+_CCACHE_MISS_KEYS = ("cache_miss",)
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += (Path(root) / name).stat().st_size
+            except OSError:
+                continue
+    return total
+
+
+class BuildCache:
+    """持久化的 Nuitka 构建目录与 ccache 缓存"""
+
+    def __init__(
+        self,
+        root: Path | str,
+        *,
+        max_bytes: int | str | None = None,
+        ccache_max_size: str | None = "5G",
+        ccache_binary: str | None = None,
+    ):
+        """初始化构建缓存
+
+        Args:
+            root: 缓存根目录
+            max_bytes: 构建目录总容量上限(字节或带单位的字符串), 为None时不限制
+            ccache_max_size: ccache 容量上限(ccache 格式, 如 5G), 为None时使用 ccache
+                的默认设置
+            ccache_binary: ccache 可执行文件路径, 默认从 PATH 中查找;
+                找不到时只使用持久化构建目录
+
+        """
+        self.root = Path(root).absolute()
+        self.modules_dir = self.root / "modules"
+        self.ccache_dir = self.root / "ccache"
+        self.max_bytes = parse_size(max_bytes) if max_bytes is not None else None
+        self.ccache_max_size = ccache_max_size
+        self.ccache_binary = ccache_binary or shutil.which("ccache")
+
+        self.modules_dir.mkdir(parents=True, exist_ok=True)
+
+        self.reused_count = 0  # 复用已有构建目录的次数(增量编译)
+        self.created_count = 0  # 新建构建目录的次数(完整编译)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(
+        rel_path: Path,
+        *,
+        toolchain: Toolchain | None = None,
+        options: list[str] | tuple[str, ...] = (),
+    ) -> str:
+        """计算模块构建目录的键
+
+        与编译产物缓存不同, 键中不包含源文件哈希: 源文件修改后仍使用同一个构建目录,
+        以便增量编译。
+        """
+        toolchain = toolchain or Toolchain.current()
+        payload = json.dumps(
+            {
+                "module": rel_path.as_posix(),
+                "toolchain": toolchain.tag,
+                "options": list(options),
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def module_dir(
+        self,
+        rel_path: Path,
+        *,
+        toolchain: Toolchain | None = None,
+        options: list[str] | tuple[str, ...] = (),
+    ) -> Path:
+        """获取模块的持久化构建目录, 不存在时创建"""
+        path = (
+            self.modules_dir
+            / (key := self.make_key(rel_path, toolchain=toolchain, options=options))[:2]
+            / key
+        )
+
+        with self._lock:
+            if path.exists():
+                self.reused_count += 1
+                # 更新修改时间, 作为LRU淘汰的依据
+                os.utime(path)
+            else:
+                self.created_count += 1
+                path.mkdir(parents=True)
+        return path
+
+    @property
+    def ccache_enabled(self) -> bool:
+        """是否可以使用 ccache"""
+        return self.ccache_binary is not None
+
+    def env(self) -> dict[str, str]:
+        """编译进程需要的环境变量"""
+        if not self.ccache_enabled:
+            return {}
+
+        env = {
+            "NUITKA_CCACHE_BINARY": str(self.ccache_binary),
+            "CCACHE_DIR": str(self.ccache_dir),
+            # 以构建根目录为基准改写路径, 不同构建目录中的相同代码也能命中
+            "CCACHE_BASEDIR": str(self.root),
+        }
+        if self.ccache_max_size:
+            env["CCACHE_MAXSIZE"] = self.ccache_max_size
+        return env
+
+    def ccache_stats(self) -> dict[str, int]:
+        """读取 ccache 统计信息, ccache 不可用时返回空字典"""
+        if not self.ccache_enabled:
+            return {}
+
+        try:
+            result = subprocess.run(
+                [str(self.ccache_binary), "--print-stats"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                check=True,
+                env={**os.environ, **self.env()},
+            )
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.warning(f"读取 ccache 统计信息失败: {e}")
+            return {}
+
+        stats: dict[str, int] = {}
+        for line in result.stdout.splitlines():
+            key, _, value = line.partition("\t")
+            if value.strip().isdigit():
+                stats[key] = int(value)
+        return stats
+
+    @staticmethod
+    def ccache_delta(before: dict[str, int], after: dict[str, int]) -> tuple[int, int]:
+        """计算两次统计之间 ccache 的 (命中次数, 未命中次数)"""
+        hits = sum(after.get(key, 0) - before.get(key, 0) for key in _CCACHE_HIT_KEYS)
+        misses = sum(
+            after.get(key, 0) - before.get(key, 0) for key in _CCACHE_MISS_KEYS
+        )
+        return hits, misses
+
+    def prune(self, max_bytes: int | str | None = None) -> int:
+        """按最近使用时间淘汰构建目录, 直到总大小不超过容量上限
+
+        Args:
+            max_bytes: 容量上限, 为None时使用初始化时的上限; 两者都为None时不淘汰
+
+        Returns:
+            释放的字节数
+
+        """
+        limit = parse_size(max_bytes) if max_bytes is not None else self.max_bytes
+        if limit is None:
+            return 0
+
+        module_dirs: list[tuple[float, Path, int]] = []
+        for path in self.modules_dir.glob("*/*"):
+            try:
+                module_dirs.append((path.stat().st_mtime, path, _dir_size(path)))
+            except OSError:
+                continue
+
+        total = sum(size for _, _, size in module_dirs)
+        freed = 0
+        for _, path, size in sorted(module_dirs, key=lambda item: item[0]):
+            if total <= limit:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            freed += size
+
+        if freed:
+            logger.info(f"构建缓存已淘汰 {freed} 字节")
+        return freed
+
+    def stats(self) -> dict[str, int]:
+        """构建目录统计信息"""
+        module_dirs = list(self.modules_dir.glob("*/*"))
+        return {
+            "modules": len(module_dirs),
+            "total_bytes": sum(_dir_size(path) for path in module_dirs),
+        }
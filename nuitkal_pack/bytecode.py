@@ -0,0 +1,125 @@
+"""字节码编译
+
+[core-pyc]、[user-xxx-pyc] 模式的文件不经过 Nuitka, 而是编译为目标解释器的 .pyc 文件,
+以无源码模块的方式打包:
+
+    pkg/module.py  ->  pkg/module.pyc
+
+客户端导入时直接加载字节码, 省去首次导入时的编译; 打包端编译整个项目只需数秒,
+适合不需要编译为扩展模块的文件。
+
+字节码格式随解释器版本变化, 因此在目标解释器(工具链的解释器)中执行 py_compile,
+多个编译进程并行处理。 .pyc 使用不检查源码的哈希校验模式(PEP 552), 内容不含时间戳,
+相同的源码总是生成相同的字节码。
+"""
+
+import json
+import logging
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# 在目标解释器中执行的编译脚本: 从标准输入读取任务列表, 编译失败的文件以 JSON
+# 输出到标准输出
+_COMPILE_SCRIPT = """
+import json, py_compile, sys
+errors = []
+for source, target, display_name in json.load(sys.stdin):
+    try:
+        py_compile.compile(
+            source,
+            cfile=target,
+            dfile=display_name,
+            doraise=True,
+            optimize=int(sys.argv[1]),
+            invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+        )
+    except py_compile.PyCompileError as e:
+        errors.append([display_name, e.msg])
+json.dump(errors, sys.stdout)
+"""
+
+
+@dataclass(frozen=True)
+class BytecodeJob:
+    """字节码编译任务
+
+    Attributes:
+        source: 源文件路径
+        target: 输出的 .pyc 文件路径
+        display_name: 写入字节码的文件名(相对路径), 用于异常回溯
+
+    """
+
+    source: "Path"
+    target: "Path"
+    display_name: str
+
+
+def compile_bytecode(
+    jobs: list[BytecodeJob],
+    *,
+    python: "Path | str",
+    optimize: int = 1,
+    workers: int = 1,
+) -> None:
+    """在目标解释器中将源文件编译为 .pyc 文件
+
+    任务平均分配给 workers 个编译进程, 每个进程只启动一次解释器。
+
+    Args:
+        jobs: 编译任务列表
+        python: 目标解释器路径
+        optimize: 优化级别, 与解释器的 -O 参数相同(1 移除 assert, 2 同时移除文档字符串)
+        workers: 并行的编译进程数
+
+    Raises:
+        RuntimeError: 编译进程异常退出, 或存在语法错误的文件
+
+    """
+    if not jobs:
+        return
+
+    workers = max(1, min(workers, len(jobs)))
+    chunks = [jobs[index::workers] for index in range(workers)]
+    for job in jobs:
+        job.target.parent.mkdir(parents=True, exist_ok=True)
+
+    def _run(chunk: list[BytecodeJob]) -> list[list[str]]:
+        payload = json.dumps(
+            [[str(job.source), str(job.target), job.display_name] for job in chunk]
+        )
+        result = subprocess.run(
+            # -I: 隔离模式, 不受当前目录与用户环境变量影响
+            [str(python), "-I", "-c", _COMPILE_SCRIPT, str(optimize)],
+            input=payload,
+            capture_output=True,
+            text=True,
+            encoding="utf-8",
+            check=False,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(
+                f"字节码编译进程异常退出({result.returncode}): {python}\n"
+                f"{result.stderr}"
+            )
+        return json.loads(result.stdout)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pyc") as executor:
+        errors = [
+            error
+            for chunk_errors in executor.map(_run, chunks)
+            for error in chunk_errors
+        ]
+
+    if errors:
+        raise RuntimeError(
+            "字节码编译失败\n"
+            + "\n\n".join(f"{name}:\n{message}" for name, message in errors)
+        )
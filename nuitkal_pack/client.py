@@ -4,12 +4,15 @@
 - 检查服务器更新
 - 上传新版本 (支持 ZIP 整包和解压后上传两种模式)
 - 配置管理
+- 查询与上传服务器上共享的编译产物缓存
 """
 
 import json
 import logging
 import subprocess
 import sys
+import threading
+from contextlib import ExitStack
 from dataclasses import dataclass
 from io import BytesIO
 from pathlib import Path
@@ -19,7 +22,17 @@ from urllib.parse import urljoin, urlparse
 import requests
 
 from nuitkal_pack_server.tools import zipfile
-from nuitkal_pack_server.tools.hash_utils import calculate_file_hash
+from nuitkal_pack_server.tools.delta_manifest import read_unchanged_manifest
+from nuitkal_pack_server.tools.hash_utils import (
+    DEFAULT_ALGORITHM,
+    HASH_ALGORITHMS,
+    content_algorithm,
+    hash_files,
+    new_hash,
+    normalize_content_id,
+    parse_content_id,
+)
+from nuitkal_pack_server.tools.zip_manifest import member_hashes, read_verified
 
 from .config import ConfigManager
 
@@ -231,17 +244,24 @@ class UpdateManager:
             # 下载并显示进度
             self._download_file_with_progress(url=download_url, target_path=target_path, progress_callback=progress_callback)
 
-        # 3. 更新本地版本配置
+        # 3. 更新本地版本配置: 并行校验所有本地已有的保留文件
+        local_hashes = self._hash_local_files(keep_files)
         for file_info in keep_files:
-            # 检查文件MD5是否匹配
+            # 检查文件哈希是否匹配
             local_file_path = self.local_dir / file_info["path"]
-            if local_file_path.exists():
-                with local_file_path.open("rb") as f:
-                    local_md5 = calculate_file_hash(f.read())
-                    if local_md5 == file_info["hash"]:
-                        continue
+            if file_info["path"] in local_hashes:
+                if local_hashes[file_info["path"]] == normalize_content_id(
+                    file_info["hash"]
+                ):
+                    continue
 
                 logger.warning(f"文件 {file_info['path']} 已存在但校验失败，需要更新")
+            elif local_file_path.exists():
+                algorithm = content_algorithm(file_info["hash"])
+                logger.warning(
+                    f"文件 {file_info['path']} 使用的哈希算法 {algorithm} "
+                    "本地不支持，无法校验，重新下载"
+                )
             else:
                 logger.warning(f"文件 {file_info['path']} 不存在，需要添加")
 
@@ -265,6 +285,37 @@ class UpdateManager:
 
         logger.info(f"更新检查已完成 当前版本: {update_info['active_version']}")
 
+    def _hash_local_files(self, files: list[FileInfo]) -> dict[str, str]:
+        """并行计算本地已有文件的哈希, 每个文件使用其服务器哈希中的算法
+
+        Returns:
+            {文件相对路径: 本地文件哈希值},
+            不包括本地不存在的文件与本地不支持其算法(如未安装 blake3)的文件
+
+        """
+        by_algorithm: dict[str, list[FileInfo]] = {}
+        for file_info in files:
+            algorithm = parse_content_id(file_info["hash"])[0]
+            if (
+                algorithm in HASH_ALGORITHMS
+                and (self.local_dir / file_info["path"]).exists()
+            ):
+                by_algorithm.setdefault(algorithm, []).append(file_info)
+
+        local_hashes: dict[str, str] = {}
+        for algorithm, infos in by_algorithm.items():
+            file_hashes = hash_files(
+                (self.local_dir / file_info["path"] for file_info in infos),
+                algorithm=algorithm,
+            )
+            local_hashes.update(
+                {
+                    file_info["path"]: file_hash.hash
+                    for file_info, file_hash in zip(infos, file_hashes, strict=True)
+                }
+            )
+        return local_hashes
+
     def check_and_update(
         self,
         *,
@@ -402,6 +453,81 @@ class UploadManager:
         self.server_url = server_url + ("" if server_url.endswith("/") else "/")
         self.app_id = app_id
         self.timeout = timeout
+        self._hash_algorithms: list[str] | None = None
+
+    def get_hash_algorithms(self) -> list[str]:
+        """与服务器协商文件哈希算法
+
+        Returns:
+            服务器与本地都支持的算法, 第一个为上传时计算哈希使用的算法;
+            服务器不支持协商(旧版本)时只有 SHA256
+
+        Raises:
+            requests.HTTPError: 请求失败
+            requests.Timeout: 请求超时
+
+        """
+        if self._hash_algorithms is not None:
+            return self._hash_algorithms
+
+        response = requests.get(
+            urljoin(self.server_url, "apps/hash-algorithms/"), timeout=self.timeout
+        )
+        if response.status_code == requests.codes.not_found:
+            algorithms = [DEFAULT_ALGORITHM]
+        else:
+            response.raise_for_status()
+            algorithms = [
+                algorithm
+                for algorithm in response.json()["algorithms"]
+                if algorithm in HASH_ALGORITHMS
+            ] or [DEFAULT_ALGORITHM]
+
+        logger.info(
+            f"文件哈希算法: {algorithms[0]}, 服务器可接受: {', '.join(algorithms)}"
+        )
+        self._hash_algorithms = algorithms
+        return algorithms
+
+    def get_active_manifest(self) -> dict[str, str]:
+        """获取服务器激活版本的文件清单
+
+        用于增量打包: 与激活版本路径、哈希都相同的文件不再打入 ZIP 包。
+
+        Returns:
+            {文件相对路径: 文件哈希值}, 应用暂无激活版本时返回空字典
+
+        Raises:
+            requests.HTTPError: 请求失败
+            requests.Timeout: 请求超时
+
+        """
+        # 不传版本号时服务器返回激活版本的完整文件清单
+        check_url = urljoin(self.server_url, f"apps/{self.app_id}/check-update/")
+
+        try:
+            response = requests.get(check_url, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.HTTPError as e:
+            error_msg = _extract_error_message(e, "获取激活版本清单失败")
+            if (
+                e.response is not None
+                and e.response.status_code == requests.codes.bad_request
+            ):
+                logger.warning(f"获取激活版本清单失败: {error_msg}, 将全量打包")
+                return {}
+            logger.exception(f"获取激活版本清单失败: {error_msg}")
+            raise requests.HTTPError(error_msg) from e
+
+        update_info: UpdateInfo = response.json()
+        manifest = {
+            file_info["path"]: file_info["hash"]
+            for file_info in update_info.get("add", []) + update_info.get("keep", [])
+        }
+        logger.info(
+            f"激活版本 {update_info['active_version']} 共 {len(manifest)} 个文件"
+        )
+        return manifest
 
     def upload_zip(
         self,
@@ -551,42 +677,53 @@ class UploadManager:
             UploadResult: 上传结果
 
         """
-        # 1. 解压 ZIP 并构建文件清单
+        # 1. 构建文件清单:
+        # 包内有哈希清单且算法为服务器可接受的算法时直接使用清单中的哈希, 不需要解压
+        algorithms = self.get_hash_algorithms()
         zip_obj = zipfile.ZipFile(zip_file)
-        logger.info(f"开始解压上传: zip_file={zip_file.name}, total_files={len(zip_obj.namelist())}")
-
-        # 2. 构建文件清单和表单数据
-        file_manifest: dict[str, str] = {}
-        files = {}
-        for file_path in zip_obj.namelist():
-            file_name = Path(file_path).name
-            file_data = zip_obj.read(file_path)
-            file_hash = calculate_file_hash(file_data)
-            file_form = {"file": (file_name, BytesIO(file_data))}
-
-            file_manifest[Path(file_path).as_posix()] = file_hash
+        hashes = member_hashes(zip_obj, algorithm=algorithms[0], algorithms=algorithms)
+        logger.info(
+            f"开始解压上传: zip_file={zip_file.name}, total_files={len(hashes)}"
+        )
 
-            if file_hash in files:
-                files[file_hash]["relative_path"].append(file_path)
-            else:
-                files[file_hash] = {
-                    "relative_path": [file_path],
-                    "file_form": file_form,
-                }
+        file_manifest = {
+            Path(file_path).as_posix(): file_hash
+            for file_path, file_hash in hashes.items()
+        }
+        files: dict[str, list[str]] = {}
+        for file_path, file_hash in hashes.items():
+            files.setdefault(file_hash, []).append(file_path)
+
+        # 增量包: 合并与激活版本相同的未变化文件
+        unchanged_manifest = read_unchanged_manifest(zip_obj)
+        for file_path, file_hash in unchanged_manifest.items():
+            file_manifest.setdefault(file_path, file_hash)
+        if unchanged_manifest:
+            logger.info(
+                f"增量包: 变化文件 {len(files)} 个, "
+                f"沿用激活版本文件 {len(unchanged_manifest)} 个"
+            )
 
-        # 3. 检查已存在文件
+        # 2. 检查已存在文件
         check_files_url = urljoin(self.server_url, "apps/check-files/")
         response = requests.post(check_files_url, json={"file_hashes": list(files.keys())}, timeout=self.timeout)
         response.raise_for_status()
         missing_files = response.json()["missing_files"]
 
-        # 4. 上传缺失文件
+        # 3. 只解压缺失的文件(并行校验哈希)并上传
         upload_url = urljoin(self.server_url, f"apps/{self.app_id}/upload-file/")
-        for hash_id in missing_files:
-            logger.info(f"上传文件: {', '.join(files[hash_id]['relative_path'])}")
+        pending = {files[hash_id][0]: hash_id for hash_id in missing_files}
+        for file_path, file_data in read_verified(zip_obj, pending):
+            logger.info(f"上传文件: {', '.join(files[pending[file_path]])}")
 
             try:
-                response = requests.post(upload_url, files=files[hash_id]["file_form"], timeout=self.timeout)
+                # 提供文件哈希, 服务器使用相同的算法计算并校验
+                response = requests.post(
+                    upload_url,
+                    data={"hash": pending[file_path]},
+                    files={"file": (Path(file_path).name, BytesIO(file_data))},
+                    timeout=self.timeout,
+                )
                 response.raise_for_status()
                 file_id = response.json()["id"]
                 logger.info(f"文件上传成功: {file_path} -> file_id={file_id}")
@@ -598,7 +735,7 @@ class UploadManager:
 
         logger.info(f"所有文件上传完成: count={len(file_manifest)}")
 
-        # 3. 创建版本记录
+        # 4. 创建版本记录
         create_url = urljoin(self.server_url, f"apps/{self.app_id}/create-version/")
         form_data = {
             "version": version,
@@ -627,3 +764,162 @@ class UploadManager:
             error_msg = _extract_error_message(e, "版本创建失败")
             logger.exception(f"版本创建失败: {error_msg}")
             raise requests.HTTPError(error_msg) from e
+
+
+class RemoteArtifactCache:
+    """服务器上的共享编译产物缓存
+
+    构建机编译前按缓存键查询服务器, 命中时下载产物并校验哈希;
+    编译完成后上传产物供其他构建机复用。
+    远程缓存只用于加速, 网络错误不会中断构建, 只记录警告并按未命中处理;
+    无法连接服务器或令牌无效时本次运行不再访问远程缓存。
+    """
+
+    def __init__(self, server_url: str, timeout: int = 30, *, token: str | None = None):
+        """初始化远程缓存客户端
+
+        Args:
+            server_url: 服务器基础 URL (如: http://localhost:8000/api/v1/)
+            timeout: 网络请求超时时间(秒)
+            token: 构建机令牌, 需要与服务器的 NUITKAL_PACK_BUILD_TOKENS 配置一致
+
+        """
+        self.server_url = server_url + ("" if server_url.endswith("/") else "/")
+        self.timeout = timeout
+        self.headers = {"Authorization": f"Bearer {token}"} if token else {}
+
+        self.hits = 0
+        self.misses = 0
+        self.uploads = 0
+        self.available = True
+        self._lock = threading.Lock()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _disable(self, reason: str) -> None:
+        """无法连接服务器或令牌无效时停用远程缓存, 避免每个模块都等待超时或重复被拒绝"""
+        with self._lock:
+            if not self.available:
+                return
+            self.available = False
+        logger.warning(f"{reason}, 本次运行不再使用远程编译缓存")
+
+    def _denied(self, response: requests.Response) -> bool:
+        """服务器拒绝访问时停用远程缓存"""
+        if response.status_code not in (
+            requests.codes.unauthorized,
+            requests.codes.forbidden,
+        ):
+            return False
+        self._disable(
+            f"远程编译缓存拒绝访问(HTTP {response.status_code}), 请检查构建机令牌"
+        )
+        return True
+
+    def fetch(self, key: str, target_dir: Path) -> list[Path] | None:
+        """下载缓存键对应的编译产物
+
+        Args:
+            key: 编译缓存键
+            target_dir: 产物下载目录
+
+        Returns:
+            按上传顺序排列的产物文件路径, 未命中或下载失败时返回None
+
+        """
+        if not self.available:
+            self._count("misses")
+            return None
+
+        try:
+            response = requests.get(
+                urljoin(self.server_url, f"artifacts/{key}/"),
+                headers=self.headers,
+                timeout=self.timeout,
+            )
+            if response.status_code == requests.codes.not_found or self._denied(
+                response
+            ):
+                self._count("misses")
+                return None
+            response.raise_for_status()
+
+            paths = []
+            for file_info in response.json()["files"]:
+                path = target_dir / Path(file_info["name"]).name
+                self._download(
+                    urljoin(self.server_url, file_info["url"]), path, file_info["hash"]
+                )
+                paths.append(path)
+
+        except (requests.ConnectionError, requests.Timeout) as e:
+            self._disable(f"无法连接远程编译缓存: {e}")
+            self._count("misses")
+            return None
+        except (requests.RequestException, OSError, ValueError, KeyError) as e:
+            logger.warning(f"读取远程编译缓存失败: {e}")
+            self._count("misses")
+            return None
+
+        self._count("hits")
+        return paths
+
+    def _download(self, url: str, target_path: Path, file_hash: str) -> None:
+        """流式下载文件并校验哈希"""
+        algorithm, digest = parse_content_id(file_hash)
+        hasher = new_hash(algorithm)
+        with requests.get(url, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            with target_path.open("wb") as file_handle:
+                for chunk in response.iter_content(chunk_size=65536):
+                    file_handle.write(chunk)
+                    hasher.update(chunk)
+
+        if hasher.hexdigest() != digest:
+            raise ValueError(f"编译产物哈希不一致: {target_path.name}")
+
+    def store(
+        self, key: str, files: list[Path], *, module: str, toolchain: str
+    ) -> bool:
+        """上传编译产物
+
+        Args:
+            key: 编译缓存键
+            files: 产物文件列表
+            module: 模块相对路径
+            toolchain: 工具链标签
+
+        Returns:
+            是否上传成功
+
+        """
+        if not self.available:
+            return False
+
+        try:
+            with ExitStack() as stack:
+                response = requests.post(
+                    urljoin(self.server_url, "artifacts/"),
+                    data={"key": key, "module": module, "toolchain": toolchain},
+                    files=[
+                        ("files", (path.name, stack.enter_context(path.open("rb"))))
+                        for path in files
+                    ],
+                    headers=self.headers,
+                    timeout=self.timeout,
+                )
+            if self._denied(response):
+                return False
+            response.raise_for_status()
+
+        except (requests.ConnectionError, requests.Timeout) as e:
+            self._disable(f"无法连接远程编译缓存: {e}")
+            return False
+        except (requests.RequestException, OSError) as e:
+            logger.warning(f"上传远程编译缓存失败: {e}")
+            return False
+
+        self._count("uploads")
+        return True
@@ -0,0 +1,292 @@
+"""常驻的 Nuitka 编译服务
+
+每次缓存未命中都启动一个新的 nuitka 进程时, 解释器启动、Nuitka
+自身的导入与插件初始化都要重复执行, 模块较小时这部分开销占编译时间的很大比例。
+编译服务启动一个预先导入 Nuitka 的常驻进程, 通过本地 Unix 套接字接收编译任务,
+为每个任务 fork 一个子进程执行 Nuitka 并返回输出:
+
+    打包器线程 --(套接字)--> 编译服务(已导入 Nuitka) --fork--> 子进程执行一次编译
+
+Nuitka 在进程内保存大量全局状态, 同一进程不能编译多次, 因此每个任务在 fork
+出的子进程中执行, 子进程继承已经导入的模块, 不再重复导入与初始化。
+服务只在解析任何编译选项之前导入固定的几个 Nuitka 模块,
+编译过程中按需导入的模块可能在导入时读取已解析的选项,
+不能导入到服务进程中供之后的任务共用。不支持 fork 的平台(Windows)不使用编译服务。
+
+本模块会以脚本方式在编译工具链的解释器中运行(python -S), 服务端代码只能依赖标准库。
+"""
+
+import atexit
+import logging
+import os
+import select
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import traceback
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import IO, cast
+
+logger = logging.getLogger(__name__)
+
+# 服务就绪后在标准输出中打印的标记
+READY_MARKER = "nuitkal-compile-server ready"
+
+
+class CompileServerError(RuntimeError):
+    """编译服务不可用"""
+
+
+class CompileServer:
+    """常驻的 Nuitka 编译服务客户端, 可以在多个线程中同时提交编译任务"""
+
+    def __init__(
+        self, python: Path | str = sys.executable, *, start_timeout: float = 60.0
+    ):
+        """初始化编译服务, 服务进程在第一次提交任务时启动
+
+        Args:
+            python: 运行 Nuitka 的 Python 解释器
+            start_timeout: 等待服务进程就绪的超时时间(秒)
+
+        """
+        self.python = str(python)
+        self.start_timeout = start_timeout
+        self.job_count = 0  # 已提交的编译任务数
+
+        self._process: subprocess.Popen[str] | None = None
+        self._socket_dir: tempfile.TemporaryDirectory[str] | None = None
+        self._socket_path: str | None = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def supported() -> bool:
+        """当前平台是否支持编译服务(需要 fork 与 Unix 套接字)"""
+        return hasattr(os, "fork") and hasattr(socket, "AF_UNIX")
+
+    @property
+    def running(self) -> bool:
+        """服务进程是否正在运行"""
+        return self._process is not None and self._process.poll() is None
+
+    def start(self) -> None:
+        """启动服务进程并等待就绪, 已经运行时直接返回"""
+        with self._lock:
+            if self.running:
+                return
+            self._stop()
+
+            if not self.supported():
+                raise CompileServerError("当前平台不支持编译服务")
+
+            self._socket_dir = tempfile.TemporaryDirectory(
+                prefix="nuitkal-compile-server-"
+            )
+            self._socket_path = str(Path(self._socket_dir.name) / "server.sock")
+            # 与 Nuitka 自身重新执行时的解释器参数一致(-S、关闭冻结模块、固定哈希种子),
+            # 避免 Nuitka 在子进程中再次重新执行
+            self._process = subprocess.Popen(
+                [
+                    self.python,
+                    "-X",
+                    "frozen_modules=off",
+                    "-S",
+                    __file__,
+                    self._socket_path,
+                ],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+                env={**os.environ, "PYTHONHASHSEED": "0"},
+            )
+
+            stdout = cast("IO[str]", self._process.stdout)
+            ready, _, _ = select.select([stdout], [], [], self.start_timeout)
+            line = stdout.readline() if ready else ""
+            if line.strip() != READY_MARKER:
+                self._stop()
+                raise CompileServerError(
+                    f"编译服务启动失败: {line.strip() or '等待就绪超时'}"
+                )
+
+            atexit.register(self.close)
+            logger.info(
+                f"编译服务已启动: pid={self._process.pid}, 解释器 {self.python}"
+            )
+
+    def run(
+        self,
+        args: list[str],
+        *,
+        cwd: Path | str | None = None,
+        env: dict[str, str] | None = None,
+    ) -> subprocess.CompletedProcess[str]:
+        """提交一次编译任务并等待完成
+
+        Args:
+            args: Nuitka 命令行参数(不包括 nuitka 命令本身)
+            cwd: 编译的工作目录
+            env: 编译使用的环境变量, 默认为当前进程的环境变量
+
+        Returns:
+            与 subprocess.run 相同的结果, stdout 中包含 Nuitka 的标准输出与标准错误
+
+        """
+        self.start()
+
+        job = {
+            "args": list(args),
+            "cwd": str(cwd) if cwd is not None else None,
+            "env": dict(env if env is not None else os.environ),
+        }
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(str(self._socket_path))
+            with Connection(sock.detach()) as conn:
+                conn.send(job)
+                result = conn.recv()
+        except (OSError, EOFError) as e:
+            raise CompileServerError(f"编译服务通信失败: {e}") from e
+
+        with self._lock:
+            self.job_count += 1
+        return subprocess.CompletedProcess(
+            ["nuitka", *args], result["returncode"], stdout=result["stdout"]
+        )
+
+    def close(self) -> None:
+        """停止服务进程, 正在执行的编译任务会继续执行到结束"""
+        with self._lock:
+            self._stop()
+
+    def _stop(self) -> None:
+        if self._process is not None:
+            if self._process.stdin is not None:
+                # 关闭标准输入通知服务进程退出
+                self._process.stdin.close()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+            if self._process.stdout is not None:
+                self._process.stdout.close()
+            self._process = None
+
+        if self._socket_dir is not None:
+            self._socket_dir.cleanup()
+            self._socket_dir = None
+            self._socket_path = None
+
+
+def _run_job(conn: Connection, job: dict, nuitka_main) -> None:  # noqa: ANN001
+    """在 fork 出的子进程中执行一次编译
+
+    Args:
+        conn: 与客户端的连接
+        job: 编译任务
+        nuitka_main: 已导入的 nuitka.__main__ 模块
+
+    """
+    os.environ.clear()
+    os.environ.update(job["env"])
+    os.environ["PYTHONHASHSEED"] = "0"
+    tempfile.tempdir = None  # 按任务的 TMPDIR 重新确定临时目录
+    if job["cwd"]:
+        os.chdir(job["cwd"])
+    sys.argv = ["nuitka", *job["args"]]
+
+    with tempfile.TemporaryFile() as output:
+        # 重定向文件描述符, Scons 与 C 编译器子进程的输出也一并收集
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(output.fileno(), 1)
+        os.dup2(output.fileno(), 2)
+
+        returncode = 0
+        try:
+            nuitka_main.main()
+        except SystemExit as e:
+            if isinstance(e.code, int):
+                returncode = e.code
+            elif e.code is not None:
+                print(e.code, file=sys.stderr)  # noqa: T201
+                returncode = 1
+        except BaseException:
+            traceback.print_exc()
+            returncode = 1
+
+        atexit._run_exitfuncs()  # noqa: SLF001
+        sys.stdout.flush()
+        sys.stderr.flush()
+        output.seek(0)
+        stdout = output.read().decode("utf-8", errors="replace")
+
+    conn.send({"returncode": returncode, "stdout": stdout})
+    conn.close()
+
+
+def _serve(socket_path: str) -> None:
+    """服务进程入口: 预先导入 Nuitka, 为每个编译任务 fork 一个子进程"""
+    # 以脚本方式运行时脚本所在目录位于 sys.path 开头, 移除以免遮蔽其他模块
+    sys.path.pop(0)
+    # 以 -S 启动以满足 Nuitka 的要求, 这里再补充 site-packages 路径, sys.flags.no_site
+    # 保持不变
+    import site
+
+    site.main()
+
+    import nuitka.__main__ as nuitka_main
+    import nuitka.options.Options
+    import nuitka.plugins.Plugins  # noqa: F401
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(64)
+    print(READY_MARKER, flush=True)  # noqa: T201
+    # 之后不再向客户端输出, 避免无人读取的管道被写满
+    os.dup2(os.open(os.devnull, os.O_WRONLY), 1)
+
+    children: set[int] = set()
+    try:
+        while True:
+            readable, _, _ = select.select([listener, sys.stdin], [], [], 1.0)
+
+            # 回收已结束的子进程
+            for pid in list(children):
+                if os.waitpid(pid, os.WNOHANG)[0]:
+                    children.discard(pid)
+
+            if sys.stdin in readable and not os.read(sys.stdin.fileno(), 1):
+                # 标准输入关闭, 客户端已退出
+                break
+
+            if listener in readable:
+                conn_socket, _ = listener.accept()
+                conn = Connection(conn_socket.detach())
+                try:
+                    message = conn.recv()
+                except (OSError, EOFError):
+                    conn.close()
+                    continue
+
+                pid = os.fork()
+                if pid == 0:
+                    listener.close()
+                    try:
+                        _run_job(conn, message, nuitka_main)
+                    finally:
+                        os._exit(0)
+                conn.close()
+                children.add(pid)
+    finally:
+        listener.close()
+        for pid in children:
+            os.waitpid(pid, 0)
+
+
+if __name__ == "__main__":
+    _serve(sys.argv[1])
@@ -0,0 +1,305 @@
+"""ZIP 成员压缩策略
+
+按扩展名规则为每个成员选择压缩方式, 并对未知类型的文件抽样试压缩:
+- 已压缩的格式(图片、音视频、压缩包等)直接存储, 不浪费 CPU
+- 二进制文件(.so/.pyd/.dll 等)使用快速压缩
+- 文本文件(.py/.pyi/.json 等)使用最高压缩级别
+- 其他文件根据抽样压缩率决定
+
+同时统计每条规则节省的字节数与消耗的 CPU 时间, 便于调整规则。
+"""
+
+import threading
+import zlib
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, TypedDict
+
+from nuitkal_pack_server.tools import zipfile
+
+if TYPE_CHECKING:
+    from .packager import BuildFile
+
+# 快速压缩与最高压缩的级别
+FAST_LEVEL = 1
+MAX_LEVEL = 9
+
+
+@dataclass(frozen=True)
+class CompressionRule:
+    """压缩规则
+
+    Attributes:
+        name: 规则名称, 用于统计
+        suffixes: 匹配的扩展名(小写, 包含点号)
+        compress_type: 压缩方式
+        compresslevel: 压缩级别
+        probe: 是否先抽样试压缩, 压缩率过低时改为直接存储
+
+    """
+
+    name: str
+    suffixes: frozenset[str]
+    compress_type: int
+    compresslevel: int | None = None
+    probe: bool = False
+
+
+@dataclass(frozen=True)
+class CompressionChoice:
+    """单个成员的压缩选择
+
+    Attributes:
+        rule: 命中的规则名称
+        compress_type: 压缩方式
+        compresslevel: 压缩级别
+
+    """
+
+    rule: str
+    compress_type: int
+    compresslevel: int | None
+
+
+class RuleReport(TypedDict):
+    """单条规则的压缩统计"""
+
+    rule: str  # 规则名称
+    members: int  # 成员数量
+    raw_bytes: int  # 原始字节数
+    compressed_bytes: int  # 压缩后字节数
+    saved_bytes: int  # 节省的字节数
+    cpu_seconds: float  # 消耗的 CPU 时间
+
+
+@dataclass
+class _RuleStats:
+    members: int = 0
+    raw_bytes: int = 0
+    compressed_bytes: int = 0
+    cpu_seconds: float = 0.0
+
+
+DEFAULT_RULES = (
+    CompressionRule(
+        name="compressed",
+        suffixes=frozenset(
+            {
+                ".zip",
+                ".gz",
+                ".tgz",
+                ".bz2",
+                ".xz",
+                ".7z",
+                ".rar",
+                ".zst",
+                ".whl",
+                ".egg",
+                ".jar",
+                ".jpg",
+                ".jpeg",
+                ".png",
+                ".gif",
+                ".webp",
+                ".ico",
+                ".heic",
+                ".mp3",
+                ".aac",
+                ".ogg",
+                ".flac",
+                ".m4a",
+                ".mp4",
+                ".mkv",
+                ".avi",
+                ".mov",
+                ".webm",
+                ".woff",
+                ".woff2",
+                ".pdf",
+                ".docx",
+                ".xlsx",
+                ".pptx",
+            }
+        ),
+        compress_type=zipfile.ZIP_STORED,
+    ),
+    CompressionRule(
+        name="binary",
+        suffixes=frozenset(
+            {
+                ".so",
+                ".pyd",
+                ".dll",
+                ".dylib",
+                ".exe",
+                ".bin",
+                ".dat",
+                ".db",
+                ".sqlite",
+                ".pyc",
+            }
+        ),
+        compress_type=zipfile.ZIP_DEFLATED,
+        compresslevel=FAST_LEVEL,
+        probe=True,
+    ),
+    CompressionRule(
+        name="text",
+        suffixes=frozenset(
+            {
+                ".py",
+                ".pyi",
+                ".pyw",
+                ".txt",
+                ".md",
+                ".rst",
+                ".json",
+                ".xml",
+                ".html",
+                ".htm",
+                ".css",
+                ".js",
+                ".csv",
+                ".tsv",
+                ".yaml",
+                ".yml",
+                ".toml",
+                ".ini",
+                ".cfg",
+                ".conf",
+                ".svg",
+                ".sql",
+                ".log",
+            }
+        ),
+        compress_type=zipfile.ZIP_DEFLATED,
+        compresslevel=MAX_LEVEL,
+    ),
+)
+
+
+@dataclass
+class CompressionPolicy:
+    """按成员选择压缩方式的压缩策略
+
+    Attributes:
+        rules: 扩展名规则, 按顺序匹配
+        probe_size: 抽样试压缩的字节数
+        stored_ratio: 抽样压缩率(压缩后/压缩前)不低于该值时直接存储
+        max_ratio: 未匹配规则的文件, 抽样压缩率低于该值时使用最高压缩级别,
+            否则使用快速压缩
+
+    """
+
+    rules: tuple[CompressionRule, ...] = DEFAULT_RULES
+    probe_size: int = 64 * 1024
+    stored_ratio: float = 0.9
+    max_ratio: float = 0.5
+
+    _stats: dict[str, _RuleStats] = field(default_factory=dict, init=False, repr=False)
+    _choices: dict[tuple[str, str], CompressionChoice] = field(
+        default_factory=dict, init=False, repr=False
+    )
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False
+    )
+
+    @classmethod
+    def uniform(cls, compresslevel: int | None = MAX_LEVEL) -> "CompressionPolicy":
+        """所有成员使用相同压缩级别的策略"""
+        return cls(
+            rules=(
+                CompressionRule(
+                    name="uniform",
+                    suffixes=frozenset(),
+                    compress_type=zipfile.ZIP_DEFLATED,
+                    compresslevel=compresslevel,
+                ),
+            )
+        )
+
+    def choose(self, file: "BuildFile") -> CompressionChoice:
+        """为文件选择压缩方式, 相同内容与扩展名的文件只判断一次"""
+        suffix = file.rel_path.suffix.lower()
+        key = (file.file_hash, suffix)
+
+        choice = self._choices.get(key)
+        if choice is None:
+            choice = self._choices.setdefault(key, self._choose(file, suffix))
+        return choice
+
+    def _choose(self, file: "BuildFile", suffix: str) -> CompressionChoice:
+        for rule in self.rules:
+            # 没有扩展名的规则匹配所有文件
+            if rule.suffixes and suffix not in rule.suffixes:
+                continue
+
+            if rule.probe and self._probe(file) >= self.stored_ratio:
+                return CompressionChoice(
+                    rule=f"{rule.name}:stored",
+                    compress_type=zipfile.ZIP_STORED,
+                    compresslevel=None,
+                )
+            return CompressionChoice(
+                rule=rule.name,
+                compress_type=rule.compress_type,
+                compresslevel=rule.compresslevel,
+            )
+
+        # 未匹配任何规则: 根据抽样压缩率决定
+        ratio = self._probe(file)
+        if ratio >= self.stored_ratio:
+            return CompressionChoice(
+                rule="probe:stored",
+                compress_type=zipfile.ZIP_STORED,
+                compresslevel=None,
+            )
+        if ratio < self.max_ratio:
+            return CompressionChoice(
+                rule="probe:max",
+                compress_type=zipfile.ZIP_DEFLATED,
+                compresslevel=MAX_LEVEL,
+            )
+        return CompressionChoice(
+            rule="probe:fast",
+            compress_type=zipfile.ZIP_DEFLATED,
+            compresslevel=FAST_LEVEL,
+        )
+
+    def _probe(self, file: "BuildFile") -> float:
+        """抽样快速压缩, 返回压缩率(压缩后/压缩前)"""
+        with file.open() as f:
+            sample = f.read(self.probe_size)
+
+        if not sample:
+            return 1.0
+
+        compressor = zlib.compressobj(FAST_LEVEL, zlib.DEFLATED, -15)
+        compressed = compressor.compress(sample) + compressor.flush()
+        return len(compressed) / len(sample)
+
+    def record(
+        self, rule: str, *, raw_bytes: int, compressed_bytes: int, cpu_seconds: float
+    ) -> None:
+        """记录一次压缩的统计信息"""
+        with self._lock:
+            stats = self._stats.setdefault(rule, _RuleStats())
+            stats.members += 1
+            stats.raw_bytes += raw_bytes
+            stats.compressed_bytes += compressed_bytes
+            stats.cpu_seconds += cpu_seconds
+
+    def report(self) -> list[RuleReport]:
+        """各规则的压缩统计, 按节省字节数降序排列"""
+        with self._lock:
+            reports: list[RuleReport] = [
+                {
+                    "rule": rule,
+                    "members": stats.members,
+                    "raw_bytes": stats.raw_bytes,
+                    "compressed_bytes": stats.compressed_bytes,
+                    "saved_bytes": stats.raw_bytes - stats.compressed_bytes,
+                    "cpu_seconds": stats.cpu_seconds,
+                }
+                for rule, stats in self._stats.items()
+            ]
+        return sorted(reports, key=lambda item: item["saved_bytes"], reverse=True)
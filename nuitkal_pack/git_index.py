@@ -0,0 +1,110 @@
+"""读取 git 索引
+
+源码位于 git 仓库中时, git 索引已经记录了每个已跟踪文件的 blob ID,
+并通过索引中的文件状态快速判断工作区文件是否被修改。扫描器可以直接使用 git 索引枚举文件,
+并以 blob ID 作为文件内容的变化依据:
+未修改的文件即使修改时间变化(如重新检出、CI 中恢复缓存), 也不需要重新计算哈希。
+
+只使用 git ls-files 读取当前目录下的文件, 输出的路径都相对于查询的目录:
+    git ls-files --stage            已跟踪文件及其 blob ID
+    git ls-files --modified         工作区中已修改的已跟踪文件
+    git ls-files --deleted          工作区中已删除的已跟踪文件
+    git ls-files --others --directory  未跟踪的文件, 整个目录都未跟踪时只列出目录
+"""
+
+import shutil
+import subprocess
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+# 子模块与符号链接在索引中的文件模式
+GITLINK_MODE = "160000"
+SYMLINK_MODE = "120000"
+
+
+class GitIndexError(RuntimeError):
+    """无法读取 git 索引(git 不可用或目录不在 git 仓库中)"""
+
+
+@dataclass
+class GitWorktree:
+    """工作区文件状态, 路径均为相对于查询目录的 POSIX 路径
+
+    Attributes:
+        blobs: 未修改的已跟踪文件 {路径: blob ID}
+        dirty: 已修改的已跟踪文件(以及无法用 blob ID 判断内容的符号链接、合并冲突文件)
+        untracked_files: 未跟踪的文件(包括被 .gitignore 忽略的文件)
+        untracked_dirs: 整个目录都未跟踪的目录, 以及子模块目录, 需要遍历文件系统
+
+    """
+
+    blobs: dict[str, str] = field(default_factory=dict)
+    dirty: list[str] = field(default_factory=list)
+    untracked_files: list[str] = field(default_factory=list)
+    untracked_dirs: list[str] = field(default_factory=list)
+
+
+def _ls_files(directory: "Path", *args: str) -> list[str]:
+    git = shutil.which("git")
+    if git is None:
+        raise GitIndexError("找不到 git 命令")
+
+    try:
+        result = subprocess.run(
+            [git, "-C", str(directory), "ls-files", "-z", *args],
+            capture_output=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        stderr = getattr(e, "stderr", b"") or b""
+        message = stderr.decode("utf-8", errors="replace").strip() or e
+        raise GitIndexError(f"读取 git 索引失败: {message}") from e
+
+    return [
+        item.decode("utf-8", errors="surrogateescape")
+        for item in result.stdout.split(b"\0")
+        if item
+    ]
+
+
+def read_worktree(directory: "Path") -> GitWorktree:
+    """读取目录下文件的 git 状态
+
+    Raises:
+        GitIndexError: git 不可用或目录不在 git 仓库中
+
+    """
+    worktree = GitWorktree()
+
+    staged: dict[str, str] = {}
+    for line in _ls_files(directory, "--stage"):
+        # <mode> <object> <stage>\t<path>; 合并冲突的文件有多个 stage, 视为已修改
+        info, _, path = line.partition("\t")
+        mode, blob, stage = info.split(" ")
+        if mode == GITLINK_MODE:
+            worktree.untracked_dirs.append(path)
+        elif mode == SYMLINK_MODE or stage != "0" or path in staged:
+            # 符号链接的 blob 是链接目标路径而不是文件内容
+            staged[path] = ""
+        else:
+            staged[path] = blob
+
+    changed = set(_ls_files(directory, "--modified")) | set(
+        _ls_files(directory, "--deleted")
+    )
+    for path, blob in staged.items():
+        if path in changed or not blob:
+            worktree.dirty.append(path)
+        else:
+            worktree.blobs[path] = blob
+
+    for path in _ls_files(directory, "--others", "--directory"):
+        if path.endswith("/"):
+            worktree.untracked_dirs.append(path.rstrip("/"))
+        else:
+            worktree.untracked_files.append(path)
+
+    return worktree
@@ -0,0 +1,339 @@
+r"""导入耗时基准测试
+
+对比打包结果中每个 Nuitka 编译模块与其源码的导入耗时, 找出编译后反而更慢的模块:
+
+    compiled/   解压后的打包结果(扩展模块)
+    source/     同一份打包结果, 扩展模块替换为源码目录中对应的 .py 文件
+
+每次测量都启动一个新的解释器, 只导入一个模块:
+- 冷启动: 不使用字节码缓存(-B), 源码需要在导入时编译, 对应客户端第一次导入
+- 热启动: 预先导入一次生成 __pycache__, 对应客户端之后的每次启动
+
+导入耗时包含该模块导入的、尚未导入的其他模块, 父包在计时前导入, 不计入耗时。
+
+命令行用法:
+    python -m nuitkal_pack import-bench dist/a.zip --source-dir src --repeat 5 \
+        --output import-bench.json
+"""
+
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Mapping, TypedDict
+
+from nuitkal_pack_server.tools import zipfile
+
+if TYPE_CHECKING:
+    from .packager import BuildFile
+
+# 结果文件格式版本
+RESULTS_VERSION = 1
+
+# 扩展模块后缀
+EXTENSION_SUFFIXES = (".so", ".pyd")
+
+# 在新的解释器中执行的计时脚本, 输出导入耗时(纳秒)
+_IMPORT_SCRIPT = """
+import importlib, sys, time
+root, name = sys.argv[1], sys.argv[2]
+sys.path.insert(0, root)
+parent = name.rpartition(".")[0]
+if parent:
+    importlib.import_module(parent)
+start = time.perf_counter_ns()
+importlib.import_module(name)
+print(time.perf_counter_ns() - start)
+"""
+
+
+class ModuleImportResult(TypedDict):
+    """单个模块的测量结果, 耗时为多次测量的中位数(秒)"""
+
+    module: str  # 模块名
+    path: str  # 扩展模块在打包结果中的路径
+    compiled_cold: float | None
+    compiled_warm: float | None
+    source_cold: float | None
+    source_warm: float | None
+    speedup_cold: float | None  # 源码耗时 / 编译后耗时, 小于 1 表示编译后更慢
+    speedup_warm: float | None
+    regression: bool  # 热启动时编译后比源码慢超过容差
+    error: str | None  # 导入失败时的错误信息
+
+
+def _module_name(rel_path: str) -> str:
+    """扩展模块路径转换为模块名: pkg/mod.cpython-311-x86_64-linux-gnu.so -> pkg.mod"""
+    parts = rel_path.split("/")
+    return ".".join([*parts[:-1], parts[-1].split(".", 1)[0]])
+
+
+def extract_bundle(
+    bundle: Path | str | BinaryIO | Mapping[str, "list[BuildFile]"], target_dir: Path
+) -> None:
+    """将打包结果写入目录
+
+    Args:
+        bundle: to_zip 生成的 ZIP 包(路径或文件对象), 或 PythonPackager.core_map
+            等文件映射
+        target_dir: 目标目录
+
+    """
+    target_dir.mkdir(parents=True, exist_ok=True)
+    if isinstance(bundle, Mapping):
+        for files in bundle.values():
+            for file in files:
+                path = target_dir / file.rel_path
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with file.open() as src, path.open("wb") as dst:
+                    shutil.copyfileobj(src, dst)
+        return
+
+    if isinstance(bundle, io.BytesIO):
+        bundle.seek(0)
+    with zipfile.ZipFile(bundle) as zf:
+        zf.extractall(target_dir)
+
+
+def _make_source_variant(
+    compiled_dir: Path, source_dir: Path, target_dir: Path, extensions: list[str]
+) -> dict[str, str]:
+    """复制打包结果, 并将扩展模块替换为源码
+
+    合并编译的包(pkg.so)替换为源码目录中整个包的 .py 文件。
+
+    Returns:
+        找不到源码的扩展模块 {路径: 错误信息}
+
+    """
+    shutil.copytree(compiled_dir, target_dir)
+    missing: dict[str, str] = {}
+    for rel_path in extensions:
+        extension = target_dir / rel_path
+        module_dir = Path(rel_path).parent
+        stem = Path(rel_path).name.split(".", 1)[0]
+
+        extension.unlink()
+        (target_dir / module_dir / f"{stem}.pyi").unlink(missing_ok=True)
+
+        if (source := source_dir / module_dir / f"{stem}.py").is_file():
+            shutil.copy2(source, target_dir / module_dir / source.name)
+        elif (package := source_dir / module_dir / stem).is_dir():
+            for source in package.rglob("*.py"):
+                path = target_dir / module_dir / stem / source.relative_to(package)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(source, path)
+        else:
+            missing[rel_path] = f"源码目录中找不到 {module_dir / stem}.py"
+    return missing
+
+
+def _clear_bytecode(root: Path) -> None:
+    for cache_dir in root.rglob("__pycache__"):
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def _time_import(
+    python: str, root: Path, name: str, *, cold: bool, timeout: float
+) -> int:
+    """在新的解释器中导入模块, 返回导入耗时(纳秒)
+
+    Raises:
+        RuntimeError: 导入失败
+
+    """
+    # -I: 隔离模式, 不受当前目录与用户环境变量影响
+    cmd = [
+        python,
+        "-I",
+        *(["-B"] if cold else []),
+        "-c",
+        _IMPORT_SCRIPT,
+        str(root),
+        name,
+    ]
+    result = subprocess.run(
+        cmd,
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+        check=False,
+        timeout=timeout,
+        cwd=root,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(
+            (result.stderr.strip().splitlines() or [f"退出码 {result.returncode}"])[-1]
+        )
+    return int(result.stdout.strip())
+
+
+def _measure(
+    python: str, root: Path, name: str, *, repeat: int, timeout: float
+) -> tuple[float, float]:
+    """测量 (冷启动, 热启动) 导入耗时的中位数(秒)"""
+    _clear_bytecode(root)
+    cold = [
+        _time_import(python, root, name, cold=True, timeout=timeout)
+        for _ in range(repeat)
+    ]
+
+    # 预先导入一次, 生成字节码缓存
+    _time_import(python, root, name, cold=False, timeout=timeout)
+    warm = [
+        _time_import(python, root, name, cold=False, timeout=timeout)
+        for _ in range(repeat)
+    ]
+    return statistics.median(cold) / 1e9, statistics.median(warm) / 1e9
+
+
+def run_import_benchmark(
+    bundle: Path | str | BinaryIO | Mapping[str, "list[BuildFile]"],
+    source_dir: Path | str,
+    *,
+    python: Path | str = sys.executable,
+    modules: list[str] | tuple[str, ...] = (),
+    repeat: int = 5,
+    tolerance: float = 0.1,
+    timeout: float = 60.0,
+) -> dict:
+    """测量打包结果中每个扩展模块编译前后的导入耗时
+
+    Args:
+        bundle: to_zip 生成的 ZIP 包(路径或文件对象), 或 PythonPackager.core_map
+            等文件映射
+        source_dir: 源码目录, 提供扩展模块对应的源码
+        python: 运行测量的解释器, 应与编译扩展模块的解释器一致
+        modules: 只测量指定的模块(模块名), 为空时测量全部扩展模块
+        repeat: 每种情况的测量次数, 取中位数
+        tolerance: 热启动导入耗时超过源码的 (1 + tolerance) 倍时视为退化
+        timeout: 单次导入的超时时间(秒)
+
+    Returns:
+        可直接写入 JSON 的结果字典, "modules" 为各模块的测量结果, "regressions"
+        为编译后更慢的模块名
+
+    """
+    source_dir = Path(source_dir).absolute()
+    python = str(python)
+    repeat = max(repeat, 1)
+    results: list[ModuleImportResult] = []
+
+    with tempfile.TemporaryDirectory(prefix="nuitkal-import-bench-") as temp_dir:
+        compiled_dir = Path(temp_dir) / "compiled"
+        source_variant_dir = Path(temp_dir) / "source"
+        extract_bundle(bundle, compiled_dir)
+
+        extensions = sorted(
+            path.relative_to(compiled_dir).as_posix()
+            for path in compiled_dir.rglob("*")
+            if path.suffix in EXTENSION_SUFFIXES and path.is_file()
+        )
+        if modules:
+            extensions = [
+                rel_path for rel_path in extensions if _module_name(rel_path) in modules
+            ]
+        missing = _make_source_variant(
+            compiled_dir, source_dir, source_variant_dir, extensions
+        )
+
+        for rel_path in extensions:
+            name = _module_name(rel_path)
+            result: ModuleImportResult = {
+                "module": name,
+                "path": rel_path,
+                "compiled_cold": None,
+                "compiled_warm": None,
+                "source_cold": None,
+                "source_warm": None,
+                "speedup_cold": None,
+                "speedup_warm": None,
+                "regression": False,
+                "error": missing.get(rel_path),
+            }
+            results.append(result)
+            if result["error"] is not None:
+                continue
+
+            try:
+                result["compiled_cold"], result["compiled_warm"] = _measure(
+                    python, compiled_dir, name, repeat=repeat, timeout=timeout
+                )
+                result["source_cold"], result["source_warm"] = _measure(
+                    python, source_variant_dir, name, repeat=repeat, timeout=timeout
+                )
+            except (RuntimeError, subprocess.TimeoutExpired, ValueError) as e:
+                result["error"] = f"导入失败: {e}"
+                continue
+
+            result["speedup_cold"] = (
+                result["source_cold"] / result["compiled_cold"]
+                if result["compiled_cold"]
+                else None
+            )
+            result["speedup_warm"] = (
+                result["source_warm"] / result["compiled_warm"]
+                if result["compiled_warm"]
+                else None
+            )
+            result["regression"] = result["compiled_warm"] > result["source_warm"] * (
+                1 + tolerance
+            )
+
+    return {
+        "version": RESULTS_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": python,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "repeat": repeat,
+        "tolerance": tolerance,
+        "modules": results,
+        "regressions": [result["module"] for result in results if result["regression"]],
+    }
+
+
+def format_results(results: dict) -> str:
+    """将测量结果格式化为文本表格"""
+    lines = [
+        f"{'模块':<38}{'编译(冷)':>10}{'源码(冷)':>10}{'加速':>8}{'编译(热)':>10}{'源码(热)':>10}{'加速':>8}"
+    ]  # 中文字符占两列
+
+    def _ms(value: float | None) -> str:
+        return "-" if value is None else f"{value * 1000:.2f}ms"
+
+    def _ratio(value: float | None) -> str:
+        return "-" if value is None else f"{value:.2f}x"
+
+    for result in results["modules"]:
+        if result["error"] is not None:
+            lines.append(f"{result['module']:<40}{result['error']}")
+            continue
+        mark = "  ← 退化" if result["regression"] else ""
+        lines.append(
+            f"{result['module']:<40}{_ms(result['compiled_cold']):>12}{_ms(result['source_cold']):>12}{_ratio(result['speedup_cold']):>10}"
+            f"{_ms(result['compiled_warm']):>12}{_ms(result['source_warm']):>12}{_ratio(result['speedup_warm']):>10}{mark}"
+        )
+
+    regressions = results["regressions"]
+    lines += [
+        "",
+        (
+            f"编译后导入更慢的模块({len(regressions)} 个, "
+            f"容差 {results['tolerance']:.0%}): {', '.join(regressions) or '无'}"
+        ),
+    ]
+    return "\n".join(lines)
+
+
+def write_results(results: dict, path: Path) -> None:
+    """写入结果文件"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
@@ -0,0 +1,199 @@
+"""多解释器构建矩阵
+
+客户端运行多个 Python 版本时, 每个版本都需要一套用对应解释器编译的扩展模块。
+构建矩阵为每个目标解释器创建一个打包器, 源码只扫描、哈希一次, 所有 (模块 × 解释器) 的
+Nuitka 编译任务在同一个线程池中调度:
+
+    扫描(一次)
+      -> [cpython-311 编译任务, cpython-312 编译任务, ...]
+      -> 共用的编译线程池
+      -> 每个解释器的用户 ZIP 包
+
+所有目标需要的文件哈希在分发编译任务前计算一次, 各目标共用的扫描器只复用索引中的摘要;
+扫描器的索引由锁保护。编译缓存键包含工具链的 ABI 标签(解释器版本、扩展模块后缀、平台),
+不同解释器的产物共用同一个缓存目录而不会混淆; 各解释器共用同一个 ZIP 构建器,
+静态文件等内容相同的成员只压缩一次。
+
+用法:
+    matrix = BuildMatrix(source_dir, ["python3.11", "python3.12"])
+    matrix.compile(static_files=["/static"], workers=8)
+    # 写入 dist/cpython-311/<用户名>.zip、dist/cpython-312/<用户名>.zip
+    matrix.write_zips("dist")
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, MutableMapping
+
+from .packager import PythonPackager
+from .toolchain import Toolchain
+
+if TYPE_CHECKING:
+    import io
+
+
+class BuildMatrix:
+    """多个目标解释器共用一次扫描与一个编译线程池的构建矩阵"""
+
+    def __init__(
+        self,
+        source_dir: Path,
+        pythons: Iterable[Path | str | Toolchain],
+        **packager_options: object,
+    ):
+        """初始化构建矩阵
+
+        Args:
+            source_dir: 源代码目录
+            pythons: 目标解释器(路径、PATH 中的命令名或 Toolchain),
+                第一个解释器的打包器负责扫描
+            packager_options: 传给每个 PythonPackager 的参数(如 cache_dir、
+                remote_cache_url), 不能包含 toolchain
+
+        Raises:
+            ValueError: 没有目标解释器, 或多个解释器的缓存标签相同
+
+        """
+        toolchains = [
+            python if isinstance(python, Toolchain) else Toolchain.probe(python)
+            for python in pythons
+        ]
+        if not toolchains:
+            raise ValueError("至少需要一个目标解释器")
+
+        # 以解释器缓存标签(如 cpython-311)作为目标名称
+        names = [toolchain.cache_tag for toolchain in toolchains]
+        if duplicates := sorted({name for name in names if names.count(name) > 1}):
+            raise ValueError(f"目标解释器重复: {', '.join(duplicates)}")
+
+        self.packagers: dict[str, PythonPackager] = {}
+        for name, toolchain in zip(names, toolchains, strict=True):
+            packager = PythonPackager(
+                source_dir, toolchain=toolchain, **packager_options
+            )
+            if self.packagers:
+                # 共用第一个打包器的扫描器(扫描索引与文件哈希)和 ZIP
+                # 构建器(已压缩的成员)
+                primary = self.primary
+                packager.scanner = primary.scanner
+                packager.zip_builder = primary.zip_builder
+            self.packagers[name] = packager
+
+        self.logger = self.primary.logger
+        targets = ", ".join(
+            f"{name}({packager.toolchain.python})"
+            for name, packager in self.packagers.items()
+        )
+        self.logger.info(f"构建矩阵: {targets}")
+
+    @property
+    def primary(self) -> PythonPackager:
+        """负责扫描的打包器"""
+        return next(iter(self.packagers.values()))
+
+    def compile(
+        self,
+        rglob_pattern: list[str] | tuple[str, ...] = ("*",),
+        *,
+        build_dir: Path | None = None,
+        static_files: list[str] | tuple[str, ...] = (),
+        exclude_files: list[str] | tuple[str, ...] = (),
+        workers: int | None = None,
+        **compile_options: object,
+    ) -> None:
+        """扫描一次源码, 为所有目标解释器编译
+
+        Args:
+            rglob_pattern: 需要扫描的文件匹配模式
+            build_dir: 编译输出目录, 每个目标解释器使用其下以目标名称命名的子目录
+            static_files: 静态文件匹配模式
+            exclude_files: 排除文件匹配模式
+            workers: 所有目标解释器共用的编译线程数, 为None时使用CPU核心数
+            compile_options: 传给每个 PythonPackager.compile 的其他参数(如
+                nuitka_options、batch_packages)
+
+        """
+        primary = self.primary
+        scan = primary.scan(
+            rglob_pattern, static_files=static_files, exclude_files=exclude_files
+        )
+        workers = max(1, workers or os.cpu_count() or 1)
+
+        # 在分发给各目标之前计算全部文件哈希, 各目标不再重复计算同一文件;
+        # 编译模式使用完整内容, 源码模式跳过首行标签
+        compiled = {
+            entry.full_path: entry
+            for _, mode, entry in scan.entries
+            if mode in ("pyd", "pyc")
+        }
+        source = {
+            entry.full_path: entry
+            for _, mode, entry in scan.entries
+            if mode not in ("pyd", "pyc")
+        }
+        primary.scanner.digest_many(scan.static_entries, workers=workers)
+        primary.scanner.digest_many(compiled.values(), workers=workers)
+        primary.scanner.digest_many(source.values(), jump_first=True, workers=workers)
+
+        # 每个目标解释器在独立的线程中提交编译任务, 任务在共用的线程池中执行
+        with (
+            ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="nuitka"
+            ) as executor,
+            ThreadPoolExecutor(
+                max_workers=len(self.packagers), thread_name_prefix="target"
+            ) as targets,
+        ):
+            futures = [
+                targets.submit(
+                    packager.compile,
+                    build_dir=build_dir / name if build_dir else None,
+                    workers=workers,
+                    scan=scan,
+                    executor=executor,
+                    **compile_options,
+                )
+                for name, packager in self.packagers.items()
+            ]
+            for future in futures:
+                future.result()
+
+        primary.scanner.save()
+        self.logger.info(f"构建矩阵编译完成: {len(self.packagers)} 个目标解释器")
+
+    def to_zip(
+        self, user_name: str | None = None, **zip_options: object
+    ) -> "dict[str, MutableMapping[str, io.BytesIO] | io.BytesIO]":
+        """为每个目标解释器创建ZIP压缩包
+
+        Args:
+            user_name: 指定用户名称, 为None时返回所有用户的ZIP包
+            zip_options: 传给 PythonPackager.to_zip 的其他参数
+
+        Returns:
+            {目标名称: PythonPackager.to_zip 的结果}
+
+        """
+        return {
+            name: packager.to_zip(user_name, **zip_options)
+            for name, packager in self.packagers.items()
+        }
+
+    def write_zips(
+        self, output_dir: Path | str, **zip_options: object
+    ) -> dict[str, dict[str, Path | None]]:
+        """将每个目标解释器的用户ZIP包写入 <output_dir>/<目标名称>/<用户名>.zip
+
+        Args:
+            output_dir: 输出目录
+            zip_options: 传给 PythonPackager.write_zips 的其他参数
+
+        Returns:
+            {目标名称: {用户名: 输出路径}}
+
+        """
+        return {
+            name: packager.write_zips(Path(output_dir) / name, **zip_options)
+            for name, packager in self.packagers.items()
+        }
@@ -4,130 +4,490 @@
 # ============= Windows ============= #
 # pip install nuitka
 
-import hashlib
 import io
+import itertools
 import logging
+import os
 import platform
 import re
 import subprocess
-import sys
-import zipfile
+import tempfile
+import threading
+import time
 from collections import defaultdict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import nullcontext
 from dataclasses import dataclass
-from functools import cache
 from pathlib import Path
 from tempfile import TemporaryDirectory
-from typing import Iterator, MutableMapping, cast, overload
+from typing import (
+    TYPE_CHECKING,
+    BinaryIO,
+    Callable,
+    Iterable,
+    Iterator,
+    Mapping,
+    MutableMapping,
+    cast,
+    overload,
+)
 
 import diskcache
 import pathspec
 
+from nuitkal_pack_server.tools.delta_manifest import (
+    UNCHANGED_MANIFEST_NAME,
+    dump_unchanged_manifest,
+)
+from nuitkal_pack_server.tools.hash_utils import (
+    DEFAULT_ALGORITHM,
+    calculate_file_hash,
+    hash_file,
+    new_hash,
+)
+
+from . import slimming, tracing
+from .artifact_cache import ArtifactCache
+from .build_cache import BuildCache
+from .bytecode import BytecodeJob, compile_bytecode
+from .client import RemoteArtifactCache, UploadManager
+from .compile_server import CompileServer, CompileServerError
+from .scanner import FileDigest, ScanEntry, SourceScanner
+from .toolchain import Toolchain
+from .tracing import Tracer
+from .zip_builder import ZipBuilder
+
+if TYPE_CHECKING:
+    from .compression import CompressionPolicy
+
 # 日志配置
 LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
 LOG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
+# 流式读取文件的块大小
+CHUNK_SIZE = 1024 * 1024
+
+# 合并编译一个包所需的最少模块数, 只有一个模块时合并没有收益
+MIN_BATCH_MODULES = 2
 
-def calculate_hash(file_path: Path | bytes | str, buffer_size: int = 65536) -> str:
-    """计算文件的哈希值(内存优化版,适用于大文件)
+
+def calculate_hash(file_path: Path | bytes | str) -> str:
+    """计算文件或数据的哈希值(文件分块读取,适用于大文件)
 
     Args:
-        file_path: 文件路径
-        buffer_size: 读取缓冲区大小,默认64KB
+        file_path: 文件路径, 或需要计算哈希的数据(字符串按UTF-8编码)
 
     Returns:
-        文件的MD5哈希值
+        SHA256哈希值
 
     """
-    md5 = hashlib.sha256()
-
+    if isinstance(file_path, Path):
+        return hash_file(file_path).hash
     if isinstance(file_path, str):
         file_path = file_path.encode("utf-8")
-
-    if isinstance(file_path, Path):
-        with file_path.open("rb") as f:
-            for chunk in iter(lambda: f.read(buffer_size), b""):
-                md5.update(chunk)
-    else:
-        md5.update(file_path)
-
-    return md5.hexdigest()
+    return calculate_file_hash(file_path)
 
 
 @dataclass
 class BuildFile:
+    """待打包的文件
+
+    只记录文件路径、大小与流式计算的哈希值, 文件内容在写入ZIP包时才按需读取,
+    打包时的内存占用与源文件总大小无关。
+    """
+
     full_path: Path
     rel_path: Path
     jump_first: bool = False
+    digest: FileDigest | None = None  # 扫描器提供的内容摘要, 提供时不再读取文件计算哈希
+    algorithm: str = DEFAULT_ALGORITHM  # 计算文件哈希的算法
 
     def __post_init__(self):
-        with self.full_path.open("rb") as f:
-            if self.jump_first:
-                next(f)
-            self.data = f.read()
-
         self.name = self.rel_path.name
-        self.file_hash = calculate_hash(self.data)  # 文件哈希
+        self._data: bytes | None = None  # 固定在内存中的文件内容, 见 load()
+
+        if self.digest is not None:
+            self.offset = self.digest.offset
+            self.size = self.digest.size
+            self.file_hash = self.digest.hash
+        else:
+            # 跳过首行标签, 记录内容起始位置
+            file_hash = hash_file(
+                self.full_path,
+                skip_first_line=self.jump_first,
+                algorithm=self.algorithm,
+            )
+            self.offset = file_hash.offset
+            self.size = file_hash.size
+            self.file_hash = file_hash.hash  # 文件哈希
+
         self.identity_hash = calculate_hash(f"{self.rel_path.as_posix()}:{self.file_hash}")  # (文件哈希 + 路径)计算出来的唯一哈希
 
+    @property
+    def data(self) -> bytes:
+        """文件内容(按需读取)"""
+        if self._data is not None:
+            return self._data
+
+        with self.open() as f:
+            return f.read()
+
+    def open(self) -> BinaryIO:
+        """打开文件并定位到内容起始位置"""
+        if self._data is not None:
+            return io.BytesIO(self._data)
+
+        f = self.full_path.open("rb")
+        f.seek(self.offset)
+        return f
+
+    def iter_chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """分块读取文件内容"""
+        with self.open() as f:
+            yield from iter(lambda: f.read(chunk_size), b"")
+
+    def load(self) -> "BuildFile":
+        """将文件内容固定在内存中, 用于源文件随后会被删除的情况(如临时编译目录)"""
+        if self._data is None:
+            self._data = self.data
+        return self
+
+
+@dataclass(frozen=True)
+class CompileJob:
+    """Nuitka编译任务: 单个模块, 或整个包合并为一次编译
+
+    Attributes:
+        full_path: 源文件路径, 合并编译时为包目录
+        rel_path: 相对源码目录的路径
+        source_hash: 源码哈希, 合并编译时由包内所有模块的路径与哈希计算得到
+        size: 源码总大小
+        options: Nuitka参数
+        members: 包含的模块
+
+    """
+
+    full_path: Path
+    rel_path: Path
+    source_hash: str
+    size: int
+    options: tuple[str, ...]
+    members: tuple[ScanEntry, ...]
+
+
+@dataclass(frozen=True)
+class ScanResult:
+    """扫描与分类的结果, 不依赖编译工具链, 可以在多个目标解释器的打包器之间共享
+
+    Attributes:
+        entries: (去向, 编译模式, 扫描条目) 列表, 去向为None时是核心文件, 否则为用户名
+        py_entries: 扫描到的所有Python文件(包括没有标签的文件)
+        static_entries: 静态文件
+
+    """
+
+    entries: tuple[tuple[str | None, str, ScanEntry], ...]
+    py_entries: tuple[ScanEntry, ...]
+    static_entries: tuple[ScanEntry, ...]
+
+
+def _collect_artifacts(
+    pyd_path: Path,
+    pyi_path: Path,
+    *,
+    rel_path: Path,
+    cache: ArtifactCache | None,
+    cache_key: str,
+    toolchain: Toolchain,
+    logger: logging.Logger | None,
+    hash_algorithm: str = DEFAULT_ALGORITHM,
+) -> tuple[BuildFile, BuildFile]:
+    """将编译产物存入本地缓存并返回对应的构建文件
+
+    产物所在的目录会被删除或被后续编译覆盖: 存入缓存后直接引用缓存中的文件,
+    否则将内容读入内存。
+    """
+    if cache is not None:
+        try:
+            pyd_artifact, pyi_artifact = cache.put(
+                cache_key,
+                [pyd_path, pyi_path],
+                metadata={"module": rel_path.as_posix(), "toolchain": toolchain.tag},
+            )
+            if logger:
+                logger.info(f"✓ 已缓存编译结果: {rel_path.name}")
+
+            return (
+                BuildFile(
+                    full_path=pyd_artifact.path,
+                    rel_path=rel_path.with_name(pyd_artifact.name),
+                    algorithm=hash_algorithm,
+                ),
+                BuildFile(
+                    full_path=pyi_artifact.path,
+                    rel_path=rel_path.with_name(pyi_artifact.name),
+                    algorithm=hash_algorithm,
+                ),
+            )
+
+        except Exception as e:
+            if logger:
+                logger.warning(f"缓存存储失败: {e}")
+
+    pyd_file = BuildFile(
+        full_path=pyd_path,
+        rel_path=rel_path.with_name(pyd_path.name),
+        algorithm=hash_algorithm,
+    ).load()
+    pyi_file = BuildFile(
+        full_path=pyi_path,
+        rel_path=rel_path.with_name(pyi_path.name),
+        algorithm=hash_algorithm,
+    ).load()
+    return pyd_file, pyi_file
+
+
+def _cached_artifacts(
+    cache: ArtifactCache,
+    cache_key: str,
+    *,
+    rel_path: Path,
+    tracer: Tracer,
+    logger: logging.Logger | None,
+    hash_algorithm: str = DEFAULT_ALGORITHM,
+) -> tuple[BuildFile, BuildFile] | None:
+    """从本地缓存读取编译产物, 未命中或读取失败时返回None"""
+    try:
+        with tracer.span(rel_path.as_posix(), tracing.CACHE) as span:
+            artifacts = cache.get(cache_key)
+            span["hit"] = artifacts is not None
+    except Exception as e:
+        if logger:
+            logger.warning(f"缓存读取失败: {e},将重新编译")
+        return None
+
+    if artifacts is None:
+        return None
+    pyd_artifact, pyi_artifact = artifacts
+    return (
+        BuildFile(
+            full_path=pyd_artifact.path,
+            rel_path=rel_path.with_name(pyd_artifact.name),
+            algorithm=hash_algorithm,
+        ),
+        BuildFile(
+            full_path=pyi_artifact.path,
+            rel_path=rel_path.with_name(pyi_artifact.name),
+            algorithm=hash_algorithm,
+        ),
+    )
+
+
+def _run_nuitka(
+    args: list[str],
+    *,
+    toolchain: Toolchain,
+    cwd: Path | None,
+    env: dict[str, str] | None,
+    compile_server: CompileServer | None,
+    tracer: Tracer,
+    module: str,
+    logger: logging.Logger | None,
+) -> subprocess.CompletedProcess[str]:
+    """执行Nuitka编译, 优先提交给常驻编译服务, 服务不可用时启动独立的编译进程"""
+    with tracer.span(module, tracing.COMPILE, compile_server=False) as span:
+        result = None
+        if compile_server is not None:
+            try:
+                result = compile_server.run(args, cwd=cwd, env=env)
+                span["compile_server"] = True
+            except CompileServerError as e:
+                if logger:
+                    logger.warning(f"{e}, 改为启动独立的编译进程")
+
+        # 执行编译命令
+        if result is None:
+            result = subprocess.run(
+                [*toolchain.nuitka_command, *args],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                check=False,  # 是否抛出异常
+                encoding="utf-8",
+                env=env,
+                cwd=cwd,
+            )
+        span["returncode"] = result.returncode
+    return result
+
+
+def _isolated_env(temp_dir: Path) -> dict[str, str]:
+    """编译进程的环境变量, 临时目录(TMP/TEMP/TMPDIR)指向 temp_dir"""
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    return {
+        **os.environ,
+        "TMP": str(temp_dir),
+        "TEMP": str(temp_dir),
+        "TMPDIR": str(temp_dir),
+    }
+
+
+def _fetch_remote_artifacts(
+    remote_cache: RemoteArtifactCache,
+    cache_key: str,
+    *,
+    full_path: Path,
+    rel_path: Path,
+    temp_dir: Path | None,
+    cache: ArtifactCache | None,
+    toolchain: Toolchain,
+    tracer: Tracer,
+    logger: logging.Logger | None,
+    hash_algorithm: str = DEFAULT_ALGORITHM,
+) -> tuple[BuildFile, BuildFile] | None:
+    """从服务器上的共享编译缓存下载产物并存入本地缓存, 未命中时返回None"""
+    with TemporaryDirectory(dir=temp_dir) as download_dir:
+        with tracer.span(rel_path.as_posix(), tracing.REMOTE_CACHE) as span:
+            paths = remote_cache.fetch(cache_key, Path(download_dir))
+            span["hit"] = paths is not None
+        if paths is None:
+            return None
+
+        if logger:
+            logger.info(f"✓ 远程缓存命中: {full_path.name}")
+        pyd_path, pyi_path = paths
+        return _collect_artifacts(
+            pyd_path,
+            pyi_path,
+            rel_path=rel_path,
+            cache=cache,
+            cache_key=cache_key,
+            toolchain=toolchain,
+            logger=logger,
+            hash_algorithm=hash_algorithm,
+        )
+
 
-@cache
 def compile_with_nuitka(
     full_path: Path,
     rel_path: Path,
     *,
     build_dir: Path | None = None,
+    temp_dir: Path | None = None,
     options: list[str] | tuple[str, ...] = (),
-    cache: diskcache.Cache | None = None,
+    cache: ArtifactCache | None = None,
     logger: logging.Logger | None = None,
+    source_hash: str | None = None,
+    toolchain: Toolchain | None = None,
+    build_cache: BuildCache | None = None,
+    compile_server: CompileServer | None = None,
+    remote_cache: RemoteArtifactCache | None = None,
+    tracer: Tracer | None = None,
+    hash_algorithm: str = DEFAULT_ALGORITHM,
 ) -> tuple[BuildFile, BuildFile]:
-    """使用Nuitka编译Python文件为.pyd与.pyi文件"""
-    # 使用传入的哈希值或计算新的哈希值
-    file_hash = calculate_hash(full_path)
-    cache_key = f"nuitka:{full_path}:{file_hash}:{':'.join(options)}"
+    """使用Nuitka编译Python文件为.pyd与.pyi文件
 
-    # 检查缓存
-    if cache is not None:
-        try:
-            if cache_key in cache:
-                return cast("tuple[BuildFile, BuildFile]", cache[cache_key])
+    full_path 为包目录时将整个包编译为一个扩展模块, 需要通过 options 指定
+    --include-package, 并传入 source_hash。
 
-        except Exception as e:
-            if logger:
-                logger.warning(f"缓存读取失败: {e},将重新编译")
-            # 继续执行编译流程
+    Args:
+        full_path: 源文件路径或包目录
+        rel_path: 源文件相对路径
+        build_dir: 编译输出目录,默认使用临时目录
+        temp_dir: 编译进程使用的临时目录(TMP/TEMP/TMPDIR),用于并行编译时隔离各工作进程
+        options: 额外的Nuitka参数
+        cache: 编译产物缓存
+        logger: 日志记录器
+        source_hash: 预先计算好的源文件哈希值,为None时重新计算
+        toolchain: 编译工具链,默认为当前解释器
+        build_cache: 持久化构建目录与ccache缓存,提供时保留中间文件以便下次增量编译,忽略
+            build_dir
+        compile_server: 常驻编译服务,提供时提交给已导入Nuitka的服务进程编译,
+            服务不可用时退回独立的编译进程
+        remote_cache: 服务器上的共享编译缓存,本地缓存未命中时先查询服务器,
+            编译完成后上传产物
+        tracer: 追踪记录器,记录缓存查询与编译的耗时
+        hash_algorithm: 计算产物文件哈希的算法
+
+    """
+    # 使用传入的哈希值或计算新的哈希值
+    file_hash = source_hash or calculate_hash(full_path)
+    toolchain = toolchain or Toolchain.current()
+    cache_key = ArtifactCache.make_key(
+        file_hash, rel_path, toolchain=toolchain, options=options
+    )
+    tracer = tracer or Tracer(enabled=False)
+    module = rel_path.as_posix()
+
+    # 检查缓存, 读取失败时继续执行编译流程
+    if cache is not None:
+        cached = _cached_artifacts(
+            cache,
+            cache_key,
+            rel_path=rel_path,
+            tracer=tracer,
+            logger=logger,
+            hash_algorithm=hash_algorithm,
+        )
+        if cached is not None:
+            return cached
 
     if logger:
         logger.info(f"× 缓存未命中, 开始编译: {full_path.name}")
 
-    with TemporaryDirectory() as temp_dir:
-        output_dir = build_dir if build_dir else Path(temp_dir)
+    env = _isolated_env(temp_dir) if temp_dir is not None else None
+
+    # 查询服务器上的共享编译缓存, 命中时下载产物, 不再编译
+    if remote_cache is not None:
+        fetched = _fetch_remote_artifacts(
+            remote_cache,
+            cache_key,
+            full_path=full_path,
+            rel_path=rel_path,
+            temp_dir=temp_dir,
+            cache=cache,
+            toolchain=toolchain,
+            tracer=tracer,
+            logger=logger,
+            hash_algorithm=hash_algorithm,
+        )
+        if fetched is not None:
+            return fetched
+
+    if build_cache is not None:
+        env = {**(env or os.environ), **build_cache.env()}
+        build_dir = build_cache.module_dir(
+            rel_path, toolchain=toolchain, options=options
+        )
 
-        match platform.system():
-            case "Windows":
-                nuitka_path = Path(sys.executable).parent / "nuitka.cmd"
-            case _:
-                nuitka_path = Path(sys.executable).parent / "nuitka"
+    with TemporaryDirectory(dir=temp_dir) as output_temp_dir:
+        output_dir = (build_dir or Path(output_temp_dir)).absolute()
 
-        # 构建Nuitka编译命令
-        cmd = [
-            nuitka_path,
+        # 构建Nuitka编译参数
+        args = [
             "--module",
             str(full_path),
             f"--output-dir={output_dir}",
             "--nofollow-imports",  # 不编译依赖
-            "--remove-output",  # 编译完成后删除中间文件（如 .build 目录），节省磁盘空间
             # "--no-pyi-file",  # 不生成.pyi文件
             *options,
         ]
-
-        # 执行编译命令
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            check=False,  # 是否抛出异常
-            encoding="utf-8",
+        if build_cache is None:
+            # 编译完成后删除中间文件（如 .build 目录），节省磁盘空间
+            args.append("--remove-output")
+        cmd = [*toolchain.nuitka_command, *args]
+        # 包编译时 --include-package 按包名查找
+        cwd = full_path.parent if full_path.is_dir() else None
+
+        result = _run_nuitka(
+            args,
+            toolchain=toolchain,
+            cwd=cwd,
+            env=env,
+            compile_server=compile_server,
+            tracer=tracer,
+            module=module,
+            logger=logger,
         )
 
         # 从输出中查找生成的.pyd文件路径
@@ -149,21 +509,29 @@ def compile_with_nuitka(
             if not pyi_path.exists():
                 raise FileNotFoundError(f"生成的.pyi文件不存在: {pyi_path}")
 
-            pyd_file = BuildFile(full_path=pyd_path, rel_path=rel_path.with_name(pyd_path.name))
-            pyi_file = BuildFile(full_path=pyi_path, rel_path=rel_path.with_name(pyi_path.name))
-
-            # 将编译结果存入缓存
-            if cache is not None:
-                try:
-                    cache[cache_key] = pyd_file, pyi_file
-                    if logger:
-                        logger.info(f"✓ 已缓存编译结果: {full_path.name}")
-
-                except Exception as e:
-                    if logger:
-                        logger.warning(f"缓存存储失败: {e}")
-
-            return pyd_file, pyi_file
+            # 上传到服务器上的共享编译缓存, 供其他构建机复用
+            if (
+                remote_cache is not None
+                and remote_cache.store(
+                    cache_key,
+                    [pyd_path, pyi_path],
+                    module=rel_path.as_posix(),
+                    toolchain=toolchain.tag,
+                )
+                and logger
+            ):
+                logger.info(f"✓ 已上传编译结果到远程缓存: {full_path.name}")
+
+            return _collect_artifacts(
+                pyd_path,
+                pyi_path,
+                rel_path=rel_path,
+                cache=cache,
+                cache_key=cache_key,
+                toolchain=toolchain,
+                logger=logger,
+                hash_algorithm=hash_algorithm,
+            )
 
         # 如果没有找到成功创建的消息,抛出错误
         error_msg = f"Nuitka编译失败\n{' '.join(cmd)}"
@@ -182,6 +550,22 @@ class PythonPackager:
         log_level: int = logging.INFO,
         cache_dir: Path | str | None = None,
         enable_cache: bool = True,
+        artifact_cache_dir: Path | str | None = None,
+        artifact_cache_max_bytes: int | str | None = None,
+        compression_policy: "CompressionPolicy | None" = None,
+        toolchain: Toolchain | None = None,
+        build_cache_dir: Path | str | None = None,
+        build_cache_max_bytes: int | str | None = None,
+        ccache_max_size: str | None = "5G",
+        reproducible: bool = False,
+        compile_server: bool = False,
+        remote_cache_url: str | None = None,
+        remote_cache_token: str | None = None,
+        trace: bool = False,
+        git_scan: bool = False,
+        strip_binaries: bool = False,
+        split_stubs: bool = False,
+        hash_algorithm: str = DEFAULT_ALGORITHM,
     ):
         """初始化Python打包器
 
@@ -190,27 +574,155 @@ class PythonPackager:
             log_level: 日志级别
             cache_dir: 缓存目录,默认为源目录下的.packager_cache
             enable_cache: 是否启用缓存
+            artifact_cache_dir: 编译产物缓存目录,可指向多台构建机共享的目录,
+                默认为缓存目录下的artifacts
+            artifact_cache_max_bytes: 编译产物缓存容量上限(如 "10G"),超出后按LRU淘汰,
+                为None时不限制
+            compression_policy: ZIP成员压缩策略,默认按扩展名与抽样压缩率自适应选择;
+                使用 CompressionPolicy.uniform() 可恢复统一的最高压缩级别
+            toolchain: Nuitka编译工具链,默认为当前解释器
+            build_cache_dir: 持久化C构建目录与ccache缓存目录,默认为缓存目录下的build;
+                修改模块后只增量编译变化的C文件
+            build_cache_max_bytes: 持久化构建目录容量上限(如 "20G"),超出后按LRU淘汰,
+                为None时不限制
+            ccache_max_size: ccache容量上限(如 "5G"),为None时使用ccache的默认设置;
+                未安装ccache时忽略
+            reproducible: 生成可复现的ZIP包,
+                成员按路径排序并使用固定的时间(SOURCE_DATE_EPOCH 或 1980-01-01)与权限,
+                相同的源码生成逐字节相同的ZIP包
+            compile_server: 使用常驻编译服务,Nuitka只导入一次,
+                每个模块在fork出的子进程中编译,省去每次启动Nuitka的开销;
+                仅支持fork的平台
+            remote_cache_url: 服务器基础URL(如 http://localhost:8000/api/v1/),
+                提供时使用服务器上多台构建机共享的编译缓存
+            remote_cache_token: 访问共享编译缓存的构建机令牌,需要与服务器的
+                NUITKAL_PACK_BUILD_TOKENS 配置一致
+            trace: 记录扫描、哈希、缓存查询、编译与压缩的时间段, 可通过 self.tracer
+                导出 Chrome trace 与汇总表格
+            git_scan: 源码位于git仓库中时从git索引枚举文件,未修改的已跟踪文件以blob
+                ID判断是否变化,重新检出后也无需重新计算哈希
+            strip_binaries: 编译后去除扩展模块的符号表与调试段,去除符号后的产物单独缓存;
+                Nuitka默认已去除符号, 只处理仍含符号表或调试段的模块(如 --unstripped);
+                目标平台为Windows或未安装strip时忽略
+            split_stubs: .pyi类型存根不打入运行时ZIP包,通过 to_dev_zip 单独生成开发包
+            hash_algorithm: 文件哈希算法(如 "blake2b"),需要与上传的服务器协商一致(见
+                UploadManager.get_hash_algorithms); 默认的SHA256与已有的存储兼容
+
+        Raises:
+            ValueError: 不支持的哈希算法
 
         """
         self.source_dir: Path = Path(source_dir).absolute()
+        self.toolchain = toolchain or Toolchain.current()
+        self.tracer = Tracer(enabled=trace)
+        new_hash(hash_algorithm)  # 不支持的算法抛出 ValueError
+        self.hash_algorithm = hash_algorithm
 
         self.core_map: MutableMapping[str, list[BuildFile]] = defaultdict(list)
         self.static_map: MutableMapping[str, list[BuildFile]] = defaultdict(list)
         self.user_map: MutableMapping[str, MutableMapping[str, list[BuildFile]]] = defaultdict(dict)
 
+        # 按需编译: 尚未编译的用户文件 {用户名: [(编译模式, 扫描条目)]},
+        # 在生成该用户的ZIP包时编译
+        self._pending_users: dict[str, list[tuple[str, ScanEntry]]] = {}
+        self._build_options: dict = {}
+        self._package_batches: dict[Path, list[ScanEntry]] = {}
+        # 本次编译中已编译的文件 {源文件路径: 编译结果}, 多个用户共用的文件只编译一次
+        self._compiled_files: dict[Path, tuple[BuildFile, ...]] = {}
+        # 本次编译中各pyd模块的瘦身结果
+        self.slim_report: list[slimming.SlimResult] = []
+
         # 初始化日志
         self.logger = self._setup_logger(log_level)
 
+        # ZIP构建器, 缓存各文件的压缩结果供多个用户包复用
+        self.zip_builder = ZipBuilder(
+            policy=compression_policy, reproducible=reproducible, tracer=self.tracer
+        )
+
         # 初始化缓存
         if enable_cache:
             if cache_dir is None:
                 cache_dir = self.source_dir / ".packager_cache"
             self.cache = diskcache.Cache(cache_dir)
             self.logger.info(f"缓存目录: {cache_dir}")
+
+            if artifact_cache_dir is None:
+                artifact_cache_dir = Path(cache_dir) / "artifacts"
+            self.artifact_cache = ArtifactCache(
+                artifact_cache_dir, max_bytes=artifact_cache_max_bytes
+            )
+            # 构建结果直接引用缓存中的产物文件, 本次构建使用的条目不被淘汰
+            self.artifact_cache.pin_since()
+            self.logger.info(f"编译产物缓存目录: {self.artifact_cache.root}")
+
+            if build_cache_dir is None:
+                build_cache_dir = Path(cache_dir) / "build"
+            self.build_cache = BuildCache(
+                build_cache_dir,
+                max_bytes=build_cache_max_bytes,
+                ccache_max_size=ccache_max_size,
+            )
+            self.logger.info(
+                f"C构建缓存目录: {self.build_cache.root}, "
+                f"ccache: {self.build_cache.ccache_binary or '未安装'}"
+            )
         else:
             self.cache = None
+            self.artifact_cache = None
+            self.build_cache = None
             self.logger.info("缓存已禁用")
 
+        # 增量扫描器, 扫描索引与其他构建元数据一起保存在缓存中
+        self.scanner = SourceScanner(
+            self.source_dir,
+            store=self.cache,
+            logger=self.logger,
+            tracer=self.tracer,
+            git=git_scan,
+            algorithm=hash_algorithm,
+        )
+
+        # 服务器上的共享编译缓存
+        self.remote_cache = (
+            RemoteArtifactCache(remote_cache_url, token=remote_cache_token)
+            if remote_cache_url
+            else None
+        )
+        if self.remote_cache is not None:
+            self.logger.info(f"远程编译缓存: {self.remote_cache.server_url}")
+
+        # 常驻编译服务, 第一次编译时启动
+        self.compile_server = self._create_compile_server() if compile_server else None
+
+        # 编译产物瘦身
+        self.split_stubs = split_stubs
+        self.strip_command = self._find_strip_command() if strip_binaries else None
+
+    def _create_compile_server(self) -> CompileServer | None:
+        """创建常驻编译服务, 工具链或平台不支持时返回None"""
+        if self.toolchain.command:
+            self.logger.warning("工具链使用自定义编译命令, 不使用编译服务")
+            return None
+        if not CompileServer.supported():
+            self.logger.warning("当前平台不支持编译服务, 使用独立的编译进程")
+            return None
+        return CompileServer(self.toolchain.python)
+
+    def _find_strip_command(self) -> tuple[str, ...] | None:
+        """去除扩展模块符号的命令, 目标平台不需要或找不到 strip 时返回None"""
+        strip_args = slimming.strip_args(self.toolchain.platform)
+        if strip_args is None:
+            self.logger.info(
+                f"目标平台 {self.toolchain.platform} 的扩展模块不需要去除符号"
+            )
+            return None
+        strip = slimming.find_strip()
+        if strip is None:
+            self.logger.warning("找不到 strip 命令, 不去除扩展模块的符号")
+            return None
+        return (strip, *strip_args)
+
     def _setup_logger(self, level: int = logging.INFO) -> logging.Logger:
         """设置日志记录器
 
@@ -240,31 +752,99 @@ class PythonPackager:
 
     def __del__(self):
         """析构函数,确保缓存正确关闭"""
+        if getattr(self, "artifact_cache", None) is not None:
+            self.artifact_cache.release()
         if hasattr(self, "cache") and self.cache is not None:
             # with suppress(Exception):
             self.cache.close()
 
+    def reset(self) -> None:
+        """清空编译结果, 以便重新编译
+
+        扫描索引、编译缓存与已压缩的ZIP成员保留, 重新编译时只处理变化的文件。
+        """
+        self.core_map.clear()
+        self.static_map.clear()
+        self.user_map.clear()
+        self._pending_users.clear()
+        self._package_batches.clear()
+        self._compiled_files.clear()
+        self.slim_report.clear()
+        # 不再引用之前的编译结果, 只保护重新编译时使用的缓存条目
+        if self.artifact_cache is not None:
+            self.artifact_cache.pin_since()
+
     def rglob_exclude(self, root: Path, patterns: list[str] | tuple[str, ...] = ("*",), exclude_files: list[str] | tuple[str, ...] = ()) -> Iterator[Path]:
         """递归查找匹配 pattern 的文件,跳过排除的目录"""
-        # 合并默认排除模式和用户自定义排除模式
-        default_excludes = ["/venv", "/.venv", "/env", "**/__pycache__", "**/__MACOSX"]
-        exclude_dir_patterns = list(set(exclude_files) | set(default_excludes))
+        for entry in self.scanner.walk(patterns, exclude_files, root=root):
+            yield entry.full_path
+
+    def scan(
+        self,
+        rglob_pattern: list[str] | tuple[str, ...] = ("*",),
+        *,
+        static_files: list[str] | tuple[str, ...] = (),
+        exclude_files: list[str] | tuple[str, ...] = (),
+    ) -> ScanResult:
+        """扫描源码目录, 按首行标签分类文件
 
-        spec_include = pathspec.GitIgnoreSpec.from_lines(patterns)
-        spec_exclude = pathspec.GitIgnoreSpec.from_lines(exclude_dir_patterns)
+        Args:
+            rglob_pattern: 需要扫描的文件匹配模式
+            static_files: 静态文件匹配模式
+            exclude_files: 排除文件匹配模式
 
-        for full_path in root.iterdir():
-            rel_path = full_path.relative_to(self.source_dir)
+        """
+        self.logger.info(f"开始扫描目录: {self.source_dir}")
 
-            # 跳过被排除的路径
-            if spec_exclude.match_file(rel_path):
-                continue
+        spec_static = pathspec.GitIgnoreSpec.from_lines(static_files)
 
-            if full_path.is_dir():
-                # 递归处理子目录
-                yield from self.rglob_exclude(full_path, patterns, exclude_dir_patterns)
-            elif spec_include.match_file(rel_path):
-                yield full_path
+        # 排除缓存目录
+        if (
+            self.cache is not None
+            and self.artifact_cache is not None
+            and self.build_cache is not None
+        ):
+            for cache_dir in (
+                Path(self.cache.directory).absolute(),
+                self.artifact_cache.root,
+                self.build_cache.root,
+            ):
+                if cache_dir.is_relative_to(self.source_dir):
+                    exclude_files = (
+                        *exclude_files,
+                        f"/{cache_dir.relative_to(self.source_dir).as_posix()}",
+                    )
+
+        # 记录每个文件的去向(None为核心文件, 否则为用户名)
+        entries: list[tuple[str | None, str, ScanEntry]] = []
+        py_entries: list[ScanEntry] = []
+        static_entries: list[ScanEntry] = []
+        with self.tracer.span(self.source_dir.name, tracing.SCAN) as span:
+            for entry in self.scanner.walk(rglob_pattern, exclude_files):
+                # 处理静态文件
+                if spec_static.match_file(entry.rel_path.as_posix()):
+                    self.logger.info(f"发现静态文件: {entry.rel_path}")
+                    static_entries.append(entry)
+
+                # 处理Python文件
+                elif entry.full_path.suffix == ".py":
+                    py_entries.append(entry)
+                    tags = self.scanner.tags(entry)
+                    if tags is None:
+                        continue
+
+                    for user_name, mode in tags.users:
+                        entries.append((user_name, mode, entry))
+
+                    if tags.core_mode is not None:
+                        entries.append((None, tags.core_mode, entry))
+            span["files"] = len(py_entries) + len(static_entries)
+
+        return ScanResult(
+            entries=tuple(entries),
+            py_entries=tuple(py_entries),
+            static_entries=tuple(static_entries),
+        )
 
     def compile(
         self,
@@ -274,69 +854,1003 @@ class PythonPackager:
         static_files: list[str] | tuple[str, ...] = (),
         exclude_files: list[str] | tuple[str, ...] = (),
         nuitka_options: list[str] | tuple[str, ...] = (),
+        workers: int | None = 1,
+        batch_packages: bool = False,
+        pyc_optimize: int = 1,
+        user_names: Iterable[str] | None = None,
+        scan: ScanResult | None = None,
+        executor: Executor | None = None,
     ) -> None:
-        """编译并分类源文件"""
-        self.logger.info(f"开始扫描目录: {self.source_dir}")
+        """编译并分类源文件
 
-        def _compile_file(mode: str, full_path: Path, rel_path: Path, *, jump_first: bool = False) -> Iterator[BuildFile]:
-            if mode == "pyd":
-                self.logger.info(f"编译[pyd]: {rel_path}")
-                pyd_file, pyi_file = compile_with_nuitka(full_path, rel_path, build_dir=build_dir, options=nuitka_options, cache=self.cache, logger=self.logger)
-                yield pyd_file
-                yield pyi_file
-            else:
-                self.logger.info(f"打包[py]: {rel_path}")
-                yield BuildFile(full_path, rel_path, jump_first=jump_first)
+        Args:
+            rglob_pattern: 需要扫描的文件匹配模式
+            build_dir: 编译输出目录,并行编译时每个工作线程使用其下独立的子目录
+            static_files: 静态文件匹配模式
+            exclude_files: 排除文件匹配模式
+            nuitka_options: 额外的Nuitka参数
+            workers: 并行编译的工作线程数,为None时使用CPU核心数
+            batch_packages: 将所有模块都是pyd模式且去向相同的包合并为一次Nuitka编译,
+                生成一个包扩展模块,
+                避免小模块各自承担Nuitka与C编译器的启动开销
+            pyc_optimize: pyc模式的字节码优化级别,与解释器的 -O 参数相同(0 不优化, 1
+                移除assert, 2 同时移除文档字符串)
+            user_names: 只编译核心文件、静态文件与指定用户的文件,默认编译所有用户;
+                其他用户的文件在 to_zip/write_zips
+                生成其ZIP包时(或调用 build_users 时)才编译,
+                传入空列表时所有用户都按需编译
+            scan: 已有的扫描结果(如 BuildMatrix 中其他目标解释器的扫描), 提供时不再扫描,
+                忽略 rglob_pattern、static_files 与 exclude_files;
+                扫描索引由扫描方保存
+            executor: 执行Nuitka编译任务的线程池, 提供时与其他打包器共用,
+                默认为本次编译创建 workers 个工作线程
 
-        spec_static = pathspec.GitIgnoreSpec.from_lines(static_files)
+        """
+        self._pending_users.clear()
+        self._compiled_files.clear()
+        self.slim_report.clear()
+
+        # 第一遍: 扫描并分类
+        owns_scan = scan is None
+        if scan is None:
+            scan = self.scan(
+                rglob_pattern, static_files=static_files, exclude_files=exclude_files
+            )
+        entries, py_entries = list(scan.entries), list(scan.py_entries)
+
+        for entry, digest in zip(
+            scan.static_entries,
+            self.scanner.digest_many(scan.static_entries),
+            strict=True,
+        ):
+            self.static_map[entry.rel_path.as_posix()].append(
+                BuildFile(entry.full_path, entry.rel_path, digest=digest)
+            )
+
+        # 合并编译按全部文件规划, 只编译部分用户时包的去向判断仍然完整
+        self._package_batches = (
+            self._plan_package_batches(entries, py_entries) if batch_packages else {}
+        )
+        self._build_options = {
+            "build_dir": build_dir,
+            "nuitka_options": nuitka_options,
+            "workers": workers,
+            "pyc_optimize": pyc_optimize,
+        }
+
+        # 暂缓编译未指定的用户
+        if user_names is not None:
+            selected = set(user_names)
+            for user_name, mode, entry in entries:
+                if user_name is not None and user_name not in selected:
+                    self._pending_users.setdefault(user_name, []).append((mode, entry))
+            entries = [
+                item for item in entries if item[0] is None or item[0] in selected
+            ]
+            if self._pending_users:
+                self.logger.info(
+                    f"按需编译: 暂缓 {len(self._pending_users)} 个用户的文件"
+                )
+
+        self._build_entries(entries, executor=executor)
+
+        # 保存扫描索引, 下次扫描时跳过未变化的文件
+        if owns_scan:
+            self.scanner.save()
+        self.logger.info(
+            f"扫描完成: 计算哈希 {self.scanner.hashed_count} 次, "
+            f"复用扫描索引 {self.scanner.reused_count} 次"
+        )
+        self.logger.info("编译完成")
 
-        # 排除缓存目录
-        if self.cache:
-            cache_dir = Path(self.cache.directory).relative_to(self.source_dir)
-            exclude_files = (*exclude_files, f"/{cache_dir}")
-
-        for full_path in self.rglob_exclude(self.source_dir, rglob_pattern, exclude_files):
-            rel_path = full_path.relative_to(self.source_dir)
-            rel_path_str = rel_path.as_posix()
-
-            # 处理静态文件
-            if spec_static.match_file(rel_path):
-                self.logger.info(f"发现静态文件: {rel_path}")
-                file = BuildFile(full_path, rel_path)
-                self.static_map[rel_path_str].append(file)
-
-            # 处理Python文件
-            elif full_path.suffix == ".py":
-                # 只读取第一行进行标签匹配判断,避免加载整个文件
-                with full_path.open("r", encoding="utf-8") as f:
-                    first_line = f.readline()
-
-                core_match = re.search(r"\[core(?:-(pyd|source))?\]", first_line)
-                core_mode = (core_match.group(1) if core_match else None) or "source"
-                user_match = re.findall(r"\[user-(\w+)(?:-(pyd|source))?\]", first_line)
-
-                if user_match:
-                    for user_name, mode in user_match:
-                        for file in _compile_file(mode if mode else core_mode, full_path, rel_path, jump_first=True):
-                            self.user_map[user_name].setdefault(rel_path_str, []).append(file)
-
-                if core_match:
-                    for file in _compile_file(core_mode, full_path, rel_path, jump_first=True):
-                        self.core_map[rel_path_str].append(file)
+    @property
+    def pending_users(self) -> list[str]:
+        """尚未编译的用户"""
+        return list(self._pending_users)
+
+    def build_users(self, user_names: Iterable[str] | None = None) -> None:
+        """编译 compile 时暂缓的用户文件, 已编译的用户直接跳过
+
+        Args:
+            user_names: 需要编译的用户, 默认为所有尚未编译的用户
+
+        """
+        names = [
+            name
+            for name in (self._pending_users if user_names is None else user_names)
+            if name in self._pending_users
+        ]
+        if not names:
+            return
+
+        self.logger.info(f"按需编译用户: {', '.join(names)}")
+        self._build_entries(
+            [
+                (name, mode, entry)
+                for name in names
+                for mode, entry in self._pending_users.pop(name)
+            ]
+        )
+
+    def _build_entries(
+        self,
+        entries: list[tuple[str | None, str, ScanEntry]],
+        *,
+        executor: Executor | None = None,
+    ) -> None:
+        """编译扫描到的文件并填充 core_map 与 user_map
+
+        Args:
+            entries: (去向, 编译模式, 扫描条目) 列表, 去向为None时是核心文件,
+                否则为用户名
+            executor: 共用的编译线程池
+
+        """
+        options = self._build_options
+
+        self._prefetch_digests(entries)
+
+        # 第二遍: 并行编译所有pyd任务(同一文件只编译一次,
+        # 本次编译中已编译的文件直接复用)
+        pyd_entries = list(
+            {
+                entry.full_path: entry
+                for _, mode, entry in entries
+                if mode == "pyd" and entry.full_path not in self._compiled_files
+            }.values()
+        )
+        pyd_paths = {entry.full_path for entry in pyd_entries}
+        batches = {
+            package_dir: members
+            for package_dir, members in self._package_batches.items()
+            if any(member.full_path in pyd_paths for member in members)
+        }
+        batched = {
+            member.full_path
+            for members in self._package_batches.values()
+            for member in members
+        }
+
+        jobs = [
+            self._make_compile_job(package_dir, members, options["nuitka_options"])
+            for package_dir, members in batches.items()
+        ]
+        jobs += [
+            self._make_compile_job(entry.full_path, [entry], options["nuitka_options"])
+            for entry in pyd_entries
+            if entry.full_path not in batched
+        ]
+        ccache_before = (
+            self.build_cache.ccache_stats()
+            if self.build_cache is not None and jobs
+            else {}
+        )
+        with self.tracer.span("compile", tracing.PHASE, jobs=len(jobs)):
+            pyd_files = self._compile_pyd_jobs(
+                jobs,
+                build_dir=options["build_dir"],
+                workers=options["workers"],
+                executor=executor,
+            )
+        if pyd_files and (self.strip_command is not None or self.split_stubs):
+            with self.tracer.span("slim", tracing.PHASE, modules=len(jobs)):
+                pyd_files = self._slim_pyd_files(pyd_files, workers=options["workers"])
+        self._compiled_files.update(pyd_files)
+
+        # pyc模式的文件在目标解释器中编译为字节码, 不经过Nuitka
+        pyc_entries = list(
+            {
+                entry.full_path: entry
+                for _, mode, entry in entries
+                if mode == "pyc" and entry.full_path not in self._compiled_files
+            }.values()
+        )
+        bytecode = self._compile_pyc_entries(
+            pyc_entries, optimize=options["pyc_optimize"], workers=options["workers"]
+        )
+        self._compiled_files.update((path, (file,)) for path, file in bytecode.items())
+
+        # 第三遍: 按扫描顺序填充结果, 保证与串行编译一致
+        for user_name, mode, entry in entries:
+            if mode in ("pyd", "pyc"):
+                files = list(self._compiled_files[entry.full_path])
+            else:
+                self.logger.info(f"打包[py]: {entry.rel_path}")
+                files = [
+                    BuildFile(
+                        entry.full_path,
+                        entry.rel_path,
+                        jump_first=True,
+                        digest=self.scanner.digest(entry, jump_first=True),
+                    )
+                ]
+
+            if user_name is None:
+                self.core_map[entry.rel_path.as_posix()].extend(files)
+            else:
+                self.user_map[user_name].setdefault(
+                    entry.rel_path.as_posix(), []
+                ).extend(files)
 
         # 输出编译统计信息
-        self.logger.info("编译完成")
+        if self.artifact_cache is not None:
+            self.logger.info(
+                f"编译缓存: 命中 {self.artifact_cache.hits} 次, "
+                f"未命中 {self.artifact_cache.misses} 次"
+            )
+        if self.remote_cache is not None:
+            self.logger.info(
+                f"远程编译缓存: 命中 {self.remote_cache.hits} 次, "
+                f"未命中 {self.remote_cache.misses} 次, "
+                f"上传 {self.remote_cache.uploads} 个"
+            )
+        if self.build_cache is not None:
+            self.logger.info(
+                f"C构建目录: 增量编译 {self.build_cache.reused_count} 次, "
+                f"完整编译 {self.build_cache.created_count} 次"
+            )
+            if ccache_before:
+                ccache_hits, ccache_misses = BuildCache.ccache_delta(
+                    ccache_before, self.build_cache.ccache_stats()
+                )
+                self.logger.info(
+                    f"ccache: 命中 {ccache_hits} 次, 未命中 {ccache_misses} 次"
+                )
+            self.build_cache.prune()
+        if self.compile_server is not None:
+            self.logger.info(
+                f"编译服务: 累计执行 {self.compile_server.job_count} 个编译任务"
+            )
+
+    def _prefetch_digests(
+        self, entries: list[tuple[str | None, str, ScanEntry]]
+    ) -> None:
+        """并行计算本次需要的文件哈希并写入扫描索引
+
+        之后逐个获取摘要时直接复用; 编译模式使用完整内容, 源码模式跳过首行标签。
+        """
+        compiled = {
+            entry.full_path: entry
+            for _, mode, entry in entries
+            if mode in ("pyd", "pyc")
+        }
+        source = {
+            entry.full_path: entry
+            for _, mode, entry in entries
+            if mode not in ("pyd", "pyc")
+        }
+        self.scanner.digest_many(compiled.values())
+        self.scanner.digest_many(source.values(), jump_first=True)
+
+    def _plan_package_batches(
+        self,
+        entries: list[tuple[str | None, str, ScanEntry]],
+        py_entries: list[ScanEntry],
+    ) -> dict[Path, list[ScanEntry]]:
+        """找出可以合并编译的包
+
+        包内(含子包)所有Python文件都是pyd模式且去向(核心/用户)完全相同时,
+        整个包编译为一个扩展模块;
+        包含源码模式或去向不同的模块时无法合并, 这些包仍逐个模块编译。
+        嵌套的包只合并最外层。
+
+        Returns:
+            包目录到其所有模块的映射
+
+        """
+        targets: defaultdict[Path, set[tuple[str | None, str]]] = defaultdict(set)
+        for user_name, mode, entry in entries:
+            targets[entry.full_path].add((user_name, mode))
+
+        package_dirs = {
+            entry.full_path.parent
+            for entry in py_entries
+            if entry.full_path.name == "__init__.py"
+        }
+
+        batches: dict[Path, list[ScanEntry]] = {}
+        for package_dir in sorted(package_dirs, key=lambda path: len(path.parts)):
+            if any(package_dir.is_relative_to(batch_dir) for batch_dir in batches):
+                continue
+
+            package_targets = targets.get(package_dir / "__init__.py")
+            if not package_targets or any(mode != "pyd" for _, mode in package_targets):
+                continue
+
+            members = [
+                entry
+                for entry in py_entries
+                if entry.full_path.is_relative_to(package_dir)
+            ]
+            # 子目录必须是常规包, 否则 --include-package 不会包含
+            if len(members) < MIN_BATCH_MODULES or any(
+                member.full_path.parent not in package_dirs for member in members
+            ):
+                continue
+
+            if all(
+                targets.get(member.full_path) == package_targets for member in members
+            ):
+                batches[package_dir] = members
+                self.logger.info(
+                    f"合并编译[pyd]: {package_dir.relative_to(self.source_dir)} "
+                    f"({len(members)} 个模块)"
+                )
+
+        return batches
+
+    def _make_compile_job(
+        self,
+        full_path: Path,
+        members: list[ScanEntry],
+        nuitka_options: list[str] | tuple[str, ...],
+    ) -> CompileJob:
+        """创建编译任务, full_path 为包目录时合并编译包内所有模块"""
+        if not full_path.is_dir():
+            (entry,) = members
+            return CompileJob(
+                full_path=entry.full_path,
+                rel_path=entry.rel_path,
+                source_hash=self.scanner.digest(entry).hash,
+                size=entry.size,
+                options=tuple(nuitka_options),
+                members=(entry,),
+            )
+
+        # 包内任一模块的路径或内容变化都会使缓存失效
+        members = sorted(members, key=lambda member: member.rel_path.as_posix())
+        source_hash = calculate_hash(
+            "\n".join(
+                f"{member.rel_path.as_posix()}:{self.scanner.digest(member).hash}"
+                for member in members
+            )
+        )
+        return CompileJob(
+            full_path=full_path,
+            rel_path=full_path.relative_to(self.source_dir),
+            source_hash=source_hash,
+            size=sum(member.size for member in members),
+            options=(*nuitka_options, f"--include-package={full_path.name}"),
+            members=tuple(members),
+        )
+
+    def _compile_pyd_jobs(
+        self,
+        jobs: list[CompileJob],
+        *,
+        build_dir: Path | None,
+        workers: int | None,
+        executor: Executor | None = None,
+    ) -> dict[Path, tuple[BuildFile, ...]]:
+        """使用线程池并行执行Nuitka编译任务
+
+        每个工作线程拥有独立的输出目录与临时目录, 任务按历史编译耗时从长到短调度,
+        以缩短整体编译时间。
+
+        Args:
+            jobs: 待编译的任务列表
+            build_dir: 编译输出目录
+            workers: 工作线程数,为None时使用CPU核心数
+            executor: 共用的线程池, 提供时不再创建线程池, 任务与其他打包器的任务一起调度
+
+        Returns:
+            源文件路径到 (pyd文件, pyi文件) 的映射; 合并编译的包由 __init__.py
+            对应编译结果, 包内其他模块对应空元组
+
+        """
+        if not jobs:
+            return {}
+
+        workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+
+        # 最长任务优先: 没有历史耗时的任务视为最长, 其次按源码大小排序
+        def _priority(job: CompileJob) -> tuple[float, int]:
+            duration = self._get_compile_duration(job.rel_path)
+            return (float("inf") if duration is None else duration, job.size)
+
+        ordered_jobs = sorted(jobs, key=_priority, reverse=True)
+        self.logger.info(f"共 {len(jobs)} 个pyd编译任务, 使用 {workers} 个工作线程")
+
+        with TemporaryDirectory(prefix="nuitkal-pack-") as temp_root:
+            local = threading.local()
+            worker_ids = itertools.count()
+
+            def _run(job: CompileJob) -> tuple[BuildFile, BuildFile]:
+                # 首次运行时为当前工作线程分配独立目录
+                if not hasattr(local, "name"):
+                    local.name = f"worker-{next(worker_ids)}"
+
+                cache_hit = (
+                    self.artifact_cache is not None
+                    and ArtifactCache.make_key(
+                        job.source_hash,
+                        job.rel_path,
+                        toolchain=self.toolchain,
+                        options=job.options,
+                    )
+                    in self.artifact_cache
+                )
+
+                self.logger.info(f"编译[pyd]: {job.rel_path}")
+                start_time = time.perf_counter()
+                result = compile_with_nuitka(
+                    job.full_path,
+                    job.rel_path,
+                    build_dir=build_dir / local.name if build_dir else None,
+                    temp_dir=Path(temp_root) / local.name,
+                    options=job.options,
+                    cache=self.artifact_cache,
+                    logger=self.logger,
+                    source_hash=job.source_hash,
+                    toolchain=self.toolchain,
+                    build_cache=self.build_cache,
+                    compile_server=self.compile_server,
+                    remote_cache=self.remote_cache,
+                    tracer=self.tracer,
+                    hash_algorithm=self.hash_algorithm,
+                )
+
+                # 仅记录实际编译的耗时, 供下次调度使用
+                if not cache_hit:
+                    self._record_compile_duration(
+                        job.rel_path, time.perf_counter() - start_time
+                    )
+
+                return result
+
+            with (
+                nullcontext(executor)
+                if executor is not None
+                else ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix="nuitka"
+                ) as pool
+            ):
+                futures = [(job, pool.submit(_run, job)) for job in ordered_jobs]
+
+                compiled: dict[Path, tuple[BuildFile, ...]] = {}
+                for job, future in futures:
+                    result = future.result()
+                    for member in job.members:
+                        is_owner = (
+                            member.full_path == job.full_path
+                            or member.full_path == job.full_path / "__init__.py"
+                        )
+                        compiled[member.full_path] = result if is_owner else ()
+                return compiled
+
+    def _slim_pyd_files(
+        self, compiled: dict[Path, tuple[BuildFile, ...]], *, workers: int | None
+    ) -> dict[Path, tuple[BuildFile, ...]]:
+        """编译产物瘦身: 去除扩展模块的符号并统计各模块节省的大小
+
+        去除符号后的扩展模块以原产物的哈希与 strip 参数作为缓存键存入编译产物缓存;
+        存根保留在编译结果中, 由 _bundle_members 决定是否打入运行时包。
+
+        Args:
+            compiled: _compile_pyd_jobs 的编译结果
+            workers: 并行执行 strip 的线程数,为None时使用CPU核心数
+
+        Returns:
+            扩展模块替换为去除符号后的文件的编译结果
+
+        """
+        results = [files for files in compiled.values() if files]
+
+        strip_command = self.strip_command
+
+        def _slim(files: tuple[BuildFile, ...]) -> tuple[BuildFile, ...]:
+            return tuple(
+                self._strip_binary(file, strip_command)
+                if strip_command is not None
+                and file.rel_path.suffix != slimming.STUB_SUFFIX
+                else file
+                for file in files
+            )
+
+        workers = max(1, min(workers or os.cpu_count() or 1, len(results)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="slim") as pool:
+            slimmed = dict(zip(map(id, results), pool.map(_slim, results), strict=True))
+
+        report: list[slimming.SlimResult] = []
+        for files in results:
+            stub_bytes = (
+                sum(
+                    file.size
+                    for file in files
+                    if file.rel_path.suffix == slimming.STUB_SUFFIX
+                )
+                if self.split_stubs
+                else 0
+            )
+            report.extend(
+                {
+                    "module": original.rel_path.as_posix(),
+                    "original_bytes": original.size,
+                    "slim_bytes": slim.size,
+                    "stub_bytes": stub_bytes,
+                }
+                for original, slim in zip(files, slimmed[id(files)], strict=True)
+                if original.rel_path.suffix != slimming.STUB_SUFFIX
+            )
+        report.sort(key=lambda result: result["module"])
+        for line in slimming.format_report(report):
+            self.logger.info(line)
+        self.slim_report.extend(report)
+
+        return {
+            path: slimmed[id(files)] if files else files
+            for path, files in compiled.items()
+        }
+
+    def _strip_binary(
+        self, file: BuildFile, strip_command: tuple[str, ...]
+    ) -> BuildFile:
+        """去除扩展模块的符号, 结果存入编译产物缓存
+
+        没有可去除的符号或 strip 失败时保留原文件。
+        """
+        # Nuitka 默认已去除符号, 段表中没有符号表与调试段时不再启动 strip,
+        # 也不占用缓存条目
+        with file.open() as source:
+            if not slimming.has_strippable_sections(source):
+                return file
+
+        strip, *args = strip_command
+        rel_path = file.rel_path.as_posix()
+        cache_key = ArtifactCache.make_key(
+            file.file_hash,
+            file.rel_path,
+            toolchain=self.toolchain,
+            options=("--strip", *args),
+        )
+
+        if self.artifact_cache is not None:
+            with self.tracer.span(rel_path, tracing.CACHE) as span:
+                artifacts = self.artifact_cache.get(cache_key)
+                span["hit"] = artifacts is not None
+            if artifacts is not None:
+                return BuildFile(
+                    full_path=artifacts[0].path,
+                    rel_path=file.rel_path,
+                    algorithm=self.hash_algorithm,
+                )
+
+        with TemporaryDirectory(prefix="nuitkal-pack-strip-") as temp_dir:
+            target = Path(temp_dir) / file.name
+            try:
+                with (
+                    self.tracer.span(
+                        rel_path, tracing.SLIM, original_bytes=file.size
+                    ) as span,
+                    file.open() as source,
+                ):
+                    slimming.strip_binary(source, target, strip=strip, args=tuple(args))
+                    span["slim_bytes"] = target.stat().st_size
+            except (OSError, RuntimeError) as e:
+                self.logger.warning(f"{rel_path}: {e}, 保留原文件")
+                return file
+
+            if self.artifact_cache is not None:
+                try:
+                    (artifact,) = self.artifact_cache.put(
+                        cache_key,
+                        [target],
+                        metadata={
+                            "module": rel_path,
+                            "toolchain": self.toolchain.tag,
+                            "strip": args,
+                        },
+                    )
+                    return BuildFile(
+                        full_path=artifact.path,
+                        rel_path=file.rel_path,
+                        algorithm=self.hash_algorithm,
+                    )
+                except Exception as e:
+                    self.logger.warning(f"缓存存储失败: {e}")
+
+            # 临时目录随后会被删除, 将内容读入内存
+            return BuildFile(
+                full_path=target, rel_path=file.rel_path, algorithm=self.hash_algorithm
+            ).load()
+
+    def _compile_pyc_entries(
+        self, entries: list[ScanEntry], *, optimize: int, workers: int | None
+    ) -> dict[Path, BuildFile]:
+        """将pyc模式的文件编译为工具链解释器的字节码
+
+        编译结果与pyd产物共用编译产物缓存, 缓存未命中的文件在多个编译进程中并行编译。
+
+        Args:
+            entries: 待编译的源文件
+            optimize: 字节码优化级别
+            workers: 并行的编译进程数,为None时使用CPU核心数
+
+        Returns:
+            源文件路径到 .pyc 文件的映射
+
+        """
+        options = ("--pyc", f"--optimize={optimize}")
+        compiled: dict[Path, BuildFile] = {}
+        pending: list[tuple[ScanEntry, str]] = []
+
+        for entry in entries:
+            self.logger.info(f"编译[pyc]: {entry.rel_path}")
+            # 首行标签是注释, 与完整的源码一起编译, 异常回溯中的行号保持不变
+            cache_key = ArtifactCache.make_key(
+                self.scanner.digest(entry).hash,
+                entry.rel_path,
+                toolchain=self.toolchain,
+                options=options,
+            )
+
+            if self.artifact_cache is not None:
+                with self.tracer.span(entry.rel_path.as_posix(), tracing.CACHE) as span:
+                    artifacts = self.artifact_cache.get(cache_key)
+                    span["hit"] = artifacts is not None
+                if artifacts is not None:
+                    compiled[entry.full_path] = BuildFile(
+                        full_path=artifacts[0].path,
+                        rel_path=entry.rel_path.with_suffix(".pyc"),
+                        algorithm=self.hash_algorithm,
+                    )
+                    continue
+
+            pending.append((entry, cache_key))
+
+        if not pending:
+            return compiled
+
+        workers = workers or os.cpu_count() or 1
+        self.logger.info(
+            f"共 {len(pending)} 个pyc编译任务, 目标解释器: {self.toolchain.python}"
+        )
+
+        with TemporaryDirectory(prefix="nuitkal-pack-pyc-") as temp_dir:
+            jobs = [
+                BytecodeJob(
+                    source=entry.full_path,
+                    target=Path(temp_dir) / entry.rel_path.with_suffix(".pyc"),
+                    display_name=entry.rel_path.as_posix(),
+                )
+                for entry, _ in pending
+            ]
+            with self.tracer.span(
+                "pyc", tracing.BYTECODE, files=len(jobs), workers=workers
+            ):
+                compile_bytecode(
+                    jobs,
+                    python=self.toolchain.python,
+                    optimize=optimize,
+                    workers=workers,
+                )
+
+            for (entry, cache_key), job in zip(pending, jobs, strict=True):
+                rel_path = entry.rel_path.with_suffix(".pyc")
+                if self.artifact_cache is not None:
+                    try:
+                        (artifact,) = self.artifact_cache.put(
+                            cache_key,
+                            [job.target],
+                            metadata={
+                                "module": entry.rel_path.as_posix(),
+                                "toolchain": self.toolchain.tag,
+                            },
+                        )
+                        compiled[entry.full_path] = BuildFile(
+                            full_path=artifact.path,
+                            rel_path=rel_path,
+                            algorithm=self.hash_algorithm,
+                        )
+                        continue
+                    except Exception as e:
+                        self.logger.warning(f"缓存存储失败: {e}")
+
+                # 临时目录随后会被删除, 将内容读入内存
+                compiled[entry.full_path] = BuildFile(
+                    full_path=job.target,
+                    rel_path=rel_path,
+                    algorithm=self.hash_algorithm,
+                ).load()
+
+        return compiled
+
+    def _compile_duration_key(self, rel_path: Path) -> str:
+        """编译耗时的缓存键, 包含工具链标签, 构建矩阵中共用缓存的各解释器分别记录"""
+        return f"nuitka-duration:{self.toolchain.tag}:{rel_path.as_posix()}"
+
+    def _get_compile_duration(self, rel_path: Path) -> float | None:
+        """获取模块的历史编译耗时"""
+        if self.cache is None:
+            return None
+
+        try:
+            return cast(
+                "float | None", self.cache.get(self._compile_duration_key(rel_path))
+            )
+        except Exception as e:
+            self.logger.warning(f"读取编译耗时失败: {e}")
+            return None
+
+    def _record_compile_duration(self, rel_path: Path, duration: float) -> None:
+        """记录模块的编译耗时"""
+        if self.cache is None:
+            return
+
+        try:
+            self.cache[self._compile_duration_key(rel_path)] = duration
+        except Exception as e:
+            self.logger.warning(f"记录编译耗时失败: {e}")
+
+    def fetch_published_manifests(
+        self, server_url: str, app_ids: Mapping[str, str], *, timeout: int = 30
+    ) -> dict[str, dict[str, str]]:
+        """从服务器获取各用户应用激活版本的文件清单, 用于增量打包
+
+        Args:
+            server_url: 服务器基础 URL (如: http://localhost:8000/api/v1/)
+            app_ids: {用户名称: 应用ID}
+            timeout: 网络请求超时时间(秒)
+
+        Returns:
+            {用户名称: {文件相对路径: 文件哈希值}}
+
+        """
+        return {
+            name: UploadManager(
+                server_url, app_id, timeout=timeout
+            ).get_active_manifest()
+            for name, app_id in app_ids.items()
+        }
+
+    def _bundle_members(
+        self,
+        name: str,
+        *,
+        excluded: set[str],
+        published: Mapping[str, Mapping[str, str]] | None,
+    ) -> tuple[list[BuildFile], dict[str, bytes]]:
+        """计算用户ZIP包的成员
+
+        Returns:
+            (需要写入的文件, 额外写入的成员如增量清单)
+
+        """
+        # 合并文件: 核心文件 + 静态文件 + 用户特定文件; 拆分存根时存根只打入开发包
+        file_map = {**self.core_map, **self.static_map, **self.user_map[name]}
+        stubs = (
+            {id(file) for file in self._stub_files(name)} if self.split_stubs else set()
+        )
+        files = [
+            file
+            for file_list in file_map.values()
+            for file in file_list
+            if file.identity_hash not in excluded and id(file) not in stubs
+        ]
+
+        extra_members: dict[str, bytes] = {}
+        if published is not None and name in published:
+            manifest = published[name]
+            unchanged = {
+                file.rel_path.as_posix(): file.file_hash
+                for file in files
+                if manifest.get(file.rel_path.as_posix()) == file.file_hash
+            }
+            files = [
+                file for file in files if file.rel_path.as_posix() not in unchanged
+            ]
+            extra_members[UNCHANGED_MANIFEST_NAME] = dump_unchanged_manifest(unchanged)
+            self.logger.info(
+                f"增量打包[{name}]: 变化文件 {len(files)} 个, "
+                f"未变化文件 {len(unchanged)} 个"
+            )
+
+        return files, extra_members
+
+    def _stub_files(self, name: str) -> list[BuildFile]:
+        """用户包中编译模块的 .pyi 类型存根"""
+        file_map = {**self.core_map, **self.user_map.get(name, {})}
+        return [
+            file
+            for file_list in file_map.values()
+            for file in file_list
+            if file.rel_path.suffix == slimming.STUB_SUFFIX
+        ]
+
+    def to_dev_zip(self, user_name: str) -> io.BytesIO:
+        """创建用户的开发包, 包含该用户运行时包中各编译模块的 .pyi 类型存根
+
+        与 split_stubs 一起使用: 运行时包不再包含存根,
+        开发包单独分发给需要类型提示的开发者。
+
+        Args:
+            user_name: 用户名称
+
+        Raises:
+            KeyError: 用户不存在
+
+        """
+        self.build_users([user_name])
+        if user_name not in self.user_map:
+            raise KeyError(user_name)
+
+        stubs = self._stub_files(user_name)
+        io_zip = io.BytesIO()
+        with self.tracer.span(
+            f"{user_name}[dev]", tracing.ZIP, members=len(stubs)
+        ) as span:
+            span["member_bytes"] = self.zip_builder.write(io_zip, stubs)
+        io_zip.seek(0)
+        self.logger.info(f"开发包[{user_name}]: {len(stubs)} 个类型存根")
+        return io_zip
+
+    def _log_zip_stats(self) -> None:
+        """输出ZIP压缩统计信息"""
+        self.logger.info(
+            f"ZIP包创建完成: 压缩 {self.zip_builder.compressed_count} 个文件, "
+            f"复用压缩结果 {self.zip_builder.reused_count} 次"
+        )
+        for report in self.zip_builder.policy.report():
+            self.logger.info(
+                f"压缩策略[{report['rule']}]: {report['members']} 个文件, "
+                f"{report['raw_bytes']} -> {report['compressed_bytes']} 字节, "
+                f"节省 {report['saved_bytes']} 字节, CPU {report['cpu_seconds']:.3f} 秒"
+            )
+
+    def write_zips(
+        self,
+        output: Path | str | Callable[[str], BinaryIO],
+        *,
+        user_names: Iterable[str] | None = None,
+        workers: int | None = None,
+        exclude_hashes: list[str] | tuple[str, ...] = (),
+        published: Mapping[str, Mapping[str, str]] | None = None,
+        manifest: bool = True,
+        progress: Callable[[str, int, int], None] | None = None,
+    ) -> dict[str, Path | None]:
+        """并行生成各用户的ZIP包并直接写入文件或其他输出流
+
+        先用线程池将所有用户包中的文件各压缩一次(zlib 压缩时释放GIL),
+        再并行地将压缩好的数据复制到各用户包中。
+        数据按块流式写入输出, 内存占用只与工作线程数有关, 与用户数和包大小无关。
+
+        Args:
+            output: 输出目录(写入 <目录>/<用户名>.zip, 先写临时文件再替换),
+                或根据用户名返回可写二进制流的函数(写入完成后关闭该流)
+            user_names: 需要生成的用户, 默认为所有用户
+            workers: 工作线程数, 为None时使用CPU核心数
+            exclude_hashes: 要排除的文件哈希列表, 同 to_zip
+            published: 增量打包的服务器文件清单, 同 to_zip
+            manifest: 写入哈希清单, 同 to_zip
+            progress: 进度回调, 接收参数 (用户名, 已写入成员数, 总成员数);
+                默认每个用户完成时输出日志
+
+        Returns:
+            {用户名: 输出文件路径}, 输出到流时路径为None
+
+        """
+        # 用户名可能是只能遍历一次的迭代器, 先编译 compile 时暂缓的用户
+        if user_names is not None:
+            user_names = list(user_names)
+        self.build_users(user_names)
+        names = list(self.user_map if user_names is None else user_names)
+        if missing := [name for name in names if name not in self.user_map]:
+            self.logger.warning(f"用户不存在, 跳过: {', '.join(missing)}")
+            names = [name for name in names if name in self.user_map]
+        workers = max(1, workers or os.cpu_count() or 1)
+        excluded = set(exclude_hashes)
+        self.logger.info(
+            f"开始并行创建 {len(names)} 个用户的ZIP包, 使用 {workers} 个工作线程"
+        )
+
+        bundles = {
+            name: self._bundle_members(name, excluded=excluded, published=published)
+            for name in names
+        }
+
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="zip"
+        ) as executor:
+            # 第一步: 所有用户包中的文件按内容去重后各压缩一次,
+            # 避免多个线程同时压缩同一个共享文件
+            unique_files = {
+                file.file_hash: file for files, _ in bundles.values() for file in files
+            }
+            with self.tracer.span("compress", tracing.PHASE, files=len(unique_files)):
+                list(executor.map(self.zip_builder.compress, unique_files.values()))
+
+            # 第二步: 并行写出各用户包, 只复制已压缩的数据
+            def _write(name: str) -> Path | None:
+                files, extra_members = bundles[name]
+                total = len(files) + len(extra_members) + int(manifest)
+
+                def _progress(done: int) -> None:
+                    if progress is not None:
+                        progress(name, done, total)
+
+                with self.tracer.span(name, tracing.ZIP, members=total) as span:
+                    if callable(output):
+                        with output(name) as fp:
+                            span["member_bytes"] = self.zip_builder.write(
+                                fp,
+                                files,
+                                extra_members=extra_members,
+                                manifest=manifest,
+                                progress=_progress,
+                            )
+                        path = None
+                    else:
+                        output_dir = Path(output)
+                        output_dir.mkdir(parents=True, exist_ok=True)
+                        path = output_dir / f"{name}.zip"
+                        fd, temp_name = tempfile.mkstemp(
+                            dir=output_dir, prefix=f".{name}-", suffix=".zip"
+                        )
+                        try:
+                            with os.fdopen(fd, "wb") as fp:
+                                span["member_bytes"] = self.zip_builder.write(
+                                    fp,
+                                    files,
+                                    extra_members=extra_members,
+                                    manifest=manifest,
+                                    progress=_progress,
+                                )
+                            Path(temp_name).replace(path)
+                        except BaseException:
+                            Path(temp_name).unlink(missing_ok=True)
+                            raise
+
+                if progress is None:
+                    location = f", {path}" if path else ""
+                    self.logger.info(f"ZIP包已写入[{name}]: {total} 个成员{location}")
+                return path
+
+            futures = {name: executor.submit(_write, name) for name in names}
+            results = {name: future.result() for name, future in futures.items()}
+
+        self._log_zip_stats()
+        return results
 
     @overload
-    def to_zip(self, user_name: str) -> io.BytesIO: ...
+    def to_zip(
+        self,
+        user_name: str,
+        exclude_hashes: list[str] | tuple[str, ...] = (),
+        *,
+        published: Mapping[str, Mapping[str, str]] | None = None,
+        manifest: bool = True,
+    ) -> io.BytesIO: ...
     @overload
-    def to_zip(self, user_name: None = None) -> MutableMapping[str, io.BytesIO]: ...
-    def to_zip(self, user_name: str | None = None, exclude_hashes: list[str] | tuple[str, ...] = ()) -> MutableMapping[str, io.BytesIO] | io.BytesIO:
+    def to_zip(
+        self,
+        user_name: None = None,
+        exclude_hashes: list[str] | tuple[str, ...] = (),
+        *,
+        published: Mapping[str, Mapping[str, str]] | None = None,
+        manifest: bool = True,
+    ) -> MutableMapping[str, io.BytesIO]: ...
+    def to_zip(
+        self,
+        user_name: str | None = None,
+        exclude_hashes: list[str] | tuple[str, ...] = (),
+        *,
+        published: Mapping[str, Mapping[str, str]] | None = None,
+        manifest: bool = True,
+    ) -> MutableMapping[str, io.BytesIO] | io.BytesIO:
         """创建ZIP压缩包
 
         Args:
             user_name: 指定用户名称,如果为None则返回所有用户的ZIP包
-            exclude_hashes: 要排除的文件哈希列表；可以直接传入整个服务器中获取的hash列表，从而只打包有更新的文件(注意不是文件哈希，是文件哈希后与相对路径再次计算得到的哈希值)
+            exclude_hashes: 要排除的文件哈希列表；
+                可以直接传入整个服务器中获取的hash列表，
+                从而只打包有更新的文件(注意不是文件哈希，
+                是文件哈希后与相对路径再次计算得到的哈希值)
+            published: 增量打包, {用户名称: 服务器激活版本的文件清单}, 可由
+                fetch_published_manifests 获取;
+                与激活版本路径、哈希都相同的文件不再打入 ZIP 包,
+                而是记录在包内的增量清单中, 上传时由服务器合并
+            manifest: 在包内写入哈希清单(文件路径 -> 哈希、大小、CRC),
+                上传时客户端与服务器直接用清单去重, 只解压需要存储的文件
 
         Returns:
             单个用户的ZIP包或所有用户的ZIP包字典
@@ -344,25 +1858,35 @@ class PythonPackager:
         """
         self.logger.info("开始创建ZIP包")
 
+        # 先编译 compile 时暂缓的用户
+        self.build_users(None if user_name is None else [user_name])
+
         results: MutableMapping[str, io.BytesIO] = {}
+        excluded = set(exclude_hashes)
 
-        # 为每个用户创建ZIP包
+        # 为每个用户创建ZIP包, 核心文件与静态文件只压缩一次, 在各用户包之间复用
         for name in self.user_map:
-            # 合并文件: 核心文件 + 静态文件 + 用户特定文件
-            file_map = {**self.core_map, **self.static_map, **self.user_map[name]}
-
-            io_zip = io.BytesIO()
-            with zipfile.ZipFile(io_zip, "w", zipfile.ZIP_DEFLATED, compresslevel=9) as zf:
-                for rel_path, file_list in file_map.items():
-                    for file in file_list:
-                        if file.identity_hash in exclude_hashes:
-                            continue
+            if user_name and name != user_name:
+                continue
 
-                        zf.writestr(str(file.rel_path), file.data)
+            files, extra_members = self._bundle_members(
+                name, excluded=excluded, published=published
+            )
+            with self.tracer.span(
+                name,
+                tracing.ZIP,
+                members=len(files) + len(extra_members) + int(manifest),
+            ) as span:
+                io_zip = io.BytesIO()
+                span["member_bytes"] = self.zip_builder.write(
+                    io_zip, files, extra_members=extra_members, manifest=manifest
+                )
 
             # 重置指针以便后续读取
             io_zip.seek(0)
             results[name] = io_zip
 
+        self._log_zip_stats()
+
         # 返回指定用户的ZIP包或所有用户的ZIP包
         return results[user_name] if user_name else results
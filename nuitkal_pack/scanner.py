@@ -0,0 +1,462 @@
+"""增量源码扫描器
+
+基于 os.scandir 遍历源码目录, 匹配规则只编译一次, 被排除的目录在进入前就被跳过。
+扫描器维护一份持久化索引 (相对路径 -> mtime、大小、inode、哈希、标签),
+文件未发生变化时既不重新打开读取标签, 也不重新计算哈希。
+
+源码位于 git 仓库中时可以改为从 git 索引枚举文件(git=True): 未修改的已跟踪文件以 blob
+ID 判断内容是否变化, 重新检出后修改时间全部改变也能复用索引中的哈希,
+只有已修改与未跟踪的文件按文件状态判断。
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from stat import S_ISDIR
+from typing import Iterable, Iterator, MutableMapping, TypedDict
+
+import pathspec
+
+from nuitkal_pack_server.tools.hash_utils import (
+    DEFAULT_ALGORITHM,
+    content_algorithm,
+    hash_files,
+)
+
+from .git_index import GitIndexError, GitWorktree, read_worktree
+from .tracing import HASH, Tracer
+
+# 默认排除的目录
+DEFAULT_EXCLUDES = ("/venv", "/.venv", "/env", "**/__pycache__", "**/__MACOSX")
+
+# 首行标签: [core]、[core-pyd]、[core-pyc]、[user-xxx]、[user-xxx-pyd]、[user-xxx-pyc]
+# 等
+CORE_TAG_PATTERN = re.compile(r"\[core(?:-(pyd|pyc|source))?\]")
+USER_TAG_PATTERN = re.compile(r"\[user-(\w+)(?:-(pyd|pyc|source))?\]")
+
+# 文件修改时间距扫描时间过近时, 同一时间戳内可能再次被修改, 不缓存其哈希与标签
+RACY_WINDOW_NS = 2 * 1_000_000_000
+
+
+@dataclass(frozen=True)
+class FileTags:
+    """Python 文件首行标签
+
+    Attributes:
+        core_mode: 核心文件的编译模式, 没有 [core] 标签时为None
+        users: (用户名, 编译模式) 列表, 未指定模式的用户继承核心文件的模式
+
+    """
+
+    core_mode: str | None
+    users: tuple[tuple[str, str], ...]
+
+
+@dataclass(frozen=True)
+class FileDigest:
+    """文件内容摘要
+
+    Attributes:
+        offset: 内容起始位置(跳过首行标签时为首行之后)
+        size: 内容大小
+        hash: 内容标识(带算法前缀的哈希, 见 hash_utils)
+
+    """
+
+    offset: int
+    size: int
+    hash: str
+
+
+@dataclass(frozen=True)
+class ScanEntry:
+    """扫描到的文件
+
+    Attributes:
+        full_path: 文件完整路径
+        rel_path: 相对源码目录的路径
+        mtime_ns: 修改时间(纳秒)
+        size: 文件大小
+        inode: inode 编号
+        blob: git 索引中的 blob ID, 仅在文件已跟踪且未修改时提供
+
+    """
+
+    full_path: Path
+    rel_path: Path
+    mtime_ns: int
+    size: int
+    inode: int
+    blob: str | None = None
+
+    @property
+    def stat_key(self) -> tuple[int, int, int]:
+        """用于判断文件是否变化的状态信息"""
+        return self.mtime_ns, self.size, self.inode
+
+
+class IndexRecord(TypedDict, total=False):
+    """索引中单个文件的记录"""
+
+    stat: tuple[int, int, int]  # (mtime_ns, size, inode)
+    blob: str  # git blob ID, 与扫描到的 blob ID 相同时不再比较文件状态
+    tags: FileTags | None  # 首行标签
+    digests: dict[bool, FileDigest]  # 是否跳过首行 -> 内容摘要
+
+
+def parse_tags(first_line: str) -> FileTags | None:
+    """解析 Python 文件首行标签, 没有任何标签时返回None"""
+    core_match = CORE_TAG_PATTERN.search(first_line)
+    user_match = USER_TAG_PATTERN.findall(first_line)
+    if not core_match and not user_match:
+        return None
+
+    core_mode = (core_match.group(1) if core_match else None) or "source"
+    return FileTags(
+        core_mode=core_mode if core_match else None,
+        users=tuple((user_name, mode or core_mode) for user_name, mode in user_match),
+    )
+
+
+class SourceScanner:
+    """带持久化状态缓存的增量源码扫描器
+
+    索引的读写由锁保护, 构建矩阵中多个打包器可以在各自的线程中共用同一个扫描器;
+    计算哈希时不持有锁。
+    """
+
+    INDEX_KEY = "scanner-index:v2"
+
+    def __init__(
+        self,
+        source_dir: Path,
+        *,
+        store: MutableMapping | None = None,
+        logger: logging.Logger | None = None,
+        tracer: Tracer | None = None,
+        git: bool = False,
+        algorithm: str = DEFAULT_ALGORITHM,
+    ):
+        """初始化扫描器
+
+        Args:
+            source_dir: 源代码目录
+            store: 持久化索引的存储(如 diskcache.Cache), 为None时索引只保存在内存中
+            logger: 日志记录器
+            tracer: 追踪记录器, 记录每次实际计算哈希的耗时
+            git: 从 git 索引枚举文件并以 blob ID 判断文件变化; 源码目录不在 git
+                仓库中时退回遍历文件系统
+            algorithm: 计算文件哈希的算法, 索引中其他算法的摘要视为不存在
+
+        """
+        self.source_dir = Path(source_dir).absolute()
+        self.store = store
+        self.logger = logger or logging.getLogger(__name__)
+        self.tracer = tracer or Tracer(enabled=False)
+        self.git = git
+        self.algorithm = algorithm
+
+        self._index: dict[str, IndexRecord] | None = None
+        self._seen: set[str] = set()
+        self._dirty = False
+        self._lock = threading.RLock()
+
+        self.hashed_count = 0  # 本次实际计算哈希的文件数
+        self.reused_count = 0  # 本次复用索引的次数
+
+    @property
+    def index(self) -> dict[str, IndexRecord]:
+        """文件索引, 首次访问时从存储中加载"""
+        if self._index is None:
+            self._index = {}
+            if self.store is not None:
+                try:
+                    self._index = dict(self.store.get(self.INDEX_KEY) or {})
+                except Exception as e:
+                    self.logger.warning(f"扫描索引读取失败: {e},将重新扫描")
+        return self._index
+
+    def walk(
+        self,
+        patterns: list[str] | tuple[str, ...] = ("*",),
+        exclude_files: list[str] | tuple[str, ...] = (),
+        *,
+        root: Path | None = None,
+    ) -> Iterator[ScanEntry]:
+        """递归遍历目录, 返回匹配 patterns 且未被排除的文件
+
+        Args:
+            patterns: 包含规则(gitignore 语法)
+            exclude_files: 排除规则(gitignore 语法), 会与默认排除规则合并
+            root: 遍历起点, 默认为源码目录
+
+        """
+        spec_include = pathspec.GitIgnoreSpec.from_lines(patterns)
+        spec_exclude = pathspec.GitIgnoreSpec.from_lines(
+            sorted(set(exclude_files) | set(DEFAULT_EXCLUDES))
+        )
+        directory = Path(root).absolute() if root else self.source_dir
+
+        if self.git:
+            try:
+                worktree = read_worktree(directory)
+            except GitIndexError as e:
+                self.logger.warning(f"{e}, 改为遍历文件系统")
+                self.git = False
+            else:
+                yield from self._walk_git(
+                    directory, worktree, spec_include, spec_exclude
+                )
+                return
+
+        yield from self._walk(directory, spec_include, spec_exclude)
+
+    def _is_excluded_dir(
+        self, rel_path_str: str, spec_exclude: pathspec.PathSpec
+    ) -> bool:
+        return spec_exclude.match_file(rel_path_str) or spec_exclude.match_file(
+            f"{rel_path_str}/"
+        )
+
+    def _walk(
+        self,
+        directory: Path,
+        spec_include: pathspec.PathSpec,
+        spec_exclude: pathspec.PathSpec,
+    ) -> Iterator[ScanEntry]:
+        with os.scandir(directory) as it:
+            dir_entries = list(it)
+
+        for dir_entry in dir_entries:
+            full_path = directory / dir_entry.name
+            rel_path = full_path.relative_to(self.source_dir)
+            rel_path_str = rel_path.as_posix()
+
+            if dir_entry.is_dir():
+                # 排除的目录不再进入
+                if not self._is_excluded_dir(rel_path_str, spec_exclude):
+                    yield from self._walk(full_path, spec_include, spec_exclude)
+                continue
+
+            if spec_exclude.match_file(rel_path_str) or not spec_include.match_file(
+                rel_path_str
+            ):
+                continue
+
+            stat = dir_entry.stat()
+            self._seen.add(rel_path_str)
+            yield ScanEntry(
+                full_path=full_path,
+                rel_path=rel_path,
+                mtime_ns=stat.st_mtime_ns,
+                size=stat.st_size,
+                inode=stat.st_ino,
+            )
+
+    def _walk_git(
+        self,
+        directory: Path,
+        worktree: GitWorktree,
+        spec_include: pathspec.PathSpec,
+        spec_exclude: pathspec.PathSpec,
+    ) -> Iterator[ScanEntry]:
+        """按 git 索引枚举文件, 未跟踪的目录(及子模块)遍历文件系统"""
+        files = [
+            (path, worktree.blobs.get(path))
+            for path in (*worktree.blobs, *worktree.dirty, *worktree.untracked_files)
+        ]
+        files.sort()
+
+        for path, blob in files:
+            full_path = directory / path
+            rel_path = full_path.relative_to(self.source_dir)
+            rel_path_str = rel_path.as_posix()
+            if spec_exclude.match_file(rel_path_str) or not spec_include.match_file(
+                rel_path_str
+            ):
+                continue
+
+            try:
+                stat = full_path.stat()
+            except FileNotFoundError:
+                # 已跟踪但在工作区中被删除
+                continue
+            if S_ISDIR(stat.st_mode):
+                # 指向目录的符号链接, 与遍历文件系统时一样进入目录
+                if not self._is_excluded_dir(rel_path_str, spec_exclude):
+                    yield from self._walk(full_path, spec_include, spec_exclude)
+                continue
+
+            self._seen.add(rel_path_str)
+            yield ScanEntry(
+                full_path=full_path,
+                rel_path=rel_path,
+                mtime_ns=stat.st_mtime_ns,
+                size=stat.st_size,
+                inode=stat.st_ino,
+                blob=blob,
+            )
+
+        for path in sorted(worktree.untracked_dirs):
+            full_path = directory / path
+            if full_path.is_dir() and not self._is_excluded_dir(
+                full_path.relative_to(self.source_dir).as_posix(), spec_exclude
+            ):
+                yield from self._walk(full_path, spec_include, spec_exclude)
+
+    def _record(self, entry: ScanEntry) -> IndexRecord:
+        """获取文件的索引记录, 文件发生变化时重置记录
+
+        扫描条目带有 blob ID 时以 blob ID 判断文件内容是否变化, 否则比较文件状态。
+        """
+        with self._lock:
+            rel_path_str = entry.rel_path.as_posix()
+            record = self.index.get(rel_path_str)
+
+            if record is not None and entry.blob is not None and "blob" in record:
+                if record["blob"] == entry.blob:
+                    # 内容未变化, 只有文件状态变化(如重新检出)时更新状态
+                    if record.get("stat") != entry.stat_key:
+                        record["stat"] = entry.stat_key
+                        self._dirty = True
+                    return record
+                # blob ID 不同, 内容已经变化
+                record = None
+
+            if record is None or record.get("stat") != entry.stat_key:
+                record = {"stat": entry.stat_key, "digests": {}}
+                self.index[rel_path_str] = record
+                self._dirty = True
+
+            if entry.blob is not None and record.get("blob") != entry.blob:
+                record["blob"] = entry.blob
+                self._dirty = True
+            return record
+
+    def _is_racy(self, entry: ScanEntry) -> bool:
+        """文件刚被修改过, 其状态信息不足以判断后续是否变化"""
+        return time.time_ns() - entry.mtime_ns < RACY_WINDOW_NS
+
+    def tags(self, entry: ScanEntry) -> FileTags | None:
+        """获取 Python 文件首行标签"""
+        with self._lock:
+            record = self._record(entry)
+            if "tags" in record:
+                return record["tags"]
+
+        # 只读取第一行进行标签匹配判断,避免加载整个文件
+        with entry.full_path.open("r", encoding="utf-8") as f:
+            tags = parse_tags(f.readline())
+
+        if not self._is_racy(entry):
+            with self._lock:
+                record["tags"] = tags
+                self._dirty = True
+        return tags
+
+    def _has_digest(self, record: IndexRecord, *, jump_first: bool) -> bool:
+        digest = record["digests"].get(jump_first)
+        return digest is not None and content_algorithm(digest.hash) == self.algorithm
+
+    def digest(self, entry: ScanEntry, *, jump_first: bool = False) -> FileDigest:
+        """获取文件内容摘要
+
+        Args:
+            entry: 扫描到的文件
+            jump_first: 是否跳过首行标签
+
+        """
+        (digest,) = self.digest_many([entry], jump_first=jump_first, workers=1)
+        return digest
+
+    def digest_many(
+        self,
+        entries: Iterable[ScanEntry],
+        *,
+        jump_first: bool = False,
+        workers: int | None = None,
+    ) -> list[FileDigest]:
+        """批量获取文件内容摘要, 索引中没有摘要的文件在线程池中并行计算哈希
+
+        Args:
+            entries: 扫描到的文件
+            jump_first: 是否跳过首行标签
+            workers: 计算哈希的线程数, 为None时使用CPU核心数
+
+        Returns:
+            与 entries 顺序相同的摘要
+
+        """
+        entries = list(entries)
+        with self._lock:
+            records = {entry.rel_path: self._record(entry) for entry in entries}
+            pending = {
+                entry.rel_path: entry
+                for entry in entries
+                if not self._has_digest(records[entry.rel_path], jump_first=jump_first)
+            }
+            # 先读出已有的摘要, 之后其他线程重置记录也不影响本次结果
+            digests = {
+                rel_path: record["digests"][jump_first]
+                for rel_path, record in records.items()
+                if rel_path not in pending
+            }
+            self.reused_count += len(entries) - len(pending)
+
+        if pending:
+            name = (
+                next(iter(pending)).as_posix()
+                if len(pending) == 1
+                else f"{len(pending)} files"
+            )
+            with self.tracer.span(name, HASH, files=len(pending)) as span:
+                hashes = hash_files(
+                    [entry.full_path for entry in pending.values()],
+                    skip_first_line=jump_first,
+                    workers=workers,
+                    algorithm=self.algorithm,
+                )
+                span["bytes"] = sum(file_hash.size for file_hash in hashes)
+
+            with self._lock:
+                for entry, file_hash in zip(pending.values(), hashes, strict=True):
+                    digest = digests[entry.rel_path] = FileDigest(
+                        offset=file_hash.offset,
+                        size=file_hash.size,
+                        hash=file_hash.hash,
+                    )
+                    # 计算期间记录可能已被其他线程重置, 写入索引中当前的记录
+                    if (
+                        not self._is_racy(entry)
+                        and (record := self.index.get(entry.rel_path.as_posix()))
+                        is not None
+                        and record.get("stat") == entry.stat_key
+                    ):
+                        record["digests"][jump_first] = digest
+                        self._dirty = True
+                self.hashed_count += len(pending)
+
+        return [digests[entry.rel_path] for entry in entries]
+
+    def save(self) -> None:
+        """保存索引, 只保留本次扫描到的文件"""
+        with self._lock:
+            if self._index is None:
+                return
+
+            stale = set(self._index) - self._seen
+            for rel_path_str in stale:
+                del self._index[rel_path_str]
+
+            if self.store is not None and (self._dirty or stale):
+                try:
+                    self.store[self.INDEX_KEY] = self._index
+                except Exception as e:
+                    self.logger.warning(f"扫描索引保存失败: {e}")
+
+            self._dirty = False
+            self._seen.clear()
@@ -0,0 +1,195 @@
+"""编译产物瘦身
+
+Nuitka 生成的扩展模块带有符号表与调试段, 每个 pyd 模块还附带一个 .pyi 类型存根,
+它们在运行时都用不到, 却会打入每个客户端下载的 ZIP 包:
+
+- 去除符号: 使用 strip 移除扩展模块中运行时不需要的符号与调试段, 导出的 PyInit_*
+  等动态符号保留; Nuitka 在 Linux 上默认已经去除符号,
+  只有段表中仍有符号表或调试段(如使用 --unstripped 编译)的扩展模块才执行 strip
+- 拆分存根: .pyi 不打入运行时 ZIP 包, 单独生成开发包(PythonPackager.to_dev_zip), 供 IDE
+  与类型检查使用
+
+去除符号后的扩展模块以原产物的哈希与 strip 参数作为缓存键存入编译产物缓存,
+未变化的模块不再重复处理。
+"""
+
+import shutil
+import struct
+import subprocess
+from typing import TYPE_CHECKING, BinaryIO, TypedDict
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+# 类型存根后缀
+STUB_SUFFIX = ".pyi"
+
+# 各平台的 strip 参数(按 sysconfig.get_platform() 的前缀); Windows 的 .pyd
+# 不内嵌调试信息(MSVC 写入单独的 .pdb), 不需要处理
+STRIP_ARGS = {
+    "linux": ("--strip-unneeded",),
+    "macosx": ("-x",),
+}
+
+
+# ELF 文件头标识, e_ident 的长度与其中的位数(ELFCLASS32/64)、字节序(ELFDATA2LSB/MSB)取值
+ELF_MAGIC = b"\x7fELF"
+ELF_IDENT_SIZE = 16
+ELF_CLASS_64 = 2
+ELF_DATA_LSB = 1
+
+# strip 可以去除的段: 静态符号表与调试信息
+STRIPPABLE_SECTIONS = (".symtab", ".debug", ".zdebug")
+
+
+class SlimResult(TypedDict):
+    """单个编译模块的瘦身结果"""
+
+    module: str  # 扩展模块在打包结果中的路径
+    original_bytes: int  # 去除符号前的大小
+    slim_bytes: int  # 去除符号后的大小, 未去除符号时与 original_bytes 相同
+    stub_bytes: int  # 从运行时包中拆分出的存根大小, 未拆分时为0
+
+
+def strip_args(platform_tag: str) -> tuple[str, ...] | None:
+    """目标平台的 strip 参数, 不需要(或不支持)去除符号的平台返回None
+
+    Args:
+        platform_tag: 工具链的平台标签(如 linux-x86_64、macosx-11.0-arm64)
+
+    """
+    return STRIP_ARGS.get(platform_tag.split("-", 1)[0])
+
+
+def has_strippable_sections(source: BinaryIO) -> bool:
+    """扩展模块是否含有可以去除的符号表或调试段
+
+    只解析 ELF 文件的段表; 其他格式(如 Mach-O)或无法解析的文件返回True, 交给 strip
+    处理。
+
+    Args:
+        source: 定位在扩展模块起始位置的文件
+
+    """
+    start = source.tell()
+    ident = source.read(ELF_IDENT_SIZE)
+    if (
+        len(ident) < ELF_IDENT_SIZE
+        or not ident.startswith(ELF_MAGIC)
+        or ident[4] not in (1, 2)
+        or ident[5] not in (1, 2)
+    ):
+        return True
+
+    # 32 位与 64 位的文件头、段表项布局不同; 段表项中只需要名称、偏移与大小
+    is_64 = ident[4] == ELF_CLASS_64
+    order = "<" if ident[5] == ELF_DATA_LSB else ">"
+    header_format, section_format = (
+        (("Q", "HHH", 0x28, 0x3A), ("QQ", 0x18))
+        if is_64
+        else (("I", "HHH", 0x20, 0x2E), ("II", 0x10))
+    )
+    try:
+        source.seek(start + header_format[2])
+        (shoff,) = struct.unpack(
+            order + header_format[0], source.read(struct.calcsize(header_format[0]))
+        )
+        source.seek(start + header_format[3])
+        shentsize, shnum, shstrndx = struct.unpack(
+            order + header_format[1], source.read(6)
+        )
+        if shoff == 0 or shnum == 0 or shstrndx >= shnum:
+            return True
+
+        source.seek(start + shoff)
+        table = source.read(shentsize * shnum)
+        sections = [
+            (
+                struct.unpack_from(order + "I", table, index * shentsize)[0],
+                *struct.unpack_from(
+                    order + section_format[0],
+                    table,
+                    index * shentsize + section_format[1],
+                ),
+            )
+            for index in range(shnum)
+        ]
+        _, names_offset, names_size = sections[shstrndx]
+        source.seek(start + names_offset)
+        names = source.read(names_size)
+    except struct.error:
+        return True
+
+    return any(
+        names[name : names.find(b"\0", name)]
+        .decode("ascii", errors="replace")
+        .startswith(STRIPPABLE_SECTIONS)
+        for name, _, _ in sections
+    )
+
+
+def find_strip() -> str | None:
+    """查找 strip 命令, 未安装时返回None"""
+    return shutil.which("strip")
+
+
+def strip_binary(
+    source: BinaryIO, target: "Path", *, strip: str, args: tuple[str, ...]
+) -> None:
+    """将扩展模块写入 target 并去除符号
+
+    Args:
+        source: 扩展模块内容
+        target: 输出路径
+        strip: strip 命令路径
+        args: strip 参数
+
+    Raises:
+        RuntimeError: strip 执行失败(如目标文件不是当前 strip 支持的格式)
+
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with target.open("wb") as f:
+        shutil.copyfileobj(source, f)
+
+    result = subprocess.run(
+        [strip, *args, str(target)],
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+        check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"去除符号失败({result.returncode}): {result.stderr.strip()}"
+        )
+
+
+def format_report(results: list[SlimResult]) -> list[str]:
+    """将瘦身结果格式化为日志行, 只列出有节省的模块, 最后一行为合计"""
+    lines = []
+    for result in results:
+        saved = result["original_bytes"] - result["slim_bytes"] + result["stub_bytes"]
+        if not saved:
+            continue
+        stub = f", 拆分存根 {result['stub_bytes']} 字节" if result["stub_bytes"] else ""
+        lines.append(
+            f"瘦身[pyd]: {result['module']}: "
+            f"{result['original_bytes']} -> {result['slim_bytes']} 字节{stub}, "
+            f"节省 {saved} 字节"
+        )
+
+    original = sum(
+        result["original_bytes"] + result["stub_bytes"] for result in results
+    )
+    saved = sum(
+        result["original_bytes"] - result["slim_bytes"] + result["stub_bytes"]
+        for result in results
+    )
+    ratio = saved / original if original else 0
+    lines.append(
+        f"瘦身完成: {len(results)} 个模块, {original} -> {original - saved} 字节, "
+        f"节省 {saved} 字节({ratio:.1%})"
+    )
+    return lines
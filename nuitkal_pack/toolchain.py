@@ -0,0 +1,127 @@
+"""编译工具链描述
+
+记录 Python 解释器与 Nuitka 的版本信息, 用于生成与机器、检出路径无关的编译缓存键。
+"""
+
+import json
+import platform
+import shutil
+import subprocess
+import sys
+import sysconfig
+from dataclasses import dataclass
+from functools import cache
+from importlib import metadata
+from pathlib import Path
+
+# 在目标解释器中执行的探测脚本, 输出与 Toolchain.current 相同的信息
+_PROBE_SCRIPT = """
+import json, sys, sysconfig
+from importlib import metadata
+try:
+    nuitka_version = metadata.version("nuitka")
+except metadata.PackageNotFoundError:
+    nuitka_version = "unknown"
+json.dump({
+    "python": sys.executable,
+    "nuitka_version": nuitka_version,
+    "cache_tag": sys.implementation.cache_tag or sys.implementation.name,
+    "ext_suffix": sysconfig.get_config_var("EXT_SUFFIX") or "",
+    "platform": sysconfig.get_platform(),
+}, sys.stdout)
+"""
+
+
+@dataclass(frozen=True)
+class Toolchain:
+    """编译工具链
+
+    Attributes:
+        python: Python 解释器路径
+        nuitka_version: Nuitka 版本号
+        cache_tag: 解释器缓存标签(如 cpython-311)
+        ext_suffix: 扩展模块后缀(包含 ABI 与平台信息, 如
+            .cpython-311-x86_64-linux-gnu.so)
+        platform: 平台标签(如 linux-x86_64)
+        command: 自定义 Nuitka 命令(如基准测试使用的模拟编译器),
+            为空时使用解释器目录下的 nuitka
+
+    """
+
+    python: Path
+    nuitka_version: str
+    cache_tag: str
+    ext_suffix: str
+    platform: str
+    command: tuple[str, ...] = ()
+
+    @classmethod
+    @cache
+    def current(cls) -> "Toolchain":
+        """获取当前解释器对应的工具链"""
+        try:
+            nuitka_version = metadata.version("nuitka")
+        except metadata.PackageNotFoundError:
+            nuitka_version = "unknown"
+
+        return cls(
+            python=Path(sys.executable),
+            nuitka_version=nuitka_version,
+            cache_tag=sys.implementation.cache_tag or sys.implementation.name,
+            ext_suffix=sysconfig.get_config_var("EXT_SUFFIX") or "",
+            platform=sysconfig.get_platform(),
+        )
+
+    @classmethod
+    @cache
+    def probe(cls, python: Path | str) -> "Toolchain":
+        """获取指定解释器对应的工具链, 在该解释器中执行探测脚本读取其版本与 ABI 信息
+
+        Args:
+            python: 解释器路径, 或 PATH 中的命令名(如 python3.12)
+
+        Raises:
+            RuntimeError: 解释器不存在或无法执行
+
+        """
+        executable = shutil.which(str(python)) or str(python)
+        try:
+            result = subprocess.run(
+                [executable, "-I", "-c", _PROBE_SCRIPT],
+                capture_output=True,
+                text=True,
+                encoding="utf-8",
+                check=True,
+                timeout=60,
+            )
+            info = json.loads(result.stdout)
+        except (OSError, subprocess.SubprocessError, ValueError) as e:
+            raise RuntimeError(f"无法获取解释器信息: {python}: {e}") from e
+
+        return cls(
+            python=Path(info["python"]),
+            nuitka_version=info["nuitka_version"],
+            cache_tag=info["cache_tag"],
+            ext_suffix=info["ext_suffix"],
+            platform=info["platform"],
+        )
+
+    @property
+    def tag(self) -> str:
+        """工具链标签, 参与缓存键计算(不包含解释器路径)"""
+        return (
+            f"{self.cache_tag}:{self.ext_suffix}:{self.platform}"
+            f":nuitka-{self.nuitka_version}"
+        )
+
+    @property
+    def nuitka_command(self) -> list[str]:
+        """Nuitka 命令行入口"""
+        if self.command:
+            return list(self.command)
+
+        match platform.system():
+            case "Windows":
+                return [str(self.python.parent / "nuitka.cmd")]
+            case _:
+                return [str(self.python.parent / "nuitka")]
@@ -0,0 +1,292 @@
+"""打包流程的结构化追踪
+
+在扫描、哈希、缓存查询、Nuitka 编译、字节码编译、产物瘦身、ZIP
+压缩等环节记录时间段(span), 每个时间段携带大小、命中与否等参数。记录结果可以导出为
+Chrome/Perfetto 能直接打开的 trace JSON(chrome://tracing 或 ui.perfetto.dev),
+也可以汇总为文本表格: 最慢的模块、缓存命中率、压缩吞吐量等。
+
+用法:
+    packager = PythonPackager(source_dir, trace=True)
+    packager.compile(...)
+    packager.to_zip()
+    packager.tracer.export_chrome("trace.json")
+    print(packager.tracer.format_summary())
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator, TypedDict
+
+# 时间段类别
+SCAN = "scan"  # 扫描源码目录
+HASH = "hash"  # 计算文件哈希
+CACHE = "cache"  # 查询本地编译缓存
+REMOTE_CACHE = "remote_cache"  # 查询服务器上的共享编译缓存
+COMPILE = "compile"  # Nuitka 编译
+BYTECODE = "bytecode"  # 编译 .pyc 字节码
+SLIM = "slim"  # 去除扩展模块的符号
+COMPRESS = "compress"  # 压缩单个文件
+ZIP = "zip"  # 写出单个用户的 ZIP 包
+PHASE = "phase"  # 打包流程的阶段(扫描、编译、打包)
+
+
+@dataclass
+class Span:
+    """一个已结束的时间段
+
+    Attributes:
+        name: 名称(如模块路径、用户名)
+        category: 类别
+        start_ns: 开始时间(time.perf_counter_ns)
+        duration_ns: 持续时间(纳秒)
+        thread_id: 记录时间段的线程
+        args: 附加参数(大小、是否命中等)
+
+    """
+
+    name: str
+    category: str
+    start_ns: int
+    duration_ns: int
+    thread_id: int
+    args: dict[str, Any]
+
+    @property
+    def seconds(self) -> float:
+        """持续时间(秒)"""
+        return self.duration_ns / 1e9
+
+
+class CategoryStats(TypedDict):
+    """单个类别的统计"""
+
+    count: int  # 时间段数量
+    seconds: float  # 累计耗时(多个线程的时间段会重叠)
+
+
+class TraceSummary(TypedDict):
+    """追踪结果汇总"""
+
+    wall_seconds: float  # 第一个时间段开始到最后一个时间段结束的时间
+    categories: dict[str, CategoryStats]  # 各类别的统计
+    slowest_compiles: list[tuple[str, float]]  # 耗时最长的编译(模块, 秒)
+    cache_hit_ratio: float | None  # 本地编译缓存命中率, 没有查询时为None
+    remote_cache_hit_ratio: float | None  # 远程编译缓存命中率, 没有查询时为None
+    compressed_raw_bytes: int  # 实际压缩的原始字节数
+    compress_mb_per_second: float  # 压缩吞吐量(MB/s, 按压缩时间段累计耗时计算)
+
+
+class Tracer:
+    """线程安全的时间段记录器, 未启用时不记录, 开销可以忽略"""
+
+    def __init__(self, *, enabled: bool = True):
+        """初始化记录器
+
+        Args:
+            enabled: 是否记录
+
+        """
+        self.enabled = enabled
+        self._spans: list[Span] = []
+        self._thread_names: dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, category: str, **args: Any) -> Iterator[dict[str, Any]]:  # noqa: ANN401
+        """记录一个时间段
+
+        返回的字典就是时间段的参数, 可以在时间段结束前补充结果(如是否命中)。
+
+        Args:
+            name: 名称
+            category: 类别
+            args: 附加参数
+
+        """
+        if not self.enabled:
+            yield args
+            return
+
+        start_ns = time.perf_counter_ns()
+        try:
+            yield args
+        finally:
+            duration_ns = time.perf_counter_ns() - start_ns
+            thread = threading.current_thread()
+            with self._lock:
+                self._thread_names.setdefault(thread.ident or 0, thread.name)
+                self._spans.append(
+                    Span(
+                        name=name,
+                        category=category,
+                        start_ns=start_ns,
+                        duration_ns=duration_ns,
+                        thread_id=thread.ident or 0,
+                        args=args,
+                    )
+                )
+
+    def spans(self, category: str | None = None) -> list[Span]:
+        """已记录的时间段, 可按类别过滤"""
+        with self._lock:
+            return [
+                span
+                for span in self._spans
+                if category is None or span.category == category
+            ]
+
+    def clear(self) -> None:
+        """清空已记录的时间段"""
+        with self._lock:
+            self._spans.clear()
+
+    def to_chrome_trace(self) -> dict:
+        """转换为 Chrome trace event 格式"""
+        spans = self.spans()
+        origin_ns = min((span.start_ns for span in spans), default=0)
+        pid = os.getpid()
+
+        # 线程 ID 映射为从 1 开始的小整数, 便于阅读
+        thread_ids = {
+            thread_id: index
+            for index, thread_id in enumerate(
+                dict.fromkeys(span.thread_id for span in spans), start=1
+            )
+        }
+
+        events: list[dict] = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": 0,
+                "args": {"name": "nuitkal-pack"},
+            }
+        ]
+        events.extend(
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": tid,
+                "args": {"name": self._thread_names.get(thread_id, str(thread_id))},
+            }
+            for thread_id, tid in thread_ids.items()
+        )
+        events.extend(
+            {
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": (span.start_ns - origin_ns) / 1000,
+                "dur": span.duration_ns / 1000,
+                "pid": pid,
+                "tid": thread_ids[span.thread_id],
+                "args": span.args,
+            }
+            for span in spans
+        )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome(self, path: Path | str) -> Path:
+        """导出为 Chrome/Perfetto trace JSON 文件"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            json.dumps(self.to_chrome_trace(), ensure_ascii=False, default=str),
+            encoding="utf-8",
+        )
+        return path
+
+    def summary(self, top: int = 10) -> TraceSummary:
+        """汇总追踪结果
+
+        Args:
+            top: 列出耗时最长的编译数量
+
+        """
+        spans = self.spans()
+
+        categories: dict[str, CategoryStats] = {}
+        for span in spans:
+            stats = categories.setdefault(span.category, {"count": 0, "seconds": 0.0})
+            stats["count"] += 1
+            stats["seconds"] += span.seconds
+
+        compiles = sorted(
+            (span for span in spans if span.category == COMPILE),
+            key=lambda span: span.duration_ns,
+            reverse=True,
+        )
+        compress_spans = [span for span in spans if span.category == COMPRESS]
+        compressed_raw_bytes = sum(
+            span.args.get("raw_bytes", 0) for span in compress_spans
+        )
+        compress_seconds = sum(span.seconds for span in compress_spans)
+
+        return {
+            "wall_seconds": (
+                max(span.start_ns + span.duration_ns for span in spans)
+                - min(span.start_ns for span in spans)
+            )
+            / 1e9
+            if spans
+            else 0.0,
+            "categories": categories,
+            "slowest_compiles": [(span.name, span.seconds) for span in compiles[:top]],
+            "cache_hit_ratio": self._hit_ratio(CACHE),
+            "remote_cache_hit_ratio": self._hit_ratio(REMOTE_CACHE),
+            "compressed_raw_bytes": compressed_raw_bytes,
+            "compress_mb_per_second": compressed_raw_bytes
+            / compress_seconds
+            / 1024
+            / 1024
+            if compress_seconds
+            else 0.0,
+        }
+
+    def _hit_ratio(self, category: str) -> float | None:
+        lookups = self.spans(category)
+        if not lookups:
+            return None
+        return sum(1 for span in lookups if span.args.get("hit")) / len(lookups)
+
+    def format_summary(self, top: int = 10) -> str:
+        """汇总追踪结果为文本表格"""
+        summary = self.summary(top)
+        lines = [
+            f"总耗时: {summary['wall_seconds']:.2f} 秒",
+            "",
+            f"{'类别':<14}{'数量':>8}{'累计耗时(秒)':>16}",
+        ]
+        lines.extend(
+            f"{category:<16}{stats['count']:>8}{stats['seconds']:>18.3f}"
+            for category, stats in sorted(
+                summary["categories"].items(), key=lambda item: -item[1]["seconds"]
+            )
+        )
+
+        if summary["slowest_compiles"]:
+            lines += ["", f"最慢的 {len(summary['slowest_compiles'])} 个编译:"]
+            lines.extend(
+                f"  {seconds:>9.2f} 秒  {name}"
+                for name, seconds in summary["slowest_compiles"]
+            )
+
+        lines.append("")
+        for label, ratio in (
+            ("本地编译缓存命中率", summary["cache_hit_ratio"]),
+            ("远程编译缓存命中率", summary["remote_cache_hit_ratio"]),
+        ):
+            if ratio is not None:
+                lines.append(f"{label}: {ratio:.1%}")
+        lines.append(
+            f"压缩: {summary['compressed_raw_bytes']} 字节, "
+            f"{summary['compress_mb_per_second']:.2f} MB/s"
+        )
+        return "\n".join(lines)
@@ -0,0 +1,436 @@
+"""监视模式: 源码变化后持续增量打包
+
+监视源码目录, 文件保存后在内存中的打包器上重新执行 compile。
+监视到的变化路径只用于触发构建与记录日志, 每次构建仍完整扫描源码目录并重新执行 compile,
+增量完全依赖以下缓存:
+- 扫描索引在内存中常驻, 未变化的文件(stat 未变)不重新读取标签与计算哈希
+- 编译产物缓存命中的模块不重新编译, 只编译被修改的模块
+- ZIP 构建器保留已压缩的成员, 只压缩内容变化的文件; 每次构建后丢弃不再被引用的成员,
+  内存与暂存文件不随保存次数增长
+- 只重写内容发生变化的用户 ZIP 包, 其他用户的输出保持不变
+
+Linux 下使用 inotify 接收文件变化事件, 其他平台或 inotify 不可用时退化为定时轮询
+(os.scandir + stat)。
+
+命令行用法:
+    python -m nuitkal_pack watch <源码目录> --output dist --static-files /static
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Protocol
+
+if TYPE_CHECKING:
+    from .packager import PythonPackager
+
+logger = logging.getLogger(__name__)
+
+# inotify 事件掩码, 见 <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+)
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+# 不需要监视的目录名
+IGNORED_DIR_NAMES = frozenset(
+    {
+        "__pycache__",
+        ".git",
+        ".hg",
+        ".svn",
+        "__MACOSX",
+        ".venv",
+        "venv",
+        ".packager_cache",
+    }
+)
+
+
+class WatchBackend(Protocol):
+    """文件变化监视后端"""
+
+    def wait(self, timeout: float | None) -> set[Path]:
+        """等待文件变化, 返回发生变化的路径; 超时后返回空集合"""
+        ...
+
+    def close(self) -> None:
+        """释放资源"""
+        ...
+
+
+class InotifyBackend:
+    """基于 Linux inotify 的监视后端, 递归监视所有子目录"""
+
+    def __init__(self, root: Path, *, ignore: Callable[[Path], bool]):
+        """初始化 inotify 监视
+
+        Raises:
+            OSError: 当前系统不支持 inotify
+
+        """
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify 仅在 Linux 下可用")
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+
+        self.root = root
+        self.ignore = ignore
+        self._watches: dict[int, Path] = {}
+        self._add_tree(root)
+
+    def _add_watch(self, directory: Path) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            # 目录可能已被删除, 或超出 max_user_watches
+            logger.warning(
+                f"无法监视目录 {directory}: {os.strerror(ctypes.get_errno())}"
+            )
+            return
+        self._watches[wd] = directory
+
+    def _add_tree(self, directory: Path) -> None:
+        if self.ignore(directory):
+            return
+
+        self._add_watch(directory)
+        try:
+            with os.scandir(directory) as it:
+                subdirs = [
+                    Path(entry.path)
+                    for entry in it
+                    if entry.is_dir(follow_symlinks=False)
+                ]
+        except OSError:
+            return
+
+        for subdir in subdirs:
+            if subdir.name not in IGNORED_DIR_NAMES:
+                self._add_tree(subdir)
+
+    def wait(self, timeout: float | None) -> set[Path]:
+        """等待文件变化事件"""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        try:
+            buffer = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed: set[Path] = set()
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(buffer):
+            wd, mask, _, name_length = _EVENT_HEADER.unpack_from(buffer, offset)
+            name = buffer[
+                offset + _EVENT_HEADER.size : offset + _EVENT_HEADER.size + name_length
+            ].rstrip(b"\0")
+            offset += _EVENT_HEADER.size + name_length
+
+            if mask & IN_Q_OVERFLOW:
+                # 事件队列溢出, 无法得知具体变化, 视为整个目录都发生了变化
+                changed.add(self.root)
+                continue
+
+            directory = self._watches.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_DELETE_SELF:
+                self._watches.pop(wd, None)
+                continue
+
+            path = directory / os.fsdecode(name) if name else directory
+            if self.ignore(path):
+                continue
+
+            # 新建或移入的目录需要加入监视, 其中已有的文件也视为变化
+            if (
+                mask & IN_ISDIR
+                and mask & (IN_CREATE | IN_MOVED_TO)
+                and path.name not in IGNORED_DIR_NAMES
+            ):
+                self._add_tree(path)
+            changed.add(path)
+
+        return changed
+
+    def close(self) -> None:
+        """关闭 inotify 文件描述符"""
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingBackend:
+    """定时轮询的监视后端, 比较文件的修改时间、大小与 inode"""
+
+    def __init__(
+        self, root: Path, *, ignore: Callable[[Path], bool], interval: float = 1.0
+    ):
+        """初始化轮询监视
+
+        Args:
+            root: 监视的根目录
+            ignore: 判断路径是否忽略
+            interval: 轮询间隔(秒)
+
+        """
+        self.root = root
+        self.ignore = ignore
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> dict[Path, tuple[int, int, int]]:
+        snapshot: dict[Path, tuple[int, int, int]] = {}
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        path = Path(entry.path)
+                        if self.ignore(path):
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in IGNORED_DIR_NAMES:
+                                stack.append(path)
+                        else:
+                            stat = entry.stat()
+                            snapshot[path] = (
+                                stat.st_mtime_ns,
+                                stat.st_size,
+                                stat.st_ino,
+                            )
+            except OSError:
+                continue
+        return snapshot
+
+    def wait(self, timeout: float | None) -> set[Path]:
+        """轮询一次(超时时间内), 返回与上次快照相比发生变化的文件"""
+        time.sleep(self.interval if timeout is None else min(self.interval, timeout))
+        snapshot = self._scan()
+        changed = {
+            path
+            for path in snapshot.keys() | self._snapshot.keys()
+            if snapshot.get(path) != self._snapshot.get(path)
+        }
+        self._snapshot = snapshot
+        return changed
+
+    def close(self) -> None:
+        """轮询后端无需释放资源"""
+
+
+class PackageWatcher:
+    """监视源码目录并持续增量打包"""
+
+    def __init__(
+        self,
+        packager: "PythonPackager",
+        output_dir: Path,
+        *,
+        compile_options: dict[str, Any] | None = None,
+        debounce: float = 0.3,
+        poll_interval: float = 1.0,
+        force_polling: bool = False,
+        trace_output: Path | str | None = None,
+    ):
+        """初始化监视器
+
+        Args:
+            packager: 打包器, 在整个监视期间常驻内存
+            output_dir: ZIP 包输出目录, 每个用户输出 <用户名>.zip
+            compile_options: 传给 PythonPackager.compile 的参数
+            debounce: 收到变化后等待的静默时间(秒), 期间的连续保存合并为一次构建
+            poll_interval: 轮询后端的轮询间隔(秒)
+            force_polling: 强制使用轮询后端
+            trace_output: 每次构建后导出 Chrome trace JSON
+                的文件路径(需要打包器启用追踪)
+
+        """
+        self.packager = packager
+        self.output_dir = Path(output_dir).absolute()
+        self.compile_options = dict(compile_options or {})
+        self.debounce = debounce
+        self.trace_output = (
+            Path(trace_output).absolute() if trace_output is not None else None
+        )
+        self.logger = packager.logger
+
+        # 输出目录位于源码目录中时不参与打包
+        if self.output_dir.is_relative_to(packager.source_dir):
+            exclude_files = self.compile_options.get("exclude_files", ())
+            self.compile_options["exclude_files"] = (
+                *exclude_files,
+                f"/{self.output_dir.relative_to(packager.source_dir).as_posix()}",
+            )
+
+        # 忽略输出目录与缓存目录中的变化, 否则每次构建写入的文件都会再次触发构建
+        self._ignored_roots = [self.output_dir]
+        if self.trace_output is not None:
+            self._ignored_roots.append(self.trace_output)
+        if packager.cache is not None:
+            self._ignored_roots.append(Path(packager.cache.directory).absolute())
+        if packager.artifact_cache is not None:
+            self._ignored_roots.append(packager.artifact_cache.root)
+        if packager.build_cache is not None:
+            self._ignored_roots.append(packager.build_cache.root)
+
+        self.backend: WatchBackend
+        if not force_polling:
+            try:
+                self.backend = InotifyBackend(
+                    packager.source_dir, ignore=self._is_ignored
+                )
+                self.logger.info("监视模式: 使用 inotify")
+            except OSError as e:
+                self.logger.info(f"inotify 不可用({e}), 使用轮询")
+                force_polling = True
+        if force_polling:
+            self.backend = PollingBackend(
+                packager.source_dir, ignore=self._is_ignored, interval=poll_interval
+            )
+            self.logger.info(f"监视模式: 每 {poll_interval} 秒轮询一次")
+
+        self._fingerprints: dict[str, tuple[tuple[str, str], ...]] = {}
+
+    def _is_ignored(self, path: Path) -> bool:
+        return any(path.is_relative_to(root) for root in self._ignored_roots)
+
+    def _user_fingerprints(self) -> dict[str, tuple[tuple[str, str], ...]]:
+        """各用户 ZIP 包的内容指纹: (ZIP 内路径, 文件哈希) 列表"""
+        packager = self.packager
+        fingerprints = {}
+        for name in packager.user_map:
+            file_map = {
+                **packager.core_map,
+                **packager.static_map,
+                **packager.user_map[name],
+            }
+            fingerprints[name] = tuple(
+                sorted(
+                    (file.rel_path.as_posix(), file.file_hash)
+                    for files in file_map.values()
+                    for file in files
+                )
+            )
+        return fingerprints
+
+    def build(self) -> list[str]:
+        """重新编译并写出内容变化的用户 ZIP 包
+
+        不论哪些文件发生变化, 都完整扫描并重新编译, 未变化的文件由扫描索引、编译缓存与
+        ZIP 构建器复用。
+
+        Returns:
+            本次重写的用户列表
+
+        """
+        start_time = time.perf_counter()
+        self.packager.tracer.clear()
+        self.packager.reset()
+        self.packager.compile(**self.compile_options)
+
+        fingerprints = self._user_fingerprints()
+        changed_users = [
+            name
+            for name, fingerprint in fingerprints.items()
+            if self._fingerprints.get(name) != fingerprint
+        ]
+
+        if changed_users:
+            # 先写入临时文件再替换, 读取方不会看到写了一半的文件
+            for name, target in self.packager.write_zips(
+                self.output_dir, user_names=changed_users
+            ).items():
+                self.logger.info(f"已更新用户包[{name}]: {target}")
+
+        # 已不存在的用户, 删除其输出
+        for name in self._fingerprints.keys() - fingerprints.keys():
+            (self.output_dir / f"{name}.zip").unlink(missing_ok=True)
+            self.logger.info(f"删除用户包: {name}.zip")
+
+        self._fingerprints = fingerprints
+
+        # 丢弃本次构建不再引用的压缩结果(如被修改文件的旧版本)
+        if dropped := self.packager.zip_builder.retain(
+            file_hash
+            for fingerprint in fingerprints.values()
+            for _, file_hash in fingerprint
+        ):
+            self.logger.info(f"丢弃 {dropped} 个不再引用的压缩成员")
+        self.logger.info(
+            f"增量打包完成: 重写 {len(changed_users)} 个用户包, "
+            f"耗时 {time.perf_counter() - start_time:.2f} 秒"
+        )
+
+        if self.trace_output is not None and self.packager.tracer.enabled:
+            self.packager.tracer.export_chrome(self.trace_output)
+            self.logger.info(
+                f"追踪记录已导出: {self.trace_output}\n"
+                f"{self.packager.tracer.format_summary()}"
+            )
+        return changed_users
+
+    def run(self, stop_event: threading.Event | None = None) -> None:
+        """执行一次完整构建, 然后持续监视源码变化直到 stop_event 被设置或 Ctrl+C"""
+        stop_event = stop_event or threading.Event()
+        self.build()
+
+        try:
+            while not stop_event.is_set():
+                changed = self.backend.wait(timeout=1.0)
+                if not changed:
+                    continue
+
+                # 等待连续保存结束, 合并为一次构建
+                while more := self.backend.wait(timeout=self.debounce):
+                    changed |= more
+
+                names = sorted(
+                    str(path.relative_to(self.packager.source_dir)) for path in changed
+                )
+                self.logger.info(
+                    f"检测到 {len(changed)} 处变化: {', '.join(names[:5])}"
+                )
+                try:
+                    self.build()
+                except Exception:
+                    # 编译错误不退出监视, 修复后下一次保存会重新构建
+                    self.logger.exception("增量打包失败, 等待下一次修改")
+        except KeyboardInterrupt:
+            self.logger.info("监视已停止")
+        finally:
+            self.backend.close()
@@ -0,0 +1,434 @@
+"""多用户 ZIP 包构建器
+
+同一个 BuildFile 会出现在多个用户的 ZIP 包中(核心文件、静态文件),
+构建器按文件内容只压缩一次, 之后将压缩好的数据连同 CRC 与大小直接写入每个用户的 ZIP 包,
+使每个用户包的构建开销只与其独有文件相关。
+
+压缩结果保存在磁盘上的暂存文件中, 内存中只保留偏移与大小等元信息,
+构建时的内存占用与文件总大小无关; 直接存储(不压缩)的成员不再复制, 写入时从源文件读取。
+每个成员的压缩方式由压缩策略决定。
+
+可复现模式下成员按路径排序, 时间、权限与创建系统固定, 相同的输入生成逐字节相同的 ZIP 包,
+便于按整包哈希缓存与去重。
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Callable, Iterable, Iterator, Mapping
+
+from nuitkal_pack_server.tools import zipfile
+from nuitkal_pack_server.tools.zip_manifest import (
+    HASH_MANIFEST_NAME,
+    ManifestEntry,
+    dump_hash_manifest,
+)
+
+from .compression import CompressionChoice, CompressionPolicy
+from .tracing import COMPRESS, Tracer
+
+if TYPE_CHECKING:
+    from .packager import BuildFile
+
+# 读写数据的块大小
+CHUNK_SIZE = 1024 * 1024
+
+# 单个文件压缩时在内存中缓冲的上限, 超出后写入临时文件
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# 可复现模式下成员的固定权限(-rw-r--r--)与创建系统(Unix)
+REPRODUCIBLE_MODE = 0o644
+REPRODUCIBLE_CREATE_SYSTEM = 3
+
+# ZIP 格式能表示的时间范围(1980 到 2107 年)
+ZIP_MIN_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+ZIP_MAX_DATE_TIME = (2107, 12, 31, 23, 59, 58)
+
+
+@dataclass(frozen=True)
+class CompressedMember:
+    """压缩后的 ZIP 成员数据
+
+    Attributes:
+        compress_type: 压缩方式
+        crc: 原始数据的 CRC32
+        file_size: 原始数据大小
+        compress_size: 压缩后数据大小
+        offset: 压缩数据在暂存文件中的偏移, 为None时数据未压缩, 直接从源文件读取
+
+    """
+
+    compress_type: int
+    crc: int
+    file_size: int
+    compress_size: int
+    offset: int | None
+
+
+def compress_chunks(
+    chunks: Iterable[bytes],
+    dst: IO[bytes],
+    *,
+    compress_type: int = zipfile.ZIP_DEFLATED,
+    compresslevel: int | None = 9,
+) -> tuple[int, int, int]:
+    """按 ZIP 成员格式流式压缩数据
+
+    Args:
+        chunks: 原始数据块
+        dst: 压缩数据输出流
+        compress_type: 压缩方式, 支持 ZIP_STORED 与 ZIP_DEFLATED
+        compresslevel: 压缩级别
+
+    Returns:
+        (CRC32, 原始大小, 压缩后大小)
+
+    """
+    match compress_type:
+        case zipfile.ZIP_STORED:
+            compressor = None
+        case zipfile.ZIP_DEFLATED:
+            # ZIP 使用不带头部的原始 deflate 流
+            compressor = zlib.compressobj(
+                zlib.Z_DEFAULT_COMPRESSION if compresslevel is None else compresslevel,
+                zlib.DEFLATED,
+                -15,
+            )
+        case _:
+            raise ValueError(f"不支持的压缩方式: {compress_type}")
+
+    crc = 0
+    file_size = 0
+    compress_size = 0
+    for chunk in chunks:
+        crc = zlib.crc32(chunk, crc)
+        file_size += len(chunk)
+        data = compressor.compress(chunk) if compressor else chunk
+        compress_size += len(data)
+        dst.write(data)
+
+    if compressor:
+        data = compressor.flush()
+        compress_size += len(data)
+        dst.write(data)
+
+    return crc, file_size, compress_size
+
+
+def reproducible_date_time() -> tuple[int, int, int, int, int, int]:
+    """可复现模式下成员的固定时间
+
+    设置了环境变量 SOURCE_DATE_EPOCH 时使用该时间(UTC), 否则使用 ZIP
+    格式能表示的最早时间 1980-01-01 00:00:00。
+    """
+    epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    if not epoch:
+        return ZIP_MIN_DATE_TIME
+
+    date_time = time.gmtime(int(epoch))[:6]
+    return min(max(date_time, ZIP_MIN_DATE_TIME), ZIP_MAX_DATE_TIME)
+
+
+class ZipBuilder:
+    """压缩一次、多处复用的 ZIP 构建器"""
+
+    def __init__(
+        self,
+        *,
+        policy: CompressionPolicy | None = None,
+        reproducible: bool = False,
+        tracer: Tracer | None = None,
+    ):
+        """初始化 ZIP 构建器
+
+        Args:
+            policy: 压缩策略, 默认按扩展名与抽样压缩率自适应选择
+            reproducible: 可复现模式, 成员按路径排序并使用固定的时间、权限与创建系统,
+                相同的输入在任何机器上都生成逐字节相同的 ZIP 包
+            tracer: 追踪记录器, 记录每个文件实际压缩的耗时与大小
+
+        """
+        self.policy = policy or CompressionPolicy()
+        self.reproducible = reproducible
+        self.tracer = tracer or Tracer(enabled=False)
+
+        self._members: dict[tuple[str, int, int | None], CompressedMember] = {}
+        self._lock = threading.Lock()
+
+        # 保存所有压缩结果的暂存文件, 首次压缩时创建
+        self._spool_path: Path | None = None
+        self._spool: IO[bytes] | None = None
+
+        self.compressed_count = 0  # 实际压缩的文件数
+        self.reused_count = 0  # 复用已压缩数据的次数
+
+    def compress(self, file: "BuildFile") -> CompressedMember:
+        """压缩文件, 相同内容只压缩一次"""
+        choice = self.policy.choose(file)
+        key = (file.file_hash, choice.compress_type, choice.compresslevel)
+
+        with self._lock:
+            member = self._members.get(key)
+            if member is not None:
+                self.reused_count += 1
+                return member
+
+        with self.tracer.span(
+            file.rel_path.as_posix(), COMPRESS, rule=choice.rule, raw_bytes=file.size
+        ) as span:
+            member = self._compress(file, key, choice)
+            span["compressed_bytes"] = member.compress_size
+        return member
+
+    def _compress(
+        self,
+        file: "BuildFile",
+        key: tuple[str, int, int | None],
+        choice: CompressionChoice,
+    ) -> CompressedMember:
+        """按选定的压缩方式压缩文件并写入暂存文件"""
+        start_time = time.thread_time()
+
+        # 直接存储的成员只计算CRC, 写入时从源文件读取
+        if choice.compress_type == zipfile.ZIP_STORED:
+            crc = 0
+            for chunk in file.iter_chunks(CHUNK_SIZE):
+                crc = zlib.crc32(chunk, crc)
+            member = CompressedMember(
+                compress_type=zipfile.ZIP_STORED,
+                crc=crc,
+                file_size=file.size,
+                compress_size=file.size,
+                offset=None,
+            )
+            self.policy.record(
+                choice.rule,
+                raw_bytes=file.size,
+                compressed_bytes=file.size,
+                cpu_seconds=time.thread_time() - start_time,
+            )
+
+            with self._lock:
+                self.compressed_count += 1
+                return self._members.setdefault(key, member)
+
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as buffer:
+            crc, file_size, compress_size = compress_chunks(
+                file.iter_chunks(CHUNK_SIZE),
+                buffer,
+                compress_type=choice.compress_type,
+                compresslevel=choice.compresslevel,
+            )
+            self.policy.record(
+                choice.rule,
+                raw_bytes=file_size,
+                compressed_bytes=compress_size,
+                cpu_seconds=time.thread_time() - start_time,
+            )
+            buffer.seek(0)
+
+            with self._lock:
+                # 其他线程可能已经压缩了相同内容
+                member = self._members.get(key)
+                if member is not None:
+                    return member
+
+                spool = self._open_spool()
+                offset = spool.seek(0, os.SEEK_END)
+                shutil.copyfileobj(buffer, spool, CHUNK_SIZE)
+                spool.flush()
+
+                member = CompressedMember(
+                    compress_type=choice.compress_type,
+                    crc=crc,
+                    file_size=file_size,
+                    compress_size=compress_size,
+                    offset=offset,
+                )
+                self._members[key] = member
+                self.compressed_count += 1
+                return member
+
+    def _open_spool(self) -> IO[bytes]:
+        if self._spool is None:
+            fd, name = tempfile.mkstemp(prefix="nuitkal-pack-", suffix=".spool")
+            self._spool_path = Path(name)
+            self._spool = os.fdopen(fd, "w+b")
+        return self._spool
+
+    def _read_member(
+        self, reader: IO[bytes] | None, member: CompressedMember, file: "BuildFile"
+    ) -> Iterator[bytes]:
+        """分块读取成员数据: 未压缩的成员从源文件读取, 其余从暂存文件读取"""
+        if member.offset is None or reader is None:
+            yield from file.iter_chunks(CHUNK_SIZE)
+            return
+
+        reader.seek(member.offset)
+        remaining = member.compress_size
+        while remaining > 0:
+            chunk = reader.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                raise OSError("压缩暂存文件被截断")
+            remaining -= len(chunk)
+            yield chunk
+
+    def write(
+        self,
+        fp: IO[bytes],
+        files: Iterable["BuildFile"],
+        *,
+        extra_members: Mapping[str, bytes] | None = None,
+        manifest: bool = False,
+        progress: Callable[[int], None] | None = None,
+    ) -> int:
+        """将文件写入 ZIP 包, 可以在多个线程中同时写入不同的 ZIP 包
+
+        Args:
+            fp: 输出流
+            files: 需要写入的文件
+            extra_members: 额外写入的成员 {ZIP 内路径: 数据}, 如增量清单
+            manifest: 在最后写入哈希清单 {文件路径: {哈希, 大小, CRC}}, 上传时据此去重,
+                不需要解压每个成员计算哈希
+            progress: 进度回调, 每写入一个成员后以已写入的成员数调用
+
+        Returns:
+            写入的成员数据(压缩后)总字节数
+
+        """
+        if self.reproducible:
+            date_time = reproducible_date_time()
+            files = sorted(files, key=lambda file: file.rel_path.as_posix())
+            extra_members = dict(sorted((extra_members or {}).items()))
+        else:
+            date_time = time.localtime(time.time())[:6]
+
+        with zipfile.ZipFile(fp, "w", zipfile.ZIP_DEFLATED) as zf:
+            reader: IO[bytes] | None = None
+            written = 0
+            member_bytes = 0
+            hash_manifest: dict[str, ManifestEntry] = {}
+            try:
+                for file in files:
+                    member = self.compress(file)
+                    if (
+                        reader is None
+                        and member.offset is not None
+                        and self._spool_path is not None
+                    ):
+                        reader = self._spool_path.open("rb")
+
+                    zinfo = zipfile.ZipInfo(
+                        filename=file.rel_path.as_posix(), date_time=date_time
+                    )
+                    zinfo.compress_type = member.compress_type
+                    zinfo.CRC = member.crc
+                    zinfo.file_size = member.file_size
+                    zinfo.compress_size = member.compress_size
+                    self._normalize(zinfo)
+                    zf.writecompressed(zinfo, self._read_member(reader, member, file))
+                    member_bytes += member.compress_size
+                    hash_manifest[zinfo.filename] = {
+                        "hash": file.file_hash,
+                        "size": member.file_size,
+                        "crc": member.crc,
+                    }
+                    written += 1
+                    if progress is not None:
+                        progress(written)
+
+                if manifest:
+                    extra_members = {
+                        **(extra_members or {}),
+                        HASH_MANIFEST_NAME: dump_hash_manifest(hash_manifest),
+                    }
+
+                for name, data in (extra_members or {}).items():
+                    zinfo = zipfile.ZipInfo(filename=name, date_time=date_time)
+                    zinfo.compress_type = zipfile.ZIP_DEFLATED
+                    self._normalize(zinfo)
+                    zf.writestr(zinfo, data)
+                    member_bytes += zinfo.compress_size
+                    written += 1
+                    if progress is not None:
+                        progress(written)
+            finally:
+                if reader is not None:
+                    reader.close()
+
+        return member_bytes
+
+    def _normalize(self, zinfo: zipfile.ZipInfo) -> None:
+        """可复现模式下统一成员属性, 避免因构建机的操作系统与文件权限不同而产生差异"""
+        if self.reproducible:
+            zinfo.create_system = REPRODUCIBLE_CREATE_SYSTEM
+            zinfo.external_attr = REPRODUCIBLE_MODE << 16
+
+    def retain(self, file_hashes: Iterable[str]) -> int:
+        """只保留指定内容的压缩结果, 其余成员丢弃, 暂存文件重写为只包含保留的数据
+
+        长期复用的构建器(如监视模式)每次构建后调用, 内存与暂存文件不随构建次数增长。
+        不能与 write 同时调用。
+
+        Args:
+            file_hashes: 仍被引用的文件内容哈希
+
+        Returns:
+            丢弃的成员数
+
+        """
+        keep = set(file_hashes)
+        with self._lock:
+            members = {
+                key: member for key, member in self._members.items() if key[0] in keep
+            }
+            dropped = len(self._members) - len(members)
+            if not dropped:
+                return 0
+
+            if self._spool is not None and self._spool_path is not None:
+                # 将保留的压缩数据复制到新的暂存文件
+                old_spool, old_path = self._spool, self._spool_path
+                self._spool = self._spool_path = None
+                spool = None
+                for key, member in members.items():
+                    if member.offset is None:
+                        continue
+                    spool = spool or self._open_spool()
+                    old_spool.seek(member.offset)
+                    offset = spool.seek(0, os.SEEK_END)
+                    remaining = member.compress_size
+                    while remaining > 0:
+                        chunk = old_spool.read(min(CHUNK_SIZE, remaining))
+                        if not chunk:
+                            raise OSError("压缩暂存文件被截断")
+                        spool.write(chunk)
+                        remaining -= len(chunk)
+                    members[key] = replace(member, offset=offset)
+                if spool is not None:
+                    spool.flush()
+                old_spool.close()
+                old_path.unlink(missing_ok=True)
+
+            self._members = members
+            return dropped
+
+    def clear(self) -> None:
+        """清空已压缩的数据并删除暂存文件"""
+        with self._lock:
+            self._members.clear()
+            if self._spool is not None:
+                self._spool.close()
+                self._spool = None
+            if self._spool_path is not None:
+                self._spool_path.unlink(missing_ok=True)
+                self._spool_path = None
+
+    def __del__(self):
+        """析构函数, 确保暂存文件被删除"""
+        self.clear()
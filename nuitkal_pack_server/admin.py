@@ -1,4 +1,3 @@
-import hashlib
 import io
 import os
 import tempfile
@@ -9,7 +8,9 @@ from django.core.files import File
 from django.core.files.uploadedfile import UploadedFile
 from django.utils.html import format_html, mark_safe  # type: ignore[attr-defined]
 
-from .models import App, AppVersion, VersionFile
+from .models import App, AppVersion, BuildArtifact, VersionFile
+from .tools.hash_utils import calculate_file_hash
+from .tools.version_service import VersionService
 
 
 class VersionPackager:
@@ -41,11 +42,20 @@ class VersionPackager:
 
                     with zip_ref.open(file_path) as extracted_file:
                         content = extracted_file.read()
-                        content_hash = hashlib.sha256(content).hexdigest()
+                        content_hash = calculate_file_hash(
+                            content, algorithm=VersionService.hash_algorithm()
+                        )
 
                         if not VersionFile.objects.filter(id=content_hash).exists():
-                            django_file = File(io.BytesIO(content), name=content_hash)
-                            VersionFile.objects.create(id=content_hash, version=app_version, size=len(content), file=django_file)
+                            django_file = File(
+                                io.BytesIO(content), name=content_hash.replace(":", "-")
+                            )
+                            VersionFile.objects.create(
+                                id=content_hash,
+                                version=app_version,
+                                size=len(content),
+                                file=django_file,
+                            )
 
                         self.file_manifest.append({"hash": content_hash, "path": file_path})
 
@@ -148,6 +158,24 @@ class VersionFileAdmin(admin.ModelAdmin):
         return f"{obj.size / 1024 / 1024:.2f} MB"
 
 
+@admin.register(BuildArtifact)
+class BuildArtifactAdmin(admin.ModelAdmin):
+    """编译产物管理"""
+
+    list_display = ("module", "toolchain", "hit_count", "last_hit_at", "created_at")
+    list_filter = ("toolchain", "created_at")
+    search_fields = ("id", "module")
+    readonly_fields = (
+        "id",
+        "module",
+        "toolchain",
+        "files",
+        "hit_count",
+        "last_hit_at",
+        "created_at",
+    )
+
+
 # 自定义 Admin 标题
 admin.site.site_header = "Nuitkal Pack 管理后台"
 admin.site.site_title = "Nuitkal Pack"
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = (
+        ("nuitkal_pack_server", "000X_create_root_user"),
+    )
+
+    operations = (
+        migrations.CreateModel(
+            name="BuildArtifact",
+            fields=[
+                (
+                    "id",
+                    models.CharField(
+                        max_length=64,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="缓存键",
+                    ),
+                ),
+                ("module", models.CharField(max_length=255, verbose_name="模块路径")),
+                ("toolchain", models.CharField(max_length=255, verbose_name="工具链")),
+                ("files", models.JSONField(default=list, verbose_name="产物文件")),
+                (
+                    "hit_count",
+                    models.PositiveIntegerField(default=0, verbose_name="命中次数"),
+                ),
+                (
+                    "last_hit_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="最近命中时间"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="创建时间"),
+                ),
+            ],
+            options={
+                "verbose_name": "编译产物",
+                "verbose_name_plural": "编译产物列表",
+                "ordering": ("-created_at",),
+            },
+        ),
+    )
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = (
+        ("nuitkal_pack_server", "0002_buildartifact"),
+    )
+
+    operations = (
+        migrations.AlterField(
+            model_name="versionfile",
+            name="id",
+            field=models.CharField(
+                max_length=80,
+                primary_key=True,
+                serialize=False,
+                verbose_name="文件Hash",
+            ),
+        ),
+    )
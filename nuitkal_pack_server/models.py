@@ -11,7 +11,7 @@ from django.utils import timezone
 if TYPE_CHECKING:
     from typing import Self
 
-    from .tools.types import FileInfo, IncrementalUpdateInfo
+    from .tools.types import ArtifactFileInfo, FileInfo, IncrementalUpdateInfo
 
 
 class App(models.Model):
@@ -193,7 +193,8 @@ class AppVersion(models.Model):
 class VersionFile(models.Model):
     """文件信息模型 - 存储文件内容"""
 
-    id = models.CharField(max_length=64, primary_key=True, verbose_name="文件Hash")
+    # 内容标识: SHA256 为64位十六进制, 其他算法为 "<算法>:<64位十六进制>"
+    id = models.CharField(max_length=80, primary_key=True, verbose_name="文件Hash")
 
     file = models.FileField(upload_to="nuitkal-pack", verbose_name="文件")
 
@@ -219,3 +220,54 @@ class VersionFile(models.Model):
     def get(cls, pk: str) -> "Self":
         """获取文件URL"""
         return cls.objects.get(id=pk)
+
+
+class BuildArtifact(models.Model):
+    """编译产物模型 - 多台构建机共享的 Nuitka 编译缓存
+
+    缓存键由源文件哈希、模块路径、工具链与编译参数计算得到(与打包器本地编译缓存的键相同),
+    产物文件内容保存为 VersionFile, 与版本文件共用同一份内容寻址存储。
+    """
+
+    id = models.CharField(max_length=64, primary_key=True, verbose_name="缓存键")
+
+    module = models.CharField(max_length=255, verbose_name="模块路径")
+
+    toolchain = models.CharField(max_length=255, verbose_name="工具链")
+
+    # [{"name": 产物文件名, "hash": 文件哈希值}]
+    files = models.JSONField(default=list, verbose_name="产物文件")
+
+    hit_count = models.PositiveIntegerField(default=0, verbose_name="命中次数")
+
+    last_hit_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="最近命中时间"
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+
+    class Meta:
+        verbose_name = "编译产物"
+
+        verbose_name_plural = "编译产物列表"
+
+        ordering = ("-created_at",)
+
+    def __str__(self) -> str:
+        """返回编译产物的字符串表示"""
+        return f"{self.module} ({self.toolchain})"
+
+    def get_files(self) -> list["ArtifactFileInfo"]:
+        """获取产物文件信息"""
+        results = []
+        for item in self.files:
+            file = VersionFile.get(item["hash"]).file
+            results.append(
+                {
+                    "name": item["name"],
+                    "hash": item["hash"],
+                    "url": file.url,
+                    "size": file.size,
+                }
+            )
+        return results
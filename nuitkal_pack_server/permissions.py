@@ -0,0 +1,31 @@
+import secrets
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+if TYPE_CHECKING:
+    from rest_framework.request import Request
+    from rest_framework.views import APIView
+
+
+class HasBuildToken(BasePermission):
+    """构建机令牌校验
+
+    请求头需要携带 ``Authorization: Bearer <令牌>``, 令牌在
+    settings.NUITKAL_PACK_BUILD_TOKENS 中配置; 未配置令牌时拒绝所有请求。
+    """
+
+    message = "缺少或无效的构建机令牌"
+
+    def has_permission(self, request: "Request", view: "APIView") -> bool:
+        """校验请求头中的令牌"""
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return False
+
+        tokens = getattr(settings, "NUITKAL_PACK_BUILD_TOKENS", ())
+        return any(
+            secrets.compare_digest(token.encode(), allowed.encode())
+            for allowed in tokens
+        )
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 
-from .models import App, AppVersion
+from .models import App, AppVersion, BuildArtifact
 
 
 class AppVersionSerializer(serializers.ModelSerializer):
@@ -45,3 +45,18 @@ class AppSerializer(serializers.ModelSerializer):
         active_version = obj.get_active_version()
 
         return dict(AppVersionSerializer(active_version).data) if active_version else None
+
+
+class BuildArtifactSerializer(serializers.ModelSerializer):
+    """编译产物序列化器"""
+
+    files = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BuildArtifact
+
+        fields = ("id", "module", "toolchain", "files", "hit_count", "created_at")
+
+    def get_files(self, obj: BuildArtifact) -> list[dict]:
+        """获取产物文件信息"""
+        return obj.get_files()
@@ -0,0 +1,46 @@
+"""增量包清单
+
+增量打包时 ZIP 包中只包含有变化的文件, 未变化的文件(服务器激活版本中路径与哈希都相同)
+以 {文件相对路径: 文件哈希值} 的形式写入保留成员 UNCHANGED_MANIFEST_NAME 中,
+上传时服务器与客户端将其合并到新版本的文件清单。
+"""
+
+import json
+from typing import TYPE_CHECKING, Mapping
+
+if TYPE_CHECKING:
+    from nuitkal_pack_server.tools import zipfile
+
+# 增量清单在 ZIP 包中的保留路径
+UNCHANGED_MANIFEST_NAME = ".nuitkal-pack/unchanged.json"
+
+
+def dump_unchanged_manifest(manifest: Mapping[str, str]) -> bytes:
+    """序列化未变化文件清单"""
+    return json.dumps(
+        dict(sorted(manifest.items())), ensure_ascii=False, indent=2
+    ).encode("utf-8")
+
+
+def read_unchanged_manifest(zip_file: "zipfile.ZipFile") -> dict[str, str]:
+    """读取 ZIP 包中的未变化文件清单, 不是增量包时返回空字典
+
+    Raises:
+        ValueError: 清单格式错误
+
+    """
+    if UNCHANGED_MANIFEST_NAME not in zip_file.NameToInfo:
+        return {}
+
+    try:
+        manifest = json.loads(zip_file.read(UNCHANGED_MANIFEST_NAME))
+    except json.JSONDecodeError as e:
+        raise ValueError(f"增量清单格式错误: {e}") from e
+
+    if not isinstance(manifest, dict) or not all(
+        isinstance(key, str) and isinstance(value, str)
+        for key, value in manifest.items()
+    ):
+        raise ValueError("增量清单格式错误: 必须是 {文件路径: 文件哈希} 字典")
+
+    return manifest
@@ -1,14 +1,169 @@
+"""文件哈希计算
+
+打包端、客户端与服务器共用的哈希引擎:
+- 字节串: calculate_file_hash
+- 二进制流(文件、ZIP 成员、上传的文件): hash_stream 分块读取, 内存占用与文件大小无关
+- 文件路径: hash_file, 大文件使用内存映射, 一次调用即可完成计算
+- 批量文件: hash_files 在线程池中并行计算, hashlib 处理较大的数据块时释放 GIL,
+多个文件可以同时计算
+- 边接收边计算(如下载): new_hash 返回的哈希对象可以分块 update
+
+文件哈希以内容标识表示, 内容标识携带计算所用的算法:
+- SHA256: 64位十六进制字符串, 不带前缀, 与已存储的文件哈希相同, 已有的文件无需迁移
+- 其他算法: "<算法>:<64位十六进制>", 如 "blake2b:..."
+
+算法的快慢取决于机器: 支持 SHA 指令扩展的 CPU 上 SHA256 最快; 不支持时
+BLAKE2b(标准库)明显更快,
+安装 blake3 包后还可使用 BLAKE3。校验时总是使用内容标识中的算法,
+不同算法计算的文件可以共存于同一个存储中。
+"""
+
 import hashlib
+import mmap
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import IO, Callable, Iterable, Protocol
+
+# 默认哈希算法, 其内容标识不带算法前缀
+DEFAULT_ALGORITHM = "sha256"
+
+# 内容标识: [<算法>:]<64位十六进制摘要>
+CONTENT_ID_PATTERN = re.compile(
+    r"(?:(?P<algorithm>[a-z0-9]+):)?(?P<digest>[0-9a-f]{64})"
+)
+
+# 分块读取的块大小
+CHUNK_SIZE = 1024 * 1024
+
+# 不小于该大小的文件使用内存映射计算哈希, 省去逐块复制到 Python 缓冲区
+MMAP_THRESHOLD = 4 * 1024 * 1024
+
+
+class Hasher(Protocol):
+    """可分块更新的哈希对象"""
+
+    def update(self, data: bytes | bytearray | memoryview, /) -> object: ...  # noqa: D102
+
+    def hexdigest(self) -> str: ...  # noqa: D102
+
+
+def _blake3() -> Callable[[], Hasher] | None:
+    try:
+        from blake3 import blake3  # type: ignore[import-not-found]
+    except ImportError:
+        return None
+    return blake3
+
+
+# 支持的哈希算法, 摘要长度都是 32 字节
+HASH_ALGORITHMS: dict[str, Callable[[], Hasher]] = {
+    "sha256": hashlib.sha256,
+    "blake2b": partial(hashlib.blake2b, digest_size=32),
+}
+if (blake3 := _blake3()) is not None:
+    HASH_ALGORITHMS["blake3"] = blake3
+
+
+@dataclass(frozen=True)
+class FileHash:
+    """文件哈希
+
+    Attributes:
+        hash: 内容标识
+        offset: 参与计算的内容在文件中的起始位置(跳过首行时为首行之后)
+        size: 参与计算的内容大小
+
+    """
+
+    hash: str
+    offset: int
+    size: int
+
+
+def make_content_id(algorithm: str, digest: str) -> str:
+    """由算法与十六进制摘要生成内容标识"""
+    return digest if algorithm == DEFAULT_ALGORITHM else f"{algorithm}:{digest}"
+
+
+def parse_content_id(content_id: str) -> tuple[str, str]:
+    """解析内容标识
+
+    Returns:
+        (算法, 十六进制摘要), 不带前缀的内容标识为 SHA256
+
+    Raises:
+        ValueError: 内容标识格式错误
+
+    """
+    match = CONTENT_ID_PATTERN.fullmatch(content_id)
+    if match is None:
+        raise ValueError(f"文件哈希格式错误: {content_id}")
+    return match["algorithm"] or DEFAULT_ALGORITHM, match["digest"]
+
+
+def normalize_content_id(content_id: str) -> str:
+    """规范化内容标识, 如 "sha256:<摘要>" 规范化为不带前缀的 "<摘要>"
+
+    Raises:
+        ValueError: 内容标识格式错误
+
+    """
+    return make_content_id(*parse_content_id(content_id))
+
 
+def content_algorithm(content_id: str) -> str:
+    """内容标识使用的哈希算法
 
-def calculate_file_hash(content: bytes) -> str:
-    """计算文件内容的 SHA256 哈希值
+    Raises:
+        ValueError: 内容标识格式错误
+
+    """
+    return parse_content_id(content_id)[0]
+
+
+def new_hash(algorithm: str = DEFAULT_ALGORITHM) -> Hasher:
+    """创建哈希对象, 用于分块计算(如边下载边计算)
+
+    Raises:
+        ValueError: 不支持的哈希算法
+
+    """
+    factory = HASH_ALGORITHMS.get(algorithm)
+    if factory is None:
+        raise ValueError(
+            f"不支持的哈希算法: {algorithm}, 可用的算法: {', '.join(HASH_ALGORITHMS)}"
+        )
+    return factory()
+
+
+def verify_content(content: bytes | bytearray | memoryview, content_id: str) -> bool:
+    """使用内容标识中的算法校验内容
+
+    Raises:
+        ValueError: 内容标识格式错误或不支持其中的算法
+
+    """
+    algorithm, digest = parse_content_id(content_id)
+    hasher = new_hash(algorithm)
+    hasher.update(content)
+    return hasher.hexdigest() == digest
+
+
+def calculate_file_hash(
+    content: bytes | bytearray | memoryview, *, algorithm: str = DEFAULT_ALGORITHM
+) -> str:
+    """计算文件内容的内容标识
 
     Args:
         content: 文件二进制内容
+        algorithm: 哈希算法
 
     Returns:
-        64位十六进制哈希字符串
+        内容标识, SHA256 时为64位十六进制哈希字符串
 
     Examples:
         >>> content = b"Hello, World!"
@@ -17,4 +172,103 @@ def calculate_file_hash(content: bytes) -> str:
         64
 
     """
-    return hashlib.sha256(content).hexdigest()
+    hasher = new_hash(algorithm)
+    hasher.update(content)
+    return make_content_id(algorithm, hasher.hexdigest())
+
+
+def hash_stream(
+    stream: IO[bytes],
+    *,
+    chunk_size: int = CHUNK_SIZE,
+    algorithm: str = DEFAULT_ALGORITHM,
+) -> str:
+    """从流的当前位置分块读取到末尾并计算内容标识
+
+    Args:
+        stream: 二进制流
+        chunk_size: 分块大小
+        algorithm: 哈希算法
+
+    """
+    hasher = new_hash(algorithm)
+    for chunk in iter(lambda: stream.read(chunk_size), b""):
+        hasher.update(chunk)
+    return make_content_id(algorithm, hasher.hexdigest())
+
+
+def hash_file(
+    path: Path | str,
+    *,
+    skip_first_line: bool = False,
+    algorithm: str = DEFAULT_ALGORITHM,
+) -> FileHash:
+    """计算文件的内容标识
+
+    Args:
+        path: 文件路径
+        skip_first_line: 跳过首行(如标签行), 只计算之后的内容
+        algorithm: 哈希算法
+
+    """
+    with Path(path).open("rb") as f:
+        if skip_first_line:
+            f.readline()
+        offset = f.tell()
+        size = os.fstat(f.fileno()).st_size - offset
+
+        if size < MMAP_THRESHOLD:
+            file_hash = hash_stream(f, algorithm=algorithm)
+            return FileHash(hash=file_hash, offset=offset, size=f.tell() - offset)
+
+        with (
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped,
+            memoryview(mapped) as view,
+        ):
+            hasher = new_hash(algorithm)
+            hasher.update(view[offset:])
+            return FileHash(
+                hash=make_content_id(algorithm, hasher.hexdigest()),
+                offset=offset,
+                size=len(view) - offset,
+            )
+
+
+def hash_files(
+    paths: Iterable[Path | str],
+    *,
+    skip_first_line: bool = False,
+    workers: int | None = None,
+    algorithm: str = DEFAULT_ALGORITHM,
+) -> list[FileHash]:
+    """在线程池中并行计算多个文件的内容标识
+
+    Args:
+        paths: 文件路径
+        skip_first_line: 跳过每个文件的首行
+        workers: 线程数, 为None时使用CPU核心数
+        algorithm: 哈希算法
+
+    Returns:
+        与 paths 顺序相同的哈希结果
+
+    """
+    paths = list(paths)
+    if len(paths) <= 1 or workers == 1:
+        return [
+            hash_file(path, skip_first_line=skip_first_line, algorithm=algorithm)
+            for path in paths
+        ]
+
+    with ThreadPoolExecutor(
+        max_workers=min(workers or os.cpu_count() or 1, len(paths)),
+        thread_name_prefix="hash",
+    ) as executor:
+        return list(
+            executor.map(
+                lambda path: hash_file(
+                    path, skip_first_line=skip_first_line, algorithm=algorithm
+                ),
+                paths,
+            )
+        )
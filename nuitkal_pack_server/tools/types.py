@@ -24,3 +24,12 @@ class IncrementalUpdateInfo(TypedDict):
     add: list[FileInfo]  # 需要添加的文件
     keep: list[FileInfo]  # 可以保留的文件
     delete: list[FileInfo]  # 需要删除的文件
+
+
+class ArtifactFileInfo(TypedDict):
+    """编译产物文件信息"""
+
+    name: str  # 产物文件名(如 module.cpython-311-x86_64-linux-gnu.so)
+    hash: str  # 文件哈希值
+    url: str  # 下载路径
+    size: int  # 文件大小（字节）
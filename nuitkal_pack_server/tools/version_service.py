@@ -1,7 +1,15 @@
 from typing import TYPE_CHECKING, Optional, Union
 
+from django.conf import settings
+
 from nuitkal_pack_server.models import App, AppVersion, VersionFile
-from nuitkal_pack_server.tools.hash_utils import calculate_file_hash
+from nuitkal_pack_server.tools.hash_utils import (
+    DEFAULT_ALGORITHM,
+    HASH_ALGORITHMS,
+    hash_stream,
+    new_hash,
+    normalize_content_id,
+)
 
 if TYPE_CHECKING:
     from django.core.files.base import ContentFile
@@ -19,16 +27,62 @@ class VersionService:
     """
 
     @staticmethod
-    def upload_file(file: Union["UploadedFile", "ContentFile"]) -> VersionFile:
-        """上传单个文件"""
-        hash_id = calculate_file_hash(file.read())
+    def hash_algorithm() -> str:
+        """服务器计算文件哈希使用的算法
+
+        由配置项 NUITKAL_PACK_HASH_ALGORITHM 指定, 默认为 SHA256。
+
+        Raises:
+            ValueError: 配置的算法不受支持
+
+        """
+        algorithm = getattr(settings, "NUITKAL_PACK_HASH_ALGORITHM", DEFAULT_ALGORITHM)
+        new_hash(algorithm)
+        return algorithm
+
+    @staticmethod
+    def hash_algorithms() -> list[str]:
+        """服务器支持的哈希算法, 服务器使用的算法排在最前"""
+        preferred = VersionService.hash_algorithm()
+        return [
+            preferred,
+            *(algorithm for algorithm in HASH_ALGORITHMS if algorithm != preferred),
+        ]
+
+    @staticmethod
+    def upload_file(
+        file: Union["UploadedFile", "ContentFile"],
+        hash_id: Optional[str] = None,
+        *,
+        algorithm: Optional[str] = None,
+    ) -> VersionFile:
+        """上传单个文件
+
+        Args:
+            file: 文件
+            hash_id: 已校验的文件哈希值, 提供时不再读取文件计算
+            algorithm: 计算文件哈希使用的算法, 默认为服务器配置的算法
+
+        Raises:
+            ValueError: 哈希算法不受支持
+
+        """
+        if hash_id is None:
+            # 分块读取计算哈希, 上传的大文件不需要整个读入内存
+            file.seek(0)
+            hash_id = hash_stream(
+                file, algorithm=algorithm or VersionService.hash_algorithm()
+            )
+            file.seek(0)
+        hash_id = normalize_content_id(hash_id)
         name = file.name
 
         obj = VersionFile.objects.filter(id=hash_id).first()
         if obj:
             return obj
 
-        file.name = hash_id
+        # 带算法前缀的内容标识含有冒号, 不能直接作为文件名
+        file.name = hash_id.replace(":", "-")
         obj = VersionFile(id=hash_id, name=name, size=file.size, file=file)
         obj.save()
         return obj
@@ -56,6 +110,12 @@ class VersionService:
         if AppVersion.objects.filter(app=app, version=version).exists():
             raise ValueError(f"版本 {version} 已存在")
 
+        # 不同写法的同一内容标识(如 "sha256:<摘要>" 与 "<摘要>")统一为规范形式
+        file_manifest = {
+            path: normalize_content_id(hash_id)
+            for path, hash_id in file_manifest.items()
+        }
+
         files = VersionFile.objects.filter(id__in=file_manifest.values()).values_list("id", flat=True)
         not_exist_files = set(file_manifest.values()) - set(files)
         if not_exist_files:
@@ -0,0 +1,201 @@
+"""ZIP 包哈希清单
+
+打包时每个文件的哈希已经计算过, to_zip 将 {文件相对路径: {哈希, 大小, CRC}}
+写入保留成员 HASH_MANIFEST_NAME 中。上传时(客户端解压上传与服务器
+upload-zip)直接使用清单中的哈希向服务器查询去重, 不需要先解压每个成员计算哈希;
+只有服务器上还不存在、需要存储的成员才解压,
+并在多个线程中并行校验内容与清单中的哈希一致。
+
+读取清单时将大小与 CRC 与 ZIP 中央目录比对(不需要解压),
+不一致的条目与清单未覆盖的成员回退到解压后计算哈希, 没有清单的 ZIP
+包(如旧版本打包器生成)仍按原方式处理。
+
+清单中的哈希是内容标识(见 hash_utils), 可以来自打包器使用的任意算法;
+使用方可以只接受指定的算法(如与服务器协商的算法), 其他算法的条目视为清单未覆盖,
+回退到解压后使用指定的算法计算。
+"""
+
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import TYPE_CHECKING, Collection, Iterator, Mapping, TypedDict
+
+from nuitkal_pack_server.tools.delta_manifest import UNCHANGED_MANIFEST_NAME
+from nuitkal_pack_server.tools.hash_utils import (
+    DEFAULT_ALGORITHM,
+    HASH_ALGORITHMS,
+    hash_stream,
+    make_content_id,
+    parse_content_id,
+    verify_content,
+)
+
+if TYPE_CHECKING:
+    from nuitkal_pack_server.tools import zipfile
+
+# 哈希清单在 ZIP 包中的保留路径
+HASH_MANIFEST_NAME = ".nuitkal-pack/manifest.json"
+
+# 不属于应用文件的保留成员
+RESERVED_NAMES = frozenset({UNCHANGED_MANIFEST_NAME, HASH_MANIFEST_NAME})
+
+
+class ManifestEntry(TypedDict):
+    """清单中单个文件的信息"""
+
+    hash: str  # 文件的内容标识
+    size: int  # 文件大小(字节)
+    crc: int  # 文件内容的 CRC32, 与 ZIP 中央目录中的记录一致
+
+
+def dump_hash_manifest(manifest: Mapping[str, ManifestEntry]) -> bytes:
+    """序列化哈希清单"""
+    return json.dumps(
+        dict(sorted(manifest.items())), ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def read_hash_manifest(
+    zip_file: "zipfile.ZipFile", *, algorithms: Collection[str] | None = None
+) -> dict[str, ManifestEntry]:
+    """读取 ZIP 包中的哈希清单
+
+    只返回大小与 CRC 和 ZIP 中央目录一致、且哈希算法可以接受的条目(哈希已规范化),
+    没有清单时返回空字典。
+
+    Args:
+        zip_file: ZIP 包
+        algorithms: 可以接受的哈希算法, 为None时接受当前环境支持的所有算法
+
+    Raises:
+        ValueError: 清单格式错误
+
+    """
+    if HASH_MANIFEST_NAME not in zip_file.NameToInfo:
+        return {}
+
+    try:
+        manifest = json.loads(zip_file.read(HASH_MANIFEST_NAME))
+    except json.JSONDecodeError as e:
+        raise ValueError(f"哈希清单格式错误: {e}") from e
+
+    if not isinstance(manifest, dict) or not all(
+        isinstance(path, str)
+        and isinstance(entry, dict)
+        and isinstance(entry.get("hash"), str)
+        and isinstance(entry.get("size"), int)
+        and isinstance(entry.get("crc"), int)
+        for path, entry in manifest.items()
+    ):
+        raise ValueError("哈希清单格式错误: 必须是 {文件路径: {hash, size, crc}} 字典")
+
+    algorithms = HASH_ALGORITHMS.keys() if algorithms is None else algorithms
+    entries: dict[str, ManifestEntry] = {}
+    for path, entry in manifest.items():
+        algorithm, digest = parse_content_id(entry["hash"])
+        info = zip_file.NameToInfo.get(path)
+        if (
+            algorithm in algorithms
+            and info is not None
+            and info.file_size == entry["size"]
+            and entry["crc"] == info.CRC
+        ):
+            entries[path] = {
+                "hash": make_content_id(algorithm, digest),
+                "size": entry["size"],
+                "crc": entry["crc"],
+            }
+    return entries
+
+
+def member_hashes(
+    zip_file: "zipfile.ZipFile",
+    *,
+    algorithm: str = DEFAULT_ALGORITHM,
+    algorithms: Collection[str] | None = None,
+    workers: int | None = None,
+) -> dict[str, str]:
+    """获取 ZIP 包中各文件成员的哈希, 保留成员与目录除外
+
+    哈希清单中的成员直接使用清单中的哈希, 其余成员在多个线程中并行解压计算。
+
+    Args:
+        zip_file: ZIP 包
+        algorithm: 解压计算哈希时使用的算法
+        algorithms: 可以直接使用的清单哈希算法, 为None时接受当前环境支持的所有算法
+        workers: 并行解压的线程数, 为None时使用CPU核心数
+
+    Returns:
+        {成员路径: 文件哈希值}, 按成员在 ZIP 包中的顺序排列
+
+    Raises:
+        ValueError: 清单格式错误
+
+    """
+    manifest = read_hash_manifest(zip_file, algorithms=algorithms)
+    paths = [
+        info.filename
+        for info in zip_file.infolist()
+        if info.filename not in RESERVED_NAMES and not info.is_dir()
+    ]
+    pending = [path for path in paths if path not in manifest]
+
+    def _hash(path: str) -> str:
+        with zip_file.open(path) as f:
+            return hash_stream(f, algorithm=algorithm)
+
+    hashes = {path: manifest[path]["hash"] for path in paths if path in manifest}
+    if pending:
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(workers or os.cpu_count() or 1, len(pending)))
+        ) as executor:
+            hashes.update(zip(pending, executor.map(_hash, pending), strict=True))
+
+    return {path: hashes[path] for path in paths}
+
+
+def read_verified(
+    zip_file: "zipfile.ZipFile",
+    members: Mapping[str, str],
+    *,
+    workers: int | None = None,
+) -> Iterator[tuple[str, bytes]]:
+    """在多个线程中并行解压成员并校验哈希, 同时解压的成员数不超过线程数
+
+    Args:
+        zip_file: ZIP 包
+        members: {成员路径: 期望的文件哈希值}
+        workers: 并行解压的线程数, 为None时使用CPU核心数
+
+    Returns:
+        按 members 顺序产出的 (成员路径, 文件内容)
+
+    Raises:
+        ValueError: 成员内容与哈希不一致, 或哈希格式错误、算法不受支持
+
+    """
+
+    def _read(path: str) -> bytes:
+        data = zip_file.read(path)
+        if not verify_content(data, members[path]):
+            raise ValueError(f"文件内容与哈希清单不一致: {path}")
+        return data
+
+    if not members:
+        return
+
+    # 同时最多有 workers 个成员在解压或等待取走, 内存占用与成员总数无关
+    workers = max(1, min(workers or os.cpu_count() or 1, len(members)))
+    paths = iter(members)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque(
+            (path, executor.submit(_read, path)) for path in islice(paths, workers)
+        )
+        while pending:
+            path, future = pending.popleft()
+            data = future.result()
+            for next_path in islice(paths, 1):
+                pending.append((next_path, executor.submit(_read, next_path)))
+            yield path, data
@@ -12,6 +12,7 @@ import struct
 import sys
 import threading
 import time
+from typing import IO, Iterable
 
 try:
     import zlib  # We may need its compression method
@@ -1743,6 +1744,52 @@ class ZipFile:
         with self._lock, self.open(zinfo, mode="w") as dest:
             dest.write(data)
 
+    def writecompressed(
+        self, zinfo: "ZipInfo", data: bytes | IO[bytes] | Iterable[bytes]
+    ) -> None:
+        """Write a member whose payload has already been compressed.
+
+        'zinfo' must carry the compression type, CRC, compressed size and
+        uncompressed size of the payload. 'data' is the raw compressed
+        payload, either a bytes instance, a readable binary stream or an
+        iterable of bytes chunks, and is copied into the archive unchanged.
+        """
+        if not self.fp:
+            raise ValueError("Attempt to write to ZIP archive that was already closed")
+        if self._writing:
+            raise ValueError(
+                "Can't write to ZIP archive while an open writing handle exists."
+            )
+
+        zinfo.flag_bits = 0x00
+        if zinfo.compress_type == ZIP_LZMA:
+            # Compressed data includes an end-of-stream (EOS) marker
+            zinfo.flag_bits |= 0x02
+        if not zinfo.external_attr:
+            zinfo.external_attr = 0o600 << 16  # permissions: ?rw-------
+
+        with self._lock:
+            if self._seekable:
+                self.fp.seek(self.start_dir)
+            zinfo.header_offset = self.fp.tell()
+
+            self._writecheck(zinfo)
+            self._didModify = True
+
+            # CRC and sizes are known up front, so no data descriptor is needed
+            self.fp.write(zinfo.FileHeader())
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                self.fp.write(data)
+            elif hasattr(data, "read"):
+                shutil.copyfileobj(data, self.fp, 1024 * 1024)
+            else:
+                for chunk in data:
+                    self.fp.write(chunk)
+
+            self.filelist.append(zinfo)
+            self.NameToInfo[zinfo.filename] = zinfo
+            self.start_dir = self.fp.tell()
+
     def __del__(self):
         """Call the "close()" method in case the user forgot."""
         self.close()
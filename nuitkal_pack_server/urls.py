@@ -6,6 +6,7 @@ from . import views
 # 创建路由器
 router = DefaultRouter()
 router.register(r"apps", views.AppViewSet, basename="app")
+router.register(r"artifacts", views.BuildArtifactViewSet, basename="artifact")
 
 urlpatterns = [
     # API 路由
@@ -1,10 +1,11 @@
 import json
+import re
 from io import BytesIO
 from pathlib import Path
 from typing import TYPE_CHECKING, cast
 
 from django.core.files.base import ContentFile
-from django.db.models import Q, QuerySet
+from django.db.models import F, Q, QuerySet
 from django.utils import timezone
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
@@ -12,15 +13,21 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 
 from nuitkal_pack_server.tools import zipfile
-from nuitkal_pack_server.tools.hash_utils import calculate_file_hash
+from nuitkal_pack_server.tools.delta_manifest import read_unchanged_manifest
+from nuitkal_pack_server.tools.hash_utils import content_algorithm, normalize_content_id
+from nuitkal_pack_server.tools.zip_manifest import member_hashes, read_verified
 
-from .models import App, AppVersion, VersionFile
-from .serializers import AppSerializer, AppVersionSerializer
+from .models import App, AppVersion, BuildArtifact, VersionFile
+from .permissions import HasBuildToken
+from .serializers import AppSerializer, AppVersionSerializer, BuildArtifactSerializer
 from .tools.version_service import VersionService
 
 if TYPE_CHECKING:
     from rest_framework.request import Request
 
+# 编译缓存键: SHA256 十六进制字符串
+ARTIFACT_KEY_PATTERN = re.compile(r"[0-9a-f]{64}")
+
 
 class AppViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
     """应用管理视图集"""
@@ -122,15 +129,39 @@ class AppViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.Gene
 
             # 使用服务层处理上传
             zip_file = zipfile.ZipFile(BytesIO(file.read()))
-            file_manifest: dict[str, str] = {}
-            for path in zip_file.namelist():
-                file = zip_file.read(path)
-                hash_id = calculate_file_hash(file)
-                posix_path = Path(path).as_posix()
-                file_manifest[posix_path] = hash_id
+            unchanged_manifest = read_unchanged_manifest(zip_file)
+
+            # 包内有哈希清单时不需要解压即可得到各文件的哈希,
+            # 只解压并校验服务器上还不存在的文件
+            hashes = member_hashes(zip_file, algorithm=VersionService.hash_algorithm())
+            file_manifest = {
+                Path(path).as_posix(): hash_id for path, hash_id in hashes.items()
+            }
 
-                if not VersionFile.objects.filter(id=hash_id).exists():
-                    VersionService.upload_file(ContentFile(file, name=Path(path).name))
+            existing = set(
+                VersionFile.objects.filter(id__in=set(hashes.values())).values_list(
+                    "id", flat=True
+                )
+            )
+            missing = {
+                hash_id: path
+                for path, hash_id in hashes.items()
+                if hash_id not in existing
+            }
+            for (hash_id, path), (_, data) in zip(
+                missing.items(),
+                read_verified(
+                    zip_file, {path: hash_id for hash_id, path in missing.items()}
+                ),
+                strict=True,
+            ):
+                VersionService.upload_file(
+                    ContentFile(data, name=Path(path).name), hash_id=hash_id
+                )
+
+            # 增量包: 合并与激活版本相同的未变化文件
+            for path, hash_id in unchanged_manifest.items():
+                file_manifest.setdefault(path, hash_id)
 
             VersionService.create_version(app=app, version=version, entry_point=entry_point, changelog=changelog, is_active=is_active, file_manifest=file_manifest)
 
@@ -148,13 +179,26 @@ class AppViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.Gene
 
     @action(detail=True, methods=["post"], url_path="upload-file")
     def upload_file(self, request: "Request", pk: str) -> Response:
-        """上传 单个文件"""
+        """上传 单个文件
+
+        可以通过 hash 字段提供客户端计算的文件哈希, 服务器使用其中的算法计算并校验,
+        文件以该哈希存储
+        """
         file = request.FILES.get("file")  # type: ignore[assignment]
         if not file:
             return Response({"error": "缺少文件"}, status=status.HTTP_400_BAD_REQUEST)
 
-        file = VersionService.upload_file(file)
-        return Response({"message": "文件上传成功", "id": file.id, "url": file.file.url})
+        expected_hash = request.data.get("hash")
+        file = VersionService.upload_file(
+            file, algorithm=content_algorithm(expected_hash) if expected_hash else None
+        )
+        if expected_hash and file.id != normalize_content_id(expected_hash):
+            return Response(
+                {"error": "文件内容与哈希不一致"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(
+            {"message": "文件上传成功", "id": file.id, "url": file.file.url}
+        )
 
     @action(detail=True, methods=["post"], url_path="create-version")
     def create_version(self, request: "Request", pk: str) -> Response:
@@ -184,14 +228,129 @@ class AppViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.Gene
     def check_files(self, request: "Request") -> Response:
         """检查文件是否存在"""
         file_hashes = request.data.get("file_hashes", [])
-        if not isinstance(file_hashes, list):
-            return Response({"error": "file_hashes 必须是列表"}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(file_hashes, list) or not all(
+            isinstance(file_hash, str) for file_hash in file_hashes
+        ):
+            return Response(
+                {"error": "file_hashes 必须是字符串列表"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        existing_files = VersionFile.objects.filter(id__in=file_hashes).values_list("id", flat=True)
+        # 按规范形式查询, 返回的缺失文件使用客户端提交的写法
+        requested = {
+            normalize_content_id(file_hash): file_hash for file_hash in file_hashes
+        }
+        existing_files = set(
+            VersionFile.objects.filter(id__in=requested).values_list("id", flat=True)
+        )
         return Response(
             {
-                "missing_files": list(set(file_hashes) - set(existing_files)),
-                "existing_files": existing_files,
-                "delete_files": list(set(existing_files) - set(file_hashes)),
+                "missing_files": [
+                    file_hash
+                    for hash_id, file_hash in requested.items()
+                    if hash_id not in existing_files
+                ],
+                "existing_files": list(existing_files),
+                "delete_files": list(existing_files - set(requested)),
             }
         )
+
+    @action(detail=False, methods=["get"], url_path="hash-algorithms")
+    def hash_algorithms(self, request: "Request") -> Response:
+        """服务器支持的文件哈希算法, 客户端据此协商上传使用的算法"""
+        algorithms = VersionService.hash_algorithms()
+        return Response({"algorithm": algorithms[0], "algorithms": algorithms})
+
+
+class BuildArtifactViewSet(viewsets.GenericViewSet):
+    """编译产物缓存视图集
+
+    构建机编译前按缓存键查询, 命中时直接下载产物; 未命中时编译后上传, 供其他构建机复用。
+    服务器无法校验产物是否由缓存键对应的源码编译, 所有接口都需要构建机令牌(见
+    HasBuildToken)。
+    """
+
+    authentication_classes = ()
+    permission_classes = (HasBuildToken,)
+
+    queryset = BuildArtifact.objects.all()
+    serializer_class = BuildArtifactSerializer
+
+    def retrieve(self, request: "Request", pk: str) -> Response:
+        """按缓存键查询编译产物"""
+        artifact = BuildArtifact.objects.filter(id=pk).first()
+        if artifact is None:
+            return Response(
+                {"error": "编译产物不存在"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        # 产物文件可能已被删除, 此时视为未命中并删除失效的记录
+        hashes = [item["hash"] for item in artifact.files]
+        if VersionFile.objects.filter(id__in=hashes).count() != len(set(hashes)):
+            artifact.delete()
+            return Response(
+                {"error": "编译产物文件缺失"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        BuildArtifact.objects.filter(id=pk).update(
+            hit_count=F("hit_count") + 1, last_hit_at=timezone.now()
+        )
+        return Response(BuildArtifactSerializer(artifact).data)
+
+    def create(self, request: "Request") -> Response:
+        """上传编译产物
+
+        缓存键已存在时保留先上传的产物; replace 为 true 时以本次上传的产物替换
+        """
+        key = request.data.get("key", "")
+        module = request.data.get("module", "")
+        toolchain = request.data.get("toolchain", "")
+        replace = request.data.get("replace", "false").lower() == "true"
+        files = request.FILES.getlist("files")
+
+        if not ARTIFACT_KEY_PATTERN.fullmatch(key):
+            return Response(
+                {"error": "缓存键格式错误"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not files:
+            return Response({"error": "缺少文件"}, status=status.HTTP_400_BAD_REQUEST)
+
+        artifact = BuildArtifact.objects.filter(id=key).first()
+        if artifact is not None and not replace:
+            return Response(BuildArtifactSerializer(artifact).data)
+
+        # 上传时会将文件名改为哈希值, 先记录产物文件名
+        names = [Path(file.name).name for file in files]
+        manifest = [
+            {"name": name, "hash": VersionService.upload_file(file).id}
+            for name, file in zip(names, files, strict=True)
+        ]
+        if replace:
+            artifact, _ = BuildArtifact.objects.update_or_create(
+                id=key,
+                defaults={
+                    "module": module,
+                    "toolchain": toolchain,
+                    "files": manifest,
+                    "hit_count": 0,
+                    "last_hit_at": None,
+                },
+            )
+        else:
+            artifact, _ = BuildArtifact.objects.get_or_create(
+                id=key,
+                defaults={"module": module, "toolchain": toolchain, "files": manifest},
+            )
+        return Response(
+            BuildArtifactSerializer(artifact).data, status=status.HTTP_201_CREATED
+        )
+
+    def destroy(self, request: "Request", pk: str) -> Response:
+        """删除编译产物, 用于作废有问题的产物; 产物文件仍保留在文件存储中"""
+        deleted, _ = BuildArtifact.objects.filter(id=pk).delete()
+        if not deleted:
+            return Response(
+                {"error": "编译产物不存在"}, status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -95,3 +96,10 @@ STATIC_URL = "static/"
 # Media files (用于存储上传的更新包)
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+
+# 访问编译产物缓存接口的构建机令牌, 多个令牌以逗号分隔
+NUITKAL_PACK_BUILD_TOKENS = [
+    token
+    for token in os.environ.get("NUITKAL_PACK_BUILD_TOKENS", "").split(",")
+    if token
+]
@@ -0,0 +1,50 @@
+import os
+import time
+from typing import TYPE_CHECKING, Callable
+
+import pytest
+
+from nuitkal_pack.benchmark import TreeSpec, fake_toolchain, generate_tree
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from nuitkal_pack.toolchain import Toolchain
+
+
+def _age_files(root: "Path") -> None:
+    mtime = time.time() - 3600
+    for path in root.rglob("*"):
+        os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def age_files() -> "Callable[[Path], None]":
+    """将目录下文件的修改时间设为过去, 扫描器才会缓存其摘要"""
+    return _age_files
+
+
+@pytest.fixture
+def toolchain(tmp_path: "Path") -> "Toolchain":
+    """使用模拟编译器的工具链, 不需要安装 Nuitka 与 C 编译器"""
+    work_dir = tmp_path / "toolchain"
+    work_dir.mkdir()
+    return fake_toolchain(work_dir)
+
+
+@pytest.fixture
+def source_tree(tmp_path: "Path") -> "Path":
+    """小型合成源码树, 包含核心、用户与静态文件"""
+    root = tmp_path / "src"
+    generate_tree(
+        root,
+        TreeSpec(
+            py_files=24,
+            static_files=4,
+            py_size=512,
+            static_size=2048,
+            packages=3,
+            seed=1,
+        ),
+    )
+    return root
@@ -0,0 +1,171 @@
+import dataclasses
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from nuitkal_pack.artifact_cache import (
+    LEASE_TTL_SECONDS,
+    ORPHAN_GRACE_SECONDS,
+    ArtifactCache,
+    parse_size,
+)
+
+if TYPE_CHECKING:
+    from nuitkal_pack.toolchain import Toolchain
+
+SOURCE_HASH = "0" * 64
+ARTIFACT_SIZE = 1000
+KIB = 1024
+
+
+def _key(index: int) -> str:
+    return f"{index:064x}"
+
+
+def _artifact(directory: Path, name: str) -> Path:
+    path = directory / name
+    path.write_bytes(os.urandom(ARTIFACT_SIZE))
+    return path
+
+
+def _entry(cache: ArtifactCache, key: str) -> Path:
+    return cache.entries_dir / key[:2] / f"{key}.json"
+
+
+def _set_mtime(paths: list[Path], mtime: float) -> None:
+    for path in paths:
+        os.utime(path, (mtime, mtime))
+
+
+def test_parse_size() -> None:
+    """容量字符串支持 K/M/G/T 后缀"""
+    assert parse_size("512") == KIB // 2
+    assert parse_size("10K") == 10 * KIB
+    assert parse_size("1.5g") == int(1.5 * KIB**3)
+    assert parse_size("2MB") == 2 * KIB**2
+
+
+def test_make_key(toolchain: "Toolchain") -> None:
+    """缓存键由源文件哈希、模块路径、工具链标签与编译参数决定"""
+    module = Path("pkg/mod.py")
+    options = ["--lto=no"]
+    key = ArtifactCache.make_key(
+        SOURCE_HASH, module, toolchain=toolchain, options=options
+    )
+
+    assert key == ArtifactCache.make_key(
+        SOURCE_HASH, module, toolchain=toolchain, options=options
+    )
+    assert len(key) == len(SOURCE_HASH)
+    assert key != ArtifactCache.make_key(
+        "1" * 64, module, toolchain=toolchain, options=options
+    )
+    assert key != ArtifactCache.make_key(
+        SOURCE_HASH, Path("pkg/other.py"), toolchain=toolchain, options=options
+    )
+    assert key != ArtifactCache.make_key(SOURCE_HASH, module, toolchain=toolchain)
+    other = dataclasses.replace(toolchain, cache_tag="cpython-399")
+    assert key != ArtifactCache.make_key(
+        SOURCE_HASH, module, toolchain=other, options=options
+    )
+
+
+def test_put_and_get(tmp_path: Path) -> None:
+    """相同内容的产物只存储一份, 读取时返回原文件名"""
+    cache = ArtifactCache(tmp_path / "cache")
+    module = _artifact(tmp_path, "mod.so")
+    stub = _artifact(tmp_path, "mod.pyi")
+
+    cache.put(_key(1), [module, stub])
+    cache.put(_key(2), [module, stub])
+    artifacts = cache.get(_key(1))
+
+    assert artifacts is not None
+    assert [artifact.name for artifact in artifacts] == ["mod.so", "mod.pyi"]
+    assert artifacts[0].path.read_bytes() == module.read_bytes()
+    assert cache.get(_key(3)) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.stats()["objects"] == len(artifacts)
+
+
+def test_get_misses_when_object_is_missing(tmp_path: Path) -> None:
+    """产物文件被其他构建机淘汰后按未命中处理"""
+    cache = ArtifactCache(tmp_path / "cache")
+    (artifact,) = cache.put(_key(1), [_artifact(tmp_path, "mod.so")])
+    artifact.path.unlink()
+
+    assert cache.get(_key(1)) is None
+
+
+def test_prune_evicts_least_recently_used(tmp_path: Path) -> None:
+    """超出容量上限时从最久未使用的条目开始淘汰"""
+    cache = ArtifactCache(tmp_path / "cache")
+    now = time.time()
+    for index in range(3):
+        (artifact,) = cache.put(_key(index), [_artifact(tmp_path, f"mod{index}.so")])
+        _set_mtime([_entry(cache, _key(index)), artifact.path], now - 7200 + index)
+
+    assert cache.prune(2 * ARTIFACT_SIZE) == ARTIFACT_SIZE
+    assert _key(0) not in cache
+    assert _key(1) in cache
+    assert _key(2) in cache
+
+
+def test_prune_keeps_fresh_orphans(tmp_path: Path) -> None:
+    """未被条目引用的产物在宽限期内不清理, 超过宽限期后清理"""
+    cache = ArtifactCache(tmp_path / "cache")
+    (fresh,) = cache.put(_key(1), [_artifact(tmp_path, "fresh.so")])
+    (stale,) = cache.put(_key(2), [_artifact(tmp_path, "stale.so")])
+    # 删除条目后产物不再被引用
+    for path in cache.entries_dir.rglob("*.json"):
+        path.unlink()
+    _set_mtime([stale.path], time.time() - ORPHAN_GRACE_SECONDS - 60)
+
+    assert cache.prune() == ARTIFACT_SIZE
+    assert fresh.path.exists()
+    assert not stale.path.exists()
+
+
+def test_prune_honours_leases_of_other_caches(tmp_path: Path) -> None:
+    """任一构建租约开始之后使用过的条目不淘汰, 释放租约后可以淘汰"""
+    root = tmp_path / "cache"
+    agent_a = ArtifactCache(root)
+    agent_b = ArtifactCache(root)
+    now = time.time()
+    for index in range(2):
+        (artifact,) = agent_a.put(_key(index), [_artifact(tmp_path, f"mod{index}.so")])
+        _set_mtime([_entry(agent_a, _key(index)), artifact.path], now - 7200)
+
+    # A 的构建开始后使用了条目 1, B 的构建在之后才开始
+    agent_a.pin_since(now - 3600)
+    _set_mtime([_entry(agent_a, _key(1))], now - 1800)
+    agent_b.pin_since()
+
+    agent_b.prune(0)
+    assert _key(0) not in agent_b
+    assert _key(1) in agent_b
+
+    # 命令行清理(没有自己的租约)同样遵守磁盘上的租约
+    ArtifactCache(root).prune(0)
+    assert _key(1) in agent_b
+
+    agent_a.release()
+    agent_b.release()
+    ArtifactCache(root).prune(0)
+    assert _key(1) not in agent_b
+
+
+def test_expired_lease_is_ignored(tmp_path: Path) -> None:
+    """超过有效期未更新的租约视为构建机已异常退出"""
+    root = tmp_path / "cache"
+    crashed = ArtifactCache(root)
+    (artifact,) = crashed.put(_key(1), [_artifact(tmp_path, "mod.so")])
+    _set_mtime([_entry(crashed, _key(1)), artifact.path], time.time() - 7200)
+    crashed.pin_since(time.time() - 7300)
+    (lease,) = crashed.leases_dir.glob("*.json")
+    _set_mtime([lease], time.time() - LEASE_TTL_SECONDS - 60)
+
+    ArtifactCache(root).prune(0)
+    assert _key(1) not in crashed
+    assert not lease.exists()
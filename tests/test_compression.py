@@ -0,0 +1,71 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from nuitkal_pack.compression import FAST_LEVEL, MAX_LEVEL, CompressionPolicy
+from nuitkal_pack.packager import BuildFile
+from nuitkal_pack_server.tools import zipfile
+
+TEXT = b"x" * 4096
+RANDOM = os.urandom(4096)
+
+
+def _file(directory: Path, name: str, data: bytes) -> BuildFile:
+    path = directory / name
+    path.write_bytes(data)
+    return BuildFile(path, Path(name))
+
+
+@pytest.mark.parametrize(
+    ("name", "data", "expected"),
+    [
+        ("image.png", TEXT, ("compressed", zipfile.ZIP_STORED, None)),
+        ("module.py", TEXT, ("text", zipfile.ZIP_DEFLATED, MAX_LEVEL)),
+        ("module.so", TEXT, ("binary", zipfile.ZIP_DEFLATED, FAST_LEVEL)),
+        ("module.so", RANDOM, ("binary:stored", zipfile.ZIP_STORED, None)),
+        ("data.unknown", TEXT, ("probe:max", zipfile.ZIP_DEFLATED, MAX_LEVEL)),
+        ("data.unknown", RANDOM, ("probe:stored", zipfile.ZIP_STORED, None)),
+    ],
+)
+def test_choose(
+    tmp_path: Path, name: str, data: bytes, expected: tuple[str, int, int | None]
+) -> None:
+    """按扩展名选择压缩方式, 二进制与未知类型的文件按抽样压缩率决定"""
+    choice = CompressionPolicy().choose(_file(tmp_path, name, data))
+    assert (choice.rule, choice.compress_type, choice.compresslevel) == expected
+
+
+def test_choose_with_uppercase_suffix(tmp_path: Path) -> None:
+    """扩展名不区分大小写"""
+    assert (
+        CompressionPolicy().choose(_file(tmp_path, "IMAGE.PNG", b"x" * 100)).rule
+        == "compressed"
+    )
+
+
+def test_uniform_policy(tmp_path: Path) -> None:
+    """统一策略对所有成员使用相同的压缩级别"""
+    policy = CompressionPolicy.uniform(6)
+    for name, data in (("image.png", b"x" * 100), ("module.so", os.urandom(100))):
+        choice = policy.choose(_file(tmp_path, name, data))
+        assert (choice.compress_type, choice.compresslevel) == (zipfile.ZIP_DEFLATED, 6)
+
+
+def test_report_sorted_by_saved_bytes() -> None:
+    """统计报告按节省字节数降序排列"""
+    policy = CompressionPolicy()
+    text = [(1000, 200), (1000, 300)]
+    for raw_bytes, compressed_bytes in text:
+        policy.record(
+            "text",
+            raw_bytes=raw_bytes,
+            compressed_bytes=compressed_bytes,
+            cpu_seconds=0.1,
+        )
+    policy.record("binary", raw_bytes=5000, compressed_bytes=4000, cpu_seconds=0.2)
+
+    report = policy.report()
+    assert [item["rule"] for item in report] == ["text", "binary"]
+    assert report[0]["members"] == len(text)
+    assert report[0]["saved_bytes"] == sum(raw - compressed for raw, compressed in text)
@@ -0,0 +1,108 @@
+import hashlib
+from typing import TYPE_CHECKING
+
+import pytest
+
+from nuitkal_pack_server.tools.hash_utils import (
+    DEFAULT_ALGORITHM,
+    calculate_file_hash,
+    content_algorithm,
+    hash_file,
+    hash_files,
+    make_content_id,
+    new_hash,
+    normalize_content_id,
+    parse_content_id,
+    verify_content,
+)
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+DIGEST = hashlib.sha256(b"data").hexdigest()
+
+
+def test_sha256_content_id_has_no_prefix() -> None:
+    """SHA256 的内容标识与已存储的文件哈希相同, 不带算法前缀"""
+    assert make_content_id(DEFAULT_ALGORITHM, DIGEST) == DIGEST
+    assert calculate_file_hash(b"data") == DIGEST
+
+
+def test_other_algorithms_are_prefixed() -> None:
+    """其他算法的内容标识带算法前缀"""
+    content_id = calculate_file_hash(b"data", algorithm="blake2b")
+    assert (
+        content_id == f"blake2b:{hashlib.blake2b(b'data', digest_size=32).hexdigest()}"
+    )
+    assert content_algorithm(content_id) == "blake2b"
+
+
+@pytest.mark.parametrize(
+    ("content_id", "expected"),
+    [
+        (DIGEST, ("sha256", DIGEST)),
+        (f"sha256:{DIGEST}", ("sha256", DIGEST)),
+        (f"blake2b:{DIGEST}", ("blake2b", DIGEST)),
+    ],
+)
+def test_parse_content_id(content_id: str, expected: tuple[str, str]) -> None:
+    """不带前缀的内容标识解析为 SHA256"""
+    assert parse_content_id(content_id) == expected
+
+
+@pytest.mark.parametrize(
+    "content_id",
+    ["", "abc", DIGEST.upper(), f"{DIGEST}0", f"Blake2b:{DIGEST}", f":{DIGEST}"],
+)
+def test_parse_content_id_rejects_malformed(content_id: str) -> None:
+    """格式错误的内容标识抛出 ValueError"""
+    with pytest.raises(ValueError, match="文件哈希格式错误"):
+        parse_content_id(content_id)
+
+
+def test_normalize_content_id() -> None:
+    """显式的 sha256 前缀规范化为不带前缀的写法, 其他算法保持不变"""
+    assert normalize_content_id(f"sha256:{DIGEST}") == DIGEST
+    assert normalize_content_id(f"blake2b:{DIGEST}") == f"blake2b:{DIGEST}"
+
+
+def test_verify_content_uses_algorithm_from_id() -> None:
+    """校验时使用内容标识中的算法"""
+    assert verify_content(b"data", calculate_file_hash(b"data", algorithm="blake2b"))
+    assert not verify_content(
+        b"other", calculate_file_hash(b"data", algorithm="blake2b")
+    )
+
+
+def test_unsupported_algorithm() -> None:
+    """不支持的算法抛出 ValueError"""
+    with pytest.raises(ValueError, match="不支持的哈希算法"):
+        new_hash("md5")
+    with pytest.raises(ValueError, match="不支持的哈希算法"):
+        verify_content(b"data", f"md5x:{DIGEST}")
+
+
+def test_hash_file_skip_first_line(tmp_path: "Path") -> None:
+    """跳过首行时只计算首行之后的内容, 并记录内容的起始位置"""
+    path = tmp_path / "module.py"
+    path.write_bytes(b"# [core]\nVALUE = 1\n")
+
+    file_hash = hash_file(path, skip_first_line=True)
+    assert file_hash.hash == calculate_file_hash(b"VALUE = 1\n")
+    assert (file_hash.offset, file_hash.size) == (
+        len(b"# [core]\n"),
+        len(b"VALUE = 1\n"),
+    )
+
+
+def test_hash_files_keeps_order(tmp_path: "Path") -> None:
+    """并行计算的结果与输入顺序一致"""
+    paths = []
+    for index in range(20):
+        path = tmp_path / f"{index}.bin"
+        path.write_bytes(bytes([index]) * (index + 1) * 1000)
+        paths.append(path)
+
+    assert [file_hash.hash for file_hash in hash_files(paths, workers=4)] == [
+        hash_file(path).hash for path in paths
+    ]
@@ -0,0 +1,112 @@
+import importlib.util
+import logging
+from typing import TYPE_CHECKING, Callable
+
+from nuitkal_pack.packager import PythonPackager
+from nuitkal_pack_server.tools import zipfile
+from nuitkal_pack_server.tools.delta_manifest import (
+    UNCHANGED_MANIFEST_NAME,
+    read_unchanged_manifest,
+)
+from nuitkal_pack_server.tools.zip_manifest import member_hashes
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from nuitkal_pack.toolchain import Toolchain
+
+STATIC_FILES = ["/static"]
+
+
+def _packager(
+    source_dir: "Path", cache_dir: "Path", toolchain: "Toolchain"
+) -> PythonPackager:
+    return PythonPackager(
+        source_dir,
+        log_level=logging.WARNING,
+        cache_dir=cache_dir,
+        toolchain=toolchain,
+        reproducible=True,
+    )
+
+
+def _bundles(packager: PythonPackager, **kwargs: object) -> dict[str, bytes]:
+    return {
+        name: io_zip.getvalue() for name, io_zip in packager.to_zip(**kwargs).items()
+    }
+
+
+def test_workers_do_not_change_output(
+    tmp_path: "Path", source_tree: "Path", toolchain: "Toolchain"
+) -> None:
+    """并行编译与串行编译的文件顺序和 ZIP 包完全相同"""
+    serial = _packager(source_tree, tmp_path / "serial", toolchain)
+    serial.compile(static_files=STATIC_FILES, workers=1)
+    parallel = _packager(source_tree, tmp_path / "parallel", toolchain)
+    parallel.compile(static_files=STATIC_FILES, workers=4)
+
+    assert list(serial.core_map) == list(parallel.core_map)
+    assert {name: list(files) for name, files in serial.user_map.items()} == {
+        name: list(files) for name, files in parallel.user_map.items()
+    }
+    assert _bundles(serial) == _bundles(parallel)
+
+
+def test_reproducible_bundles(
+    tmp_path: "Path", source_tree: "Path", toolchain: "Toolchain"
+) -> None:
+    """可复现模式下冷缓存与热缓存生成逐字节相同的 ZIP 包"""
+    cold = _packager(source_tree, tmp_path / "cache", toolchain)
+    cold.compile(static_files=STATIC_FILES)
+    warm = _packager(source_tree, tmp_path / "cache", toolchain)
+    warm.compile(static_files=STATIC_FILES)
+
+    bundles = _bundles(cold)
+    assert bundles
+    assert bundles == _bundles(warm)
+    assert warm.artifact_cache is not None
+    assert warm.artifact_cache.hits > 0
+
+
+def test_pyc_mode(
+    tmp_path: "Path", toolchain: "Toolchain", age_files: "Callable[[Path], None]"
+) -> None:
+    """Pyc 模式的文件编译为当前解释器的字节码, 去掉首行标签"""
+    source_dir = tmp_path / "src"
+    source_dir.mkdir()
+    (source_dir / "main.py").write_text("# [core]\nprint('hello')\n", encoding="utf-8")
+    (source_dir / "fast.py").write_text(
+        "# [core-pyc] [user-a]\nVALUE = 1\n", encoding="utf-8"
+    )
+    age_files(source_dir)
+
+    packager = _packager(source_dir, tmp_path / "cache", toolchain)
+    packager.compile()
+    with zipfile.ZipFile(packager.to_zip("a")) as zf:
+        assert "fast.pyc" in zf.namelist()
+        assert "fast.py" not in zf.namelist()
+        assert zf.read("fast.pyc").startswith(importlib.util.MAGIC_NUMBER)
+        assert zf.read("main.py") == b"print('hello')\n"
+
+
+def test_delta_bundle(
+    tmp_path: "Path", source_tree: "Path", toolchain: "Toolchain"
+) -> None:
+    """增量打包时与已发布版本相同的文件只记录在增量清单中"""
+    packager = _packager(source_tree, tmp_path / "cache", toolchain)
+    packager.compile(static_files=STATIC_FILES)
+    with zipfile.ZipFile(packager.to_zip("a")) as zf:
+        published = member_hashes(zf)
+
+    changed = "main.py"
+    published[changed] = "0" * 64
+    with zipfile.ZipFile(packager.to_zip("a", published={"a": published})) as zf:
+        unchanged = read_unchanged_manifest(zf)
+        names = set(zf.namelist())
+
+    assert changed in names
+    assert UNCHANGED_MANIFEST_NAME in names
+    assert unchanged == {
+        path: file_hash for path, file_hash in published.items() if path != changed
+    }
+    assert not names & set(unchanged)
@@ -0,0 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable
+
+import pytest
+
+from nuitkal_pack.scanner import FileTags, SourceScanner, parse_tags
+from nuitkal_pack_server.tools.hash_utils import hash_file
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+@pytest.mark.parametrize(
+    ("first_line", "expected"),
+    [
+        ("import os", None),
+        ("# [core]", FileTags(core_mode="source", users=())),
+        ("# [core-pyd]", FileTags(core_mode="pyd", users=())),
+        ("# [core-pyc] [user-a]", FileTags(core_mode="pyc", users=(("a", "pyc"),))),
+        (
+            "# [user-a] [user-b-pyd]",
+            FileTags(core_mode=None, users=(("a", "source"), ("b", "pyd"))),
+        ),
+        (
+            "# [core-pyd] [user-a-source]",
+            FileTags(core_mode="pyd", users=(("a", "source"),)),
+        ),
+    ],
+)
+def test_parse_tags(first_line: str, expected: FileTags | None) -> None:
+    """未指定模式的用户继承核心文件的模式, 都未指定时为源码模式"""
+    assert parse_tags(first_line) == expected
+
+
+def test_digest_reuses_index(
+    tmp_path: "Path", age_files: "Callable[[Path], None]"
+) -> None:
+    """未变化的文件复用索引中的摘要, 修改后重新计算"""
+    path = tmp_path / "module.py"
+    path.write_text("# [core]\nVALUE = 1\n", encoding="utf-8")
+    age_files(tmp_path)
+
+    scanner = SourceScanner(tmp_path)
+    (entry,) = scanner.walk()
+    assert scanner.digest(entry).hash == hash_file(path).hash
+    assert scanner.digest(entry).hash == hash_file(path).hash
+    assert (scanner.hashed_count, scanner.reused_count) == (1, 1)
+
+    hashed_count = scanner.hashed_count
+    path.write_text("# [core]\nVALUE = 2\n", encoding="utf-8")
+    age_files(tmp_path)
+    (entry,) = scanner.walk()
+    assert (
+        scanner.digest(entry, jump_first=True).hash
+        == hash_file(path, skip_first_line=True).hash
+    )
+    assert scanner.hashed_count == hashed_count + 1
+
+
+def test_digest_many_from_threads(source_tree: "Path") -> None:
+    """多个线程共用同一个扫描器时结果一致, 计数不丢失"""
+    scanner = SourceScanner(source_tree)
+    entries = list(scanner.walk())
+    expected = [hash_file(entry.full_path).hash for entry in entries]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(
+            executor.map(
+                lambda _: [
+                    digest.hash for digest in scanner.digest_many(entries, workers=2)
+                ],
+                range(16),
+            )
+        )
+
+    assert all(result == expected for result in results)
+    assert scanner.hashed_count + scanner.reused_count == 16 * len(entries)
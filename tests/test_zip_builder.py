@@ -0,0 +1,96 @@
+import io
+import os
+from pathlib import Path
+
+from nuitkal_pack.packager import BuildFile
+from nuitkal_pack.zip_builder import ZipBuilder
+from nuitkal_pack_server.tools import zipfile
+from nuitkal_pack_server.tools.zip_manifest import HASH_MANIFEST_NAME, member_hashes
+
+
+def _files(directory: Path) -> list[BuildFile]:
+    contents = {
+        "main.py": b"# [core]\nprint('hello')\n" * 50,
+        "pkg/mod.py": b"VALUE = 1\n" * 100,
+        "static/image.png": os.urandom(2048),
+        "static/data.bin": os.urandom(512) * 8,
+    }
+    files = []
+    for name, data in contents.items():
+        path = directory / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        files.append(BuildFile(path, Path(name), jump_first=name == "main.py"))
+    return files
+
+
+def _write(builder: ZipBuilder, files: list[BuildFile], **kwargs: object) -> bytes:
+    buffer = io.BytesIO()
+    builder.write(buffer, files, **kwargs)
+    return buffer.getvalue()
+
+
+def test_reproducible_write(tmp_path: Path) -> None:
+    """可复现模式下成员顺序与构建器无关, 输出逐字节相同"""
+    files = _files(tmp_path)
+    first = _write(
+        ZipBuilder(reproducible=True),
+        files,
+        extra_members={"b.json": b"{}", "a.json": b"[]"},
+    )
+    second = _write(
+        ZipBuilder(reproducible=True),
+        list(reversed(files)),
+        extra_members={"a.json": b"[]", "b.json": b"{}"},
+    )
+
+    assert first == second
+    with zipfile.ZipFile(io.BytesIO(first)) as zf:
+        assert zf.namelist() == [
+            "main.py",
+            "pkg/mod.py",
+            "static/data.bin",
+            "static/image.png",
+            "a.json",
+            "b.json",
+        ]
+        assert zf.testzip() is None
+        # 首行标签不写入 ZIP 包
+        assert (
+            zf.read("main.py") == files[0].full_path.read_bytes()[len(b"# [core]\n") :]
+        )
+
+
+def test_members_compressed_once(tmp_path: Path) -> None:
+    """相同内容写入多个 ZIP 包时只压缩一次"""
+    files = _files(tmp_path)
+    builder = ZipBuilder()
+    _write(builder, files)
+    reused = files[:2]
+    _write(builder, reused)
+
+    assert builder.compressed_count == len(files)
+    assert builder.reused_count == len(reused)
+
+
+def test_manifest_matches_members(tmp_path: Path) -> None:
+    """写入的哈希清单与成员内容一致"""
+    files = _files(tmp_path)
+    with zipfile.ZipFile(io.BytesIO(_write(ZipBuilder(), files, manifest=True))) as zf:
+        assert HASH_MANIFEST_NAME in zf.namelist()
+        assert member_hashes(zf) == {
+            file.rel_path.as_posix(): file.file_hash for file in files
+        }
+
+
+def test_retain_drops_unreferenced_members(tmp_path: Path) -> None:
+    """丢弃不再引用的成员后, 保留的成员仍能写出有效的 ZIP 包"""
+    files = _files(tmp_path)
+    builder = ZipBuilder(reproducible=True)
+    expected = _write(builder, files[1:])
+    _write(builder, files)
+
+    assert builder.retain(file.file_hash for file in files[1:]) == 1
+    assert builder.retain(file.file_hash for file in files[1:]) == 0
+    assert _write(builder, files[1:]) == expected
+    assert builder.compressed_count == len(files)
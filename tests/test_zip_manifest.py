@@ -0,0 +1,149 @@
+import io
+
+import pytest
+
+from nuitkal_pack_server.tools import zipfile
+from nuitkal_pack_server.tools.delta_manifest import (
+    UNCHANGED_MANIFEST_NAME,
+    dump_unchanged_manifest,
+    read_unchanged_manifest,
+)
+from nuitkal_pack_server.tools.hash_utils import calculate_file_hash
+from nuitkal_pack_server.tools.zip_manifest import (
+    HASH_MANIFEST_NAME,
+    ManifestEntry,
+    dump_hash_manifest,
+    member_hashes,
+    read_hash_manifest,
+    read_verified,
+)
+
+FILES = {
+    "main.py": b"print('hello')\n",
+    "pkg/mod.py": b"VALUE = 1\n",
+    "static/data.bin": bytes(range(256)) * 8,
+}
+
+
+def _manifest_entry(data: bytes, *, algorithm: str = "sha256") -> ManifestEntry:
+    info = zipfile.ZipInfo("x")
+    info.CRC = zipfile.crc32(data)
+    return {
+        "hash": calculate_file_hash(data, algorithm=algorithm),
+        "size": len(data),
+        "crc": info.CRC,
+    }
+
+
+def _make_zip(
+    files: dict[str, bytes], extra: dict[str, bytes] | None = None
+) -> zipfile.ZipFile:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in {**files, **(extra or {})}.items():
+            zf.writestr(name, data)
+    buffer.seek(0)
+    return zipfile.ZipFile(buffer)
+
+
+def test_member_hashes_without_manifest() -> None:
+    """没有哈希清单时解压计算, 保留成员不计入"""
+    zf = _make_zip(FILES, {UNCHANGED_MANIFEST_NAME: dump_unchanged_manifest({})})
+    assert member_hashes(zf, workers=2) == {
+        path: calculate_file_hash(data) for path, data in FILES.items()
+    }
+
+
+def test_member_hashes_uses_manifest() -> None:
+    """清单中的哈希直接使用, 不需要解压成员"""
+    manifest = {
+        path: _manifest_entry(data, algorithm="blake2b") for path, data in FILES.items()
+    }
+    zf = _make_zip(FILES, {HASH_MANIFEST_NAME: dump_hash_manifest(manifest)})
+
+    assert member_hashes(zf) == {
+        path: entry["hash"] for path, entry in manifest.items()
+    }
+
+
+def test_manifest_entries_checked_against_central_directory() -> None:
+    """大小或 CRC 与中央目录不一致的条目视为清单未覆盖, 回退到解压计算"""
+    manifest = {path: _manifest_entry(data) for path, data in FILES.items()}
+    manifest["main.py"] = {
+        **manifest["main.py"],
+        "hash": calculate_file_hash(b"tampered"),
+        "crc": 0,
+    }
+    zf = _make_zip(FILES, {HASH_MANIFEST_NAME: dump_hash_manifest(manifest)})
+
+    assert "main.py" not in read_hash_manifest(zf)
+    assert member_hashes(zf)["main.py"] == calculate_file_hash(FILES["main.py"])
+
+
+def test_manifest_filtered_by_algorithm() -> None:
+    """不接受的算法的条目回退到使用指定算法计算"""
+    manifest = {
+        path: _manifest_entry(data, algorithm="blake2b") for path, data in FILES.items()
+    }
+    zf = _make_zip(FILES, {HASH_MANIFEST_NAME: dump_hash_manifest(manifest)})
+
+    assert read_hash_manifest(zf, algorithms=["sha256"]) == {}
+    assert member_hashes(zf, algorithms=["sha256"]) == {
+        path: calculate_file_hash(data) for path, data in FILES.items()
+    }
+
+
+def test_malformed_manifest() -> None:
+    """格式错误的清单抛出 ValueError"""
+    with pytest.raises(ValueError, match="哈希清单格式错误"):
+        read_hash_manifest(_make_zip(FILES, {HASH_MANIFEST_NAME: b"[]"}))
+    with pytest.raises(ValueError, match="哈希清单格式错误"):
+        read_hash_manifest(_make_zip(FILES, {HASH_MANIFEST_NAME: b"{"}))
+
+
+def test_read_verified_keeps_order() -> None:
+    """并行解压的成员按输入顺序产出"""
+    files = {
+        f"file{index}.txt": f"content {index}".encode() * (index + 1)
+        for index in range(32)
+    }
+    zf = _make_zip(files)
+    members = {
+        path: calculate_file_hash(data) for path, data in reversed(files.items())
+    }
+
+    assert list(read_verified(zf, members, workers=4)) == [
+        (path, files[path]) for path in members
+    ]
+
+
+def test_read_verified_rejects_mismatch() -> None:
+    """内容与哈希不一致时抛出 ValueError"""
+    zf = _make_zip(FILES)
+    with pytest.raises(ValueError, match="文件内容与哈希清单不一致"):
+        list(read_verified(zf, {"main.py": calculate_file_hash(b"other")}))
+
+
+def test_unchanged_manifest_round_trip() -> None:
+    """增量清单写入 ZIP 包后可以原样读出, 不是增量包时为空"""
+    manifest = {
+        "pkg/b.py": calculate_file_hash(b"b"),
+        "pkg/a.py": calculate_file_hash(b"a"),
+    }
+    assert (
+        read_unchanged_manifest(
+            _make_zip(
+                FILES, {UNCHANGED_MANIFEST_NAME: dump_unchanged_manifest(manifest)}
+            )
+        )
+        == manifest
+    )
+    assert read_unchanged_manifest(_make_zip(FILES)) == {}
+
+
+def test_malformed_unchanged_manifest() -> None:
+    """格式错误的增量清单抛出 ValueError"""
+    with pytest.raises(ValueError, match="增量清单格式错误"):
+        read_unchanged_manifest(
+            _make_zip(FILES, {UNCHANGED_MANIFEST_NAME: b'{"a.py": 1}'})
+        )